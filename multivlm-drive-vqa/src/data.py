@@ -1,34 +1,58 @@
 import os
-import json
-from glob import glob
+from bisect import bisect_right
 from typing import List, Optional
 
 from PIL import Image
 from torch.utils.data import Dataset
 
+from src.utils.json_stream import iter_frames
+from src.utils.lazy_qa import FrameQAGenerator, frame_type_counts, strip_frame
+from src.utils.qa_store import QA_IDS_KEY, QATables, find_tables, video_files
+
 
 class DrivingVideoDataset(Dataset):
-    def __init__(self, root_dir: str, q_type_filter: Optional[List[str]] = None):
+    def __init__(self, root_dir: str, q_type_filter: Optional[List[str]] = None,
+                 generate_qa: bool = False, memo_frames: int = 256):
         """
         root_dir: path containing 'frames/' and 'json/'.
         q_type_filter: list of question types to include. If None, include all.
+        'json/' may be a QA store (src/utils/qa_store.py, qa_tables.json in
+        'json/' or root_dir): Q&A are then read as ids into its string table.
+        generate_qa: ignore any stored Q&A and generate each frame's Q&A with
+        QA.generate_qa when a sample is read (src/utils/lazy_qa.py); the last
+        memo_frames frames are memoised per DataLoader worker.
         """
         self.root_dir = root_dir
         self.frames_dir = os.path.join(root_dir, "frames")
         self.json_dir = os.path.join(root_dir, "json")
-        self.json_files = glob(os.path.join(self.json_dir, "*.json"))
+        # .json and JSON lines videos (src/utils/json_stream.py), without a store's qa_tables.json
+        self.json_files = [os.path.join(self.json_dir, name) for name in video_files(self.json_dir)]
+
+        self.qa_generator = None
+        if generate_qa:
+            self._index_generated_qa(q_type_filter, memo_frames)
+            return
+
+        tables_path = find_tables(self.json_dir, root_dir)
+        self.qa_tables = QATables.load(tables_path) if tables_path else None
+        if self.qa_tables is not None:
+            qa_fields = self.qa_tables.getter(("Q", "A", "Task", "Type"), ("", "", "no_task", "no_type"))
 
         self.samples = []  # (img_path, question, answer, task, q_type)
 
         for json_path in self.json_files:
             video_name = os.path.splitext(os.path.basename(json_path))[0]
-            with open(json_path, "r", encoding="utf-8") as f:
-                data_list = json.load(f)
-
-            for entry in data_list:
+            # Frames are streamed, so only one frame of a video is in memory at a time
+            for entry in iter_frames(json_path):
                 img_id = entry["image_id"]
                 img_path = os.path.join(self.frames_dir, video_name, img_id)
-                qa_list = entry.get("QA", [])
+                if self.qa_tables is not None:
+                    qa_list = [qa_fields(row) for row in entry.get(QA_IDS_KEY, [])]
+                else:
+                    qa_list = [
+                        (qa.get("Q", ""), qa.get("A", ""), qa.get("Task", "no_task"), qa.get("Type", "no_type"))
+                        for qa in entry.get("QA", [])
+                    ]
 
                 # if no QA, optionally keep as no_type
                 if not qa_list:
@@ -36,22 +60,62 @@ class DrivingVideoDataset(Dataset):
                         self.samples.append((img_path, "", "", "no_task", "no_type"))
                     continue
 
-                for qa in qa_list:
-                    question = qa.get("Q", "")
-                    answer = qa.get("A", "")
-                    task = qa.get("Task", "no_task")
-                    q_type = qa.get("Type", "no_type")
-
+                for question, answer, task, q_type in qa_list:
                     if q_type_filter is not None and q_type not in q_type_filter:
                         continue
 
                     self.samples.append((img_path, question, answer, task, q_type))
 
+    def _index_generated_qa(self, q_type_filter, memo_frames):
+        """
+        Samples of generate_qa mode: per frame (video, frame, img_path), with
+        sample_offsets[k] the first sample of frame k. The sample counts come
+        from the per-frame Q&A count cache (lazy_qa.frame_type_counts).
+        """
+        videos = []
+        self.frame_samples = []
+        self.sample_offsets = [0]
+        for json_path in self.json_files:
+            video_name = os.path.splitext(os.path.basename(json_path))[0]
+            frames = [strip_frame(entry) for entry in iter_frames(json_path)]
+            for frame_index, type_counts in enumerate(frame_type_counts(json_path, frames)):
+                if not type_counts:
+                    # Same rule as stored Q&A: a frame without Q&A is one no_type sample
+                    count = 1 if q_type_filter is None or "no_type" in q_type_filter else 0
+                elif q_type_filter is None:
+                    count = sum(type_counts.values())
+                else:
+                    count = sum(type_counts.get(q_type, 0) for q_type in q_type_filter)
+                if count:
+                    img_path = os.path.join(self.frames_dir, video_name, frames[frame_index]["image_id"])
+                    self.frame_samples.append((len(videos), frame_index, img_path))
+                    self.sample_offsets.append(self.sample_offsets[-1] + count)
+            videos.append(frames)
+        self.qa_generator = FrameQAGenerator(videos, memo_frames, q_type_filter)
+
+    def _generated_sample(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        k = bisect_right(self.sample_offsets, idx) - 1
+        video, frame_index, img_path = self.frame_samples[k]
+        qa_list = self.qa_generator(video, frame_index)
+        if not qa_list:
+            return img_path, "", "", "no_task", "no_type"
+        qa = qa_list[idx - self.sample_offsets[k]]
+        return img_path, qa.get("Q", ""), qa.get("A", ""), qa.get("Task", "no_task"), qa.get("Type", "no_type")
+
     def __len__(self):
+        if self.qa_generator is not None:
+            return self.sample_offsets[-1]
         return len(self.samples)
 
     def __getitem__(self, idx):
-        img_path, question, answer, task, q_type = self.samples[idx]
+        if self.qa_generator is not None:
+            img_path, question, answer, task, q_type = self._generated_sample(idx)
+        else:
+            img_path, question, answer, task, q_type = self.samples[idx]
         image = Image.open(img_path).convert("RGB")
         return {
             "image": image,
@@ -0,0 +1,538 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+
+EVAL_MODEL = "gpt-4o-mini"  # or "gpt-4o"
+
+
+# ============================================================
+# Prompt construction
+# ============================================================
+
+def build_scenario_text(caption, speed, steering, objects_info, relations_info):
+    # Reuse your extracted info to form a compact text block for the judge
+    objects_lines = []
+    for obj in objects_info:
+        objects_lines.append(
+            f"- {obj['name']} (type: {obj['type']}, "
+            f"status: {', '.join(obj['status']) if obj['status'] else 'N/A'}, "
+            f"safety: {', '.join(obj['safety']) if obj['safety'] else 'N/A'}, "
+            f"positions: {', '.join(obj['positions']) if obj['positions'] else 'N/A'}, "
+            f"importance: {obj['importance']})"
+        )
+    objects_text = "\n".join(objects_lines) if objects_lines else "No objects described."
+
+    if relations_info:
+        relations_text = "\n".join(
+            [f"- {src} --> {tgt}: {rel}" for (src, tgt, rel) in relations_info]
+        )
+    else:
+        relations_text = "No explicit relations found."
+
+    scenario_text = (
+        f"Caption: {caption}\n"
+        f"Speed: {speed}\n"
+        f"Steering: {steering}\n\n"
+        f"Objects:\n{objects_text}\n\n"
+        f"Relations:\n{relations_text}"
+    )
+    return scenario_text
+
+
+CAUSALITY_RUBRIC = """
+You are an expert evaluator of autonomous driving reasoning.
+
+You will be given:
+- A driving scenario description.
+- A question about the scenario.
+- A candidate answer produced by a model.
+
+Your job is to evaluate how strong the answer's **causal reasoning** is: how clearly, correctly, and completely it explains *why* things happen, *how* objects and events influence each other, and *why* the autonomous vehicle would choose certain actions.
+
+Scoring guidelines (1–10):
+
+1–3: Very poor causality
+- Little or no cause-effect explanation.
+- Mostly restates the question or scenario without explaining “why”.
+- Important causal factors are missing or wrong.
+
+4–6: Weak / partial causality
+- Some causal links, but shallow or incomplete.
+- Misses several important factors or mixes up causes and effects.
+- Reasoning may be partially correct but not coherent.
+
+7–8: Good causality
+- Mostly correct, coherent chain of cause-effect.
+- Identifies key objects, risks, and how they influence AV actions.
+- Minor omissions or small mistakes, but overall logically sound.
+
+9–10: Excellent causality
+- Clear, detailed, and technically accurate chain of cause-effect.
+- Correctly explains how the AV perceives, predicts, and decides actions.
+- Explicitly links objects, risks, and traffic rules to the AV’s decisions.
+""".strip()
+
+
+def build_causality_prompt(scenario_text, question_text, model_answer):
+    prompt = f"""
+{CAUSALITY_RUBRIC}
+
+Return your evaluation ONLY as a JSON object in this exact format:
+
+{{
+  "causality_score": <integer from 1 to 10>
+}}
+
+Now here is the data:
+
+SCENARIO:
+{scenario_text}
+
+QUESTION:
+{question_text}
+
+MODEL_ANSWER:
+{model_answer}
+""".strip()
+    return prompt
+
+
+_SCORE_RE = re.compile(r'"?causality_score"?\s*[:=]\s*"?(\d+)')
+
+
+def parse_causality_score(content):
+    """
+    Extract the integer score from a judge reply.
+    Tolerates code fences, trailing commas and extra prose; returns 0 if absent.
+    """
+    score = find_causality_score(content)
+    return 0 if score is None else score
+
+
+def find_causality_score(content) -> Optional[int]:
+    """
+    The score of a judge reply, None if the reply has none (garbled or refused)
+    or if it is outside the 1-10 scale.
+    """
+    if not content:
+        return None
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("{"):] if "{" in text else text
+    score = None
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict) and "causality_score" in data:
+            score = int(data["causality_score"])
+    except (json.JSONDecodeError, TypeError, ValueError):
+        pass
+    if score is None:
+        match = _SCORE_RE.search(content)
+        score = int(match.group(1)) if match else None
+    return score if score is not None and 1 <= score <= 10 else None
+
+
+def build_batched_causality_prompt(scenario_text, qa_pairs):
+    """
+    One judge request for many (question, answer) pairs on the same frame:
+    the scenario block is sent once and the judge returns a list of scores.
+    qa_pairs: sequence of (question_text, model_answer).
+    """
+    items = []
+    for i, (question_text, model_answer) in enumerate(qa_pairs, start=1):
+        items.append(
+            f"[ITEM {i}]\n"
+            f"QUESTION:\n{question_text}\n\n"
+            f"MODEL_ANSWER:\n{model_answer}"
+        )
+    items_text = "\n\n".join(items)
+    prompt = f"""
+{CAUSALITY_RUBRIC}
+
+All items below refer to the same driving scenario. Score every item independently.
+
+Return your evaluation ONLY as a JSON object in this exact format, with one entry per item, in order:
+
+{{
+  "scores": [
+    {{"id": 1, "causality_score": <integer from 1 to 10>}},
+    ...
+    {{"id": {len(qa_pairs)}, "causality_score": <integer from 1 to 10>}}
+  ]
+}}
+
+Now here is the data:
+
+SCENARIO:
+{scenario_text}
+
+{items_text}
+""".strip()
+    return prompt
+
+
+_ITEM_SCORE_RE = re.compile(r'"?id"?\s*:\s*"?(\d+)"?\s*,\s*"?causality_score"?\s*:\s*"?(\d+)')
+
+
+def parse_causality_score_list(content, n_items):
+    """
+    Parse a batched judge reply into a list of n_items scores.
+    Accepts {"scores": [...]}, a bare list of ints, or a list of
+    {"id", "causality_score"} dicts; falls back to a regex scan for
+    truncated/malformed JSON. Missing or out-of-range (not 1-10) entries are None.
+    """
+    scores = [None] * n_items
+
+    def put(idx, value):
+        try:
+            idx, value = int(idx), int(value)
+        except (TypeError, ValueError):
+            return
+        if 0 <= idx < n_items and 1 <= value <= 10:
+            scores[idx] = value
+
+    if not content:
+        return scores
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        starts = [p for p in (text.find("{"), text.find("[")) if p >= 0]
+        text = text[min(starts):] if starts else text
+
+    data = None
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, TypeError, ValueError):
+        pass
+    if isinstance(data, dict):
+        data = data.get("scores", data.get("causality_scores"))
+
+    if isinstance(data, list):
+        for pos, entry in enumerate(data):
+            if isinstance(entry, dict):
+                idx = entry.get("id", pos + 1)
+                try:
+                    idx = int(idx) - 1
+                except (TypeError, ValueError):
+                    idx = pos
+                put(idx, entry.get("causality_score"))
+            else:
+                put(pos, entry)
+        return scores
+
+    for idx, value in _ITEM_SCORE_RE.findall(content):
+        put(int(idx) - 1, value)
+    return scores
+
+
+# ============================================================
+# Rate limiting, retry, cache
+# ============================================================
+
+class TokenBucket:
+    """
+    Async token bucket: at most `rate` acquisitions per second on average,
+    with bursts up to `capacity`.
+    """
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+async def retry_with_backoff(
+    fn: Callable[[], Any],
+    retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    retry_on: Sequence[type] = (Exception,),
+):
+    """
+    Await fn() and retry on `retry_on` exceptions with exponential backoff
+    (base_delay * 2**attempt, capped at max_delay, with full jitter).
+    The last exception is re-raised once retries are exhausted.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await fn()
+        except tuple(retry_on):
+            if attempt >= retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            await asyncio.sleep(random.uniform(0, delay))
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent sqlite cache of raw model replies keyed by (model, key).
+    `key` is normally prompt_hash(prompt) but any stable content hash works.
+    """
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " model TEXT NOT NULL, key TEXT NOT NULL, response TEXT NOT NULL,"
+            " created REAL NOT NULL, PRIMARY KEY (model, key))"
+        )
+        self._conn.commit()
+
+    def get(self, model: str, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT response FROM responses WHERE model = ? AND key = ?", (model, key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, model: str, key: str, response: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (model, key, response, created) VALUES (?, ?, ?, ?)",
+            (model, key, response, time.time()),
+        )
+        self._conn.commit()
+
+    def delete(self, model: str, key: str):
+        self._conn.execute("DELETE FROM responses WHERE model = ? AND key = ?", (model, key))
+        self._conn.commit()
+
+    def __contains__(self, item):
+        model, key = item
+        return self.get(model, key) is not None
+
+    def close(self):
+        self._conn.close()
+
+
+# ============================================================
+# Backends
+# ============================================================
+
+class JudgeBackend:
+    """Minimal interface: one async completion call returning the reply text."""
+    async def complete(self, prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+        raise NotImplementedError
+
+
+class OpenAIBackend(JudgeBackend):
+    """
+    Chat-completions backend (openai>=1.0).
+    Pass base_url to target any OpenAI-compatible server, e.g. a local mock
+    at http://127.0.0.1:8000/v1.
+    """
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, timeout: float = 60.0):
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY", "not-needed"),
+            base_url=base_url,
+            timeout=timeout,
+        )
+
+    async def complete(self, prompt, model, temperature, max_tokens):
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content or ""
+
+
+class CallableBackend(JudgeBackend):
+    """Wrap a plain function or coroutine function `fn(prompt) -> str` (stubs, local models)."""
+    def __init__(self, fn: Callable[[str], Any]):
+        self.fn = fn
+
+    async def complete(self, prompt, model, temperature, max_tokens):
+        result = self.fn(prompt)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+
+# ============================================================
+# Judge client
+# ============================================================
+
+def _has_causality_score(content: str) -> bool:
+    return find_causality_score(content) is not None
+
+
+class JudgeClient:
+    """
+    Asynchronous LLM judge.
+
+      - at most `concurrency` requests in flight
+      - optional token-bucket limit of `requests_per_second`
+      - exponential backoff on backend errors
+      - persistent (model, prompt-hash) cache of the replies that parse, so
+        reruns never pay twice and retry garbled or refused replies
+    """
+    def __init__(
+        self,
+        backend: JudgeBackend,
+        model: str = EVAL_MODEL,
+        concurrency: int = 8,
+        requests_per_second: Optional[float] = None,
+        cache_path: Optional[str] = None,
+        retries: int = 5,
+        temperature: float = 0.0,
+        max_tokens: int = 300,
+    ):
+        self.backend = backend
+        self.model = model
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.cache = ResponseCache(cache_path) if cache_path else None
+        self.retries = retries
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self._semaphore = None
+        self.stats = {"requests": 0, "cache_hits": 0, "errors": 0, "batch_fallbacks": 0}
+
+    def _sem(self):
+        # Created lazily so the semaphore binds to the running event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def complete(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        valid: Optional[Callable[[str], bool]] = None,
+    ) -> Optional[str]:
+        """
+        Raw reply for `prompt`. Returns None if all retries failed.
+        Only replies accepted by `valid` (all, if None) are cached; a cached
+        reply it rejects is dropped and requested again.
+        """
+        key = prompt_hash(prompt)
+        if self.cache is not None:
+            cached = self.cache.get(self.model, key)
+            if cached is not None:
+                if valid is None or valid(cached):
+                    self.stats["cache_hits"] += 1
+                    return cached
+                self.cache.delete(self.model, key)
+
+        async def call():
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            self.stats["requests"] += 1
+            return await self.backend.complete(
+                prompt, self.model, self.temperature, max_tokens or self.max_tokens
+            )
+
+        async with self._sem():
+            try:
+                content = await retry_with_backoff(call, retries=self.retries)
+            except Exception:
+                self.stats["errors"] += 1
+                return None
+
+        if self.cache is not None and (valid is None or valid(content)):
+            self.cache.put(self.model, key, content)
+        return content
+
+    async def score_causality(self, scenario_text: str, question_text: str, model_answer: str) -> Dict[str, Any]:
+        prompt = build_causality_prompt(scenario_text, question_text, model_answer)
+        content = await self.complete(prompt, valid=_has_causality_score)
+        if content is None:
+            return {"causality_score": 0, "justification": "API error during evaluation."}
+        return {"causality_score": parse_causality_score(content)}
+
+    async def score_frame(
+        self,
+        scenario_text: str,
+        qa_pairs: Sequence[Sequence[str]],
+        max_batch: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        Score many (question, answer) pairs that share one scenario.
+
+        Pairs are sent in batches of up to `max_batch` with the scenario block
+        included once per request. Any item the batched reply does not score
+        (malformed JSON, missing id, out-of-range value) is re-scored with the
+        single-item prompt. Results are returned in input order.
+        """
+        qa_pairs = list(qa_pairs)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(qa_pairs)
+
+        async def run_chunk(start):
+            chunk = qa_pairs[start:start + max_batch]
+            if len(chunk) == 1:
+                results[start] = await self.score_causality(scenario_text, *chunk[0])
+                return
+            prompt = build_batched_causality_prompt(scenario_text, chunk)
+            content = await self.complete(
+                prompt,
+                max_tokens=40 + 25 * len(chunk),
+                valid=lambda reply: any(score is not None for score in parse_causality_score_list(reply, len(chunk))),
+            )
+            scores = parse_causality_score_list(content, len(chunk))
+            fallbacks = []
+            for offset, score in enumerate(scores):
+                if score is None:
+                    self.stats["batch_fallbacks"] += 1
+                    fallbacks.append(offset)
+                else:
+                    results[start + offset] = {"causality_score": score}
+            singles = await asyncio.gather(*[
+                self.score_causality(scenario_text, *chunk[offset]) for offset in fallbacks
+            ])
+            for offset, res in zip(fallbacks, singles):
+                results[start + offset] = res
+
+        await asyncio.gather(*[run_chunk(i) for i in range(0, len(qa_pairs), max_batch)])
+        return results
+
+    async def score_many(self, items: Iterable[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        items: dicts with keys scenario_text, question, answer.
+        Results are returned in input order.
+        """
+        tasks = [
+            self.score_causality(it["scenario_text"], it["question"], it["answer"])
+            for it in items
+        ]
+        return await asyncio.gather(*tasks)
+
+    def score_many_sync(self, items: Iterable[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Blocking wrapper for scripts (in Jupyter use `await client.score_many(...)`)."""
+        # asyncio.run creates a fresh loop; drop primitives bound to a previous one.
+        self._semaphore = None
+        if self.bucket is not None:
+            self.bucket._lock = asyncio.Lock()
+        return asyncio.run(self.score_many(list(items)))
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
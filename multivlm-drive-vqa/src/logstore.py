@@ -0,0 +1,159 @@
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = ds = pq = None
+
+
+EPOCH_LOG_COLUMNS = [
+    "BLEU-1", "BLEU-2", "BLEU-3", "BLEU-4",
+    "ROUGE-1", "ROUGE-2", "ROUGE-L",
+    "BERTScore_P", "BERTScore_R", "BERTScore_F1",
+    "Accuracy", "Precision", "Recall", "F1-Score", "CIDEr",
+]
+
+
+class ColumnarRunLog:
+    """
+    Append-only Parquet store for one training run.
+
+    Layout under <output_dir>/run_log/:
+        samples.parquet                      - image_path, question, reference, q_type (written once)
+        predictions/epoch=N/part-0.parquet   - sample_id, prediction + per-sample metric columns
+        epochs/epoch=N/part-0.parquet        - one row: losses + aggregate metrics
+
+    The validation questions/references are identical across evaluated epochs,
+    so they are stored once in samples.parquet and every prediction row points
+    at them by sample_id. Parquet dictionary-encodes the string columns, which
+    collapses the heavily repeated question templates and image paths.
+    """
+
+    def __init__(self, output_dir: str, compression: str = "zstd", resume: bool = False):
+        """
+        resume=False starts a fresh log (like truncating training_eval_log.csv);
+        resume=True keeps existing partitions and appends to them.
+        """
+        if pa is None:
+            raise ImportError("pyarrow is required for the parquet log format (pip install pyarrow)")
+        self.root = os.path.join(output_dir, "run_log")
+        self.samples_path = os.path.join(self.root, "samples.parquet")
+        self.predictions_dir = os.path.join(self.root, "predictions")
+        self.epochs_dir = os.path.join(self.root, "epochs")
+        self.compression = compression
+        self._num_samples = None
+        if not resume and os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.predictions_dir, exist_ok=True)
+        os.makedirs(self.epochs_dir, exist_ok=True)
+        if os.path.exists(self.samples_path):
+            self._num_samples = pq.ParquetFile(self.samples_path).metadata.num_rows
+
+    # ------------------------------------------------------------------ write
+
+    def _write(self, table, directory: str, epoch: int):
+        part_dir = os.path.join(directory, f"epoch={epoch}")
+        os.makedirs(part_dir, exist_ok=True)
+        pq.write_table(
+            table,
+            os.path.join(part_dir, "part-0.parquet"),
+            compression=self.compression,
+            use_dictionary=True,
+        )
+
+    def _write_samples(self, sample_records: List[Tuple]):
+        img_paths, questions, refs, _, q_types = zip(*sample_records)
+        table = pa.table({
+            "sample_id": pa.array(range(len(sample_records)), type=pa.int32()),
+            "image_path": pa.array(img_paths, type=pa.string()),
+            "question": pa.array(questions, type=pa.string()),
+            "reference": pa.array(refs, type=pa.string()),
+            "q_type": pa.array(q_types, type=pa.string()),
+        })
+        pq.write_table(table, self.samples_path, compression=self.compression)
+        self._num_samples = len(sample_records)
+
+    def append_predictions(
+        self,
+        epoch: int,
+        sample_records: List[Tuple],
+        sample_metrics: Optional[Dict[str, List[float]]] = None,
+    ):
+        """
+        sample_records: list of (img_path, question, ref, pred, q_type), in eval-loader order.
+        sample_metrics: optional {metric_name: [value per sample]}.
+        """
+        if not sample_records:
+            return
+        if self._num_samples is None:
+            self._write_samples(sample_records)
+        elif self._num_samples != len(sample_records):
+            raise ValueError(
+                f"Epoch {epoch} has {len(sample_records)} eval samples, "
+                f"but samples.parquet has {self._num_samples}"
+            )
+
+        columns = {
+            "sample_id": pa.array(range(len(sample_records)), type=pa.int32()),
+            "prediction": pa.array([rec[3] for rec in sample_records], type=pa.string()),
+        }
+        for name, values in (sample_metrics or {}).items():
+            columns[name] = pa.array(values, type=pa.float32())
+        self._write(pa.table(columns), self.predictions_dir, epoch)
+
+    def append_epoch(
+        self,
+        epoch: int,
+        train_loss: float,
+        val_loss: float,
+        metrics: Optional[Dict[str, float]] = None,
+    ):
+        """Log one epoch row. Metric columns are null for epochs without heavy eval."""
+        columns = {
+            "Train_Loss": pa.array([train_loss], type=pa.float64()),
+            "Val_Loss": pa.array([val_loss], type=pa.float64()),
+        }
+        for name in EPOCH_LOG_COLUMNS:
+            value = None if metrics is None else metrics.get(name)
+            columns[name] = pa.array([value], type=pa.float64())
+        self._write(pa.table(columns), self.epochs_dir, epoch)
+
+    # ------------------------------------------------------------------- read
+
+    @staticmethod
+    def _read_partitioned(directory: str, epochs: Optional[Iterable[int]] = None):
+        dataset = ds.dataset(directory, format="parquet", partitioning="hive")
+        filt = None
+        if epochs is not None:
+            filt = ds.field("epoch").isin(list(epochs))
+        return dataset.to_table(filter=filt)
+
+    def read_epochs(self):
+        """All epoch rows as a pyarrow.Table, sorted by epoch."""
+        return self._read_partitioned(self.epochs_dir).sort_by("epoch")
+
+    def read_predictions(self, epochs: Optional[Iterable[int]] = None, with_samples: bool = True):
+        """
+        Predictions across the requested epochs (all by default) as a pyarrow.Table.
+        With with_samples=True the question/reference columns are joined back in.
+        """
+        table = self._read_partitioned(self.predictions_dir, epochs)
+        if with_samples:
+            samples = pq.read_table(self.samples_path)
+            table = table.join(samples, keys="sample_id")
+        return table.sort_by([("epoch", "ascending"), ("sample_id", "ascending")])
+
+    def export_predictions_csv(self, epoch: int, path: str):
+        """Write one epoch in the legacy predictions_epoch_N.csv column layout."""
+        from src.utils.utils import save_predictions_csv
+
+        table = self.read_predictions(epochs=[epoch]).to_pydict()
+        records = list(zip(
+            table["image_path"], table["question"], table["reference"],
+            table["prediction"], table["q_type"],
+        ))
+        save_predictions_csv(records, path)
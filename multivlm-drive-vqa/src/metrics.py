@@ -93,3 +93,17 @@ def evaluate_by_type(
     for q_type, group in type_groups.items():
         out[q_type] = compute_metrics(group["predictions"], group["references"])
     return out
+
+
+def compute_sample_metrics(predictions: List[str], references: List[str]) -> Dict[str, List[float]]:
+    """
+    Cheap per-sample scores for the columnar prediction log:
+    exact match and ROUGE-L F-measure for every (pred, ref) pair.
+    """
+    exact = [1.0 if p.strip() == r.strip() else 0.0 for p, r in zip(predictions, references)]
+    try:
+        scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+        rouge_l = [scorer.score(r, p)["rougeL"].fmeasure for p, r in zip(predictions, references)]
+    except Exception:
+        rouge_l = [0.0] * len(exact)
+    return {"exact_match": exact, "rougeL": rouge_l}
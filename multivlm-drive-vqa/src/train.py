@@ -8,7 +8,8 @@ from torch.optim import AdamW
 from tqdm import tqdm
 
 from src.data import DrivingVideoDataset
-from src.metrics import compute_metrics, evaluate_by_type
+from src.metrics import compute_metrics, evaluate_by_type, compute_sample_metrics
+from src.logstore import ColumnarRunLog
 from src.utils import (
     save_predictions_csv,
     plot_loss_curves,
@@ -36,6 +37,8 @@ def parse_args():
 
     parser.add_argument("--q-type-filter", type=str, default=None,
                         help="Optional question type to filter (e.g. CCot)")
+    parser.add_argument("--generate-qa", action="store_true",
+                        help="Generate each frame's Q&A on the fly (QA.generate_qa) instead of reading stored Q&A")
     parser.add_argument("--train-split", type=float, default=0.8,
                         help="Train split ratio (0-1)")
 
@@ -44,6 +47,10 @@ def parse_args():
     parser.add_argument("--lr", type=float, default=1e-4)
     parser.add_argument("--eval-epochs", type=int, nargs="+", default=[1, 5, 10],
                         help="Epochs to run full evaluation on (metrics, preds)")
+    parser.add_argument("--log-format", type=str, default="csv",
+                        choices=["csv", "parquet"],
+                        help="csv: training_eval_log.csv + predictions_epoch_N.csv; "
+                             "parquet: append-only columnar store in <output-dir>/run_log/")
 
     return parser.parse_args()
 
@@ -168,7 +175,7 @@ def main():
     else:
         q_type_filter = None
 
-    dataset = DrivingVideoDataset(args.data_root, q_type_filter=q_type_filter)
+    dataset = DrivingVideoDataset(args.data_root, q_type_filter=q_type_filter, generate_qa=args.generate_qa)
     print("Total samples:", len(dataset))
     if len(dataset) == 0:
         print("No data found. Check dataset paths.")
@@ -201,19 +208,23 @@ def main():
     # --------------- optimizer -----------------
     optimizer = AdamW(model.parameters(), lr=args.lr)
 
-    # --------------- logging CSV -----------------
+    # --------------- logging (CSV or columnar) -----------------
+    run_log = None
     log_csv_path = os.path.join(args.output_dir, "training_eval_log.csv")
-    with open(log_csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "Epoch",
-            "Train_Loss",
-            "Val_Loss",
-            "BLEU-1", "BLEU-2", "BLEU-3", "BLEU-4",
-            "ROUGE-1", "ROUGE-2", "ROUGE-L",
-            "BERTScore_P", "BERTScore_R", "BERTScore_F1",
-            "Accuracy", "Precision", "Recall", "F1-Score", "CIDEr",
-        ])
+    if args.log_format == "parquet":
+        run_log = ColumnarRunLog(args.output_dir)
+    else:
+        with open(log_csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                "Epoch",
+                "Train_Loss",
+                "Val_Loss",
+                "BLEU-1", "BLEU-2", "BLEU-3", "BLEU-4",
+                "ROUGE-1", "ROUGE-2", "ROUGE-L",
+                "BERTScore_P", "BERTScore_R", "BERTScore_F1",
+                "Accuracy", "Precision", "Recall", "F1-Score", "CIDEr",
+            ])
 
     best_val_loss = float("inf")
     final_sample_records = None
@@ -243,34 +254,41 @@ def main():
             eval_epoch_indices.append(epoch)
             f1_scores_hist.append(overall_metrics["F1-Score"])
 
-            # Save epoch predictions
-            pred_csv = os.path.join(args.output_dir, f"predictions_epoch_{epoch}.csv")
-            save_predictions_csv(sample_records, pred_csv)
-
-            # log metrics
-            with open(log_csv_path, "a", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                row = [
-                    epoch,
-                    f"{train_loss:.4f}",
-                    f"{val_loss:.4f}",
-                    f"{overall_metrics['BLEU-1']:.2f}",
-                    f"{overall_metrics['BLEU-2']:.2f}",
-                    f"{overall_metrics['BLEU-3']:.2f}",
-                    f"{overall_metrics['BLEU-4']:.2f}",
-                    f"{overall_metrics['ROUGE-1']:.2f}",
-                    f"{overall_metrics['ROUGE-2']:.2f}",
-                    f"{overall_metrics['ROUGE-L']:.2f}",
-                    f"{overall_metrics['BERTScore_P']:.2f}",
-                    f"{overall_metrics['BERTScore_R']:.2f}",
-                    f"{overall_metrics['BERTScore_F1']:.2f}",
-                    f"{overall_metrics['Accuracy']:.2f}",
-                    f"{overall_metrics['Precision']:.2f}",
-                    f"{overall_metrics['Recall']:.2f}",
-                    f"{overall_metrics['F1-Score']:.2f}",
-                    f"{overall_metrics['CIDEr']:.2f}",
-                ]
-                writer.writerow(row)
+            if run_log is not None:
+                # Predictions + per-sample scores as one partition per epoch
+                preds = [rec[3] for rec in sample_records]
+                refs = [rec[2] for rec in sample_records]
+                run_log.append_predictions(epoch, sample_records, compute_sample_metrics(preds, refs))
+                run_log.append_epoch(epoch, train_loss, val_loss, overall_metrics)
+            else:
+                # Save epoch predictions
+                pred_csv = os.path.join(args.output_dir, f"predictions_epoch_{epoch}.csv")
+                save_predictions_csv(sample_records, pred_csv)
+
+                # log metrics
+                with open(log_csv_path, "a", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    row = [
+                        epoch,
+                        f"{train_loss:.4f}",
+                        f"{val_loss:.4f}",
+                        f"{overall_metrics['BLEU-1']:.2f}",
+                        f"{overall_metrics['BLEU-2']:.2f}",
+                        f"{overall_metrics['BLEU-3']:.2f}",
+                        f"{overall_metrics['BLEU-4']:.2f}",
+                        f"{overall_metrics['ROUGE-1']:.2f}",
+                        f"{overall_metrics['ROUGE-2']:.2f}",
+                        f"{overall_metrics['ROUGE-L']:.2f}",
+                        f"{overall_metrics['BERTScore_P']:.2f}",
+                        f"{overall_metrics['BERTScore_R']:.2f}",
+                        f"{overall_metrics['BERTScore_F1']:.2f}",
+                        f"{overall_metrics['Accuracy']:.2f}",
+                        f"{overall_metrics['Precision']:.2f}",
+                        f"{overall_metrics['Recall']:.2f}",
+                        f"{overall_metrics['F1-Score']:.2f}",
+                        f"{overall_metrics['CIDEr']:.2f}",
+                    ]
+                    writer.writerow(row)
 
             print(f"[Epoch {epoch}] Train: {train_loss:.4f}, Val: {val_loss:.4f}")
             print("Overall metrics:", overall_metrics)
@@ -280,18 +298,21 @@ def main():
             final_sample_records = sample_records
         else:
             # log only losses
-            with open(log_csv_path, "a", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                row = [
-                    epoch,
-                    f"{train_loss:.4f}",
-                    f"{val_loss:.4f}",
-                    "", "", "", "",
-                    "", "", "",
-                    "", "", "",
-                    "", "", "", "", "",
-                ]
-                writer.writerow(row)
+            if run_log is not None:
+                run_log.append_epoch(epoch, train_loss, val_loss)
+            else:
+                with open(log_csv_path, "a", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    row = [
+                        epoch,
+                        f"{train_loss:.4f}",
+                        f"{val_loss:.4f}",
+                        "", "", "", "",
+                        "", "", "",
+                        "", "", "",
+                        "", "", "", "", "",
+                    ]
+                    writer.writerow(row)
             print(f"[Epoch {epoch}] Train: {train_loss:.4f}, Val: {val_loss:.4f} (no heavy eval)")
 
         # save best checkpoint
@@ -302,8 +323,8 @@ def main():
             from src.utils import save_checkpoint
             save_checkpoint(model, processor, ckpt_dir, epoch)
 
-    # final predictions
-    if final_sample_records is not None:
+    # final predictions (the parquet store already holds every evaluated epoch)
+    if final_sample_records is not None and run_log is None:
         save_predictions_csv(
             final_sample_records,
             os.path.join(args.output_dir, "final_predictions.csv")
@@ -2,6 +2,7 @@ import os
 import json
 import random
 
+import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
 
@@ -190,22 +191,12 @@ def build_graph_from_categories_and_semantics(
     return G
 
 
-def frame_to_graph_data(frame, flags):
+def frame_to_categories(frame):
     """
-    Convert a single frame (from JSON) into a PyG Data object
-    (graph only, no image yet), with ablation flags.
-    Returns Data or None if label can't be determined.
+    Group the frame's JSON graph nodes by object_type:
+        {object_type: {obj_name: {status, position, importance, safety, causal_info}}}
+    Returns None if the frame has no graph.
     """
-    safety_status = determine_safety_status(frame.get("safe", ""))
-    if safety_status is None:
-        return None  # skip frames with unknown label
-
-    # Scene-level text fields
-    goal_text = frame.get("goal-oriented", "")
-    action_text = frame.get("Action Suggestions", "")
-    traffic_text = frame.get("Traffic Regulations Suggestions", "")
-
-    # Build categories structure from nodes
     categories = {}
     if "graph" not in frame or "nodes" not in frame["graph"]:
         return None
@@ -263,6 +254,28 @@ def frame_to_graph_data(frame, flags):
             "causal_info": causal_info
         }
 
+    return categories
+
+
+def frame_to_graph_data(frame, flags):
+    """
+    Convert a single frame (from JSON) into a PyG Data object
+    (graph only, no image yet), with ablation flags.
+    Returns Data or None if label can't be determined.
+    """
+    safety_status = determine_safety_status(frame.get("safe", ""))
+    if safety_status is None:
+        return None  # skip frames with unknown label
+
+    # Scene-level text fields
+    goal_text = frame.get("goal-oriented", "")
+    action_text = frame.get("Action Suggestions", "")
+    traffic_text = frame.get("Traffic Regulations Suggestions", "")
+
+    categories = frame_to_categories(frame)
+    if categories is None:
+        return None
+
     # Build NetworkX graph with scene semantics & flags
     G = build_graph_from_categories_and_semantics(
         categories,
@@ -360,6 +373,200 @@ def graph_to_data(G, label):
     return Data(x=x, edge_index=edge_index, y=y)
 
 
+# ============================================================
+# Direct JSON -> tensor graph construction (no NetworkX)
+# ============================================================
+
+# Node-type codes. Feature column of the one-hot is 3 + code.
+NODE_SAFE = 0
+NODE_CATEGORY = 1
+NODE_OBJECT = 2
+NODE_STATUS = 3
+NODE_POSITION = 4
+NODE_IMPORTANCE = 5
+NODE_SAFETY = 6
+NODE_CAUSAL = 7
+NODE_GOAL = 8
+NODE_ACTION = 9
+NODE_TRAFFIC = 10
+
+# 'subset' feature per node type (same layering as the NetworkX builder)
+NODE_TYPE_SUBSET = np.array([0, 1, 2, 3, 3, 3, 3, 3, 4, 4, 4], dtype=np.float32)
+
+# Object attribute nodes: (details key, name suffix, node type)
+OBJECT_ATTRIBUTE_NODES = (
+    ("status", "_status", NODE_STATUS),
+    ("position", "_position", NODE_POSITION),
+    ("importance", "_importance", NODE_IMPORTANCE),
+    ("safety", "_safety", NODE_SAFETY),
+    ("causal_info", "_causal", NODE_CAUSAL),
+)
+
+# Scene-level nodes: (frame key, node name, node type)
+SCENE_NODES = (
+    ("goal-oriented", "goal_oriented", NODE_GOAL),
+    ("Action Suggestions", "action_suggestions", NODE_ACTION),
+    ("Traffic Regulations Suggestions", "traffic_reg_suggestions", NODE_TRAFFIC),
+)
+
+# Ablation flag -> node type it removes
+FLAG_NODE_TYPES = {
+    "include_status": NODE_STATUS,
+    "include_position": NODE_POSITION,
+    "include_importance": NODE_IMPORTANCE,
+    "include_safety": NODE_SAFETY,
+    "include_causal": NODE_CAUSAL,
+    "include_goal": NODE_GOAL,
+    "include_action": NODE_ACTION,
+    "include_traffic": NODE_TRAFFIC,
+}
+
+NUM_NODE_FEATURES = 14
+
+
+def frame_to_named_graph(frame):
+    """
+    Full graph of a frame keyed by node name (shared by the array builder and
+    the streaming state). Returns None if the label or graph is missing, else
+        (safety_status, index {name: node id}, node_type [code per id],
+     edges {(src, dst): None}, labels [label text per id])
+    Node ids follow insertion order; a repeated name reuses the node and the
+    last writer sets its type and label, exactly like the NetworkX builder.
+    """
+    safety_status = determine_safety_status(frame.get("safe", ""))
+    if safety_status is None:
+        return None
+
+    categories = frame_to_categories(frame)
+    if categories is None:
+        return None
+
+    index = {"SAFE": 0}
+    node_type = [NODE_SAFE]
+    labels = ["Ego"]
+    edges = {}  # insertion-ordered set of (src, dst)
+
+    def add_node(name, code, label):
+        i = index.get(name)
+        if i is None:
+            i = index[name] = len(node_type)
+            node_type.append(code)
+            labels.append(str(label))
+        else:
+            node_type[i] = code
+            labels[i] = str(label)
+        return i
+
+    for category, objects in categories.items():
+        ci = add_node(category, NODE_CATEGORY, category)
+        edges[(0, ci)] = None
+        for obj_name, details in objects.items():
+            if isinstance(obj_name, str) and obj_name.lower() == "ego":
+                continue
+            oi = add_node(obj_name, NODE_OBJECT, obj_name)
+            edges[(ci, oi)] = None
+            for key, suffix, code in OBJECT_ATTRIBUTE_NODES:
+                if details.get(key, ""):
+                    edges[(oi, add_node(f"{obj_name}{suffix}", code, details[key]))] = None
+
+    for key, name, code in SCENE_NODES:
+        text = frame.get(key, "")
+        if isinstance(text, str) and text.strip():
+            edges[(0, add_node(name, code, text))] = None
+
+    return safety_status, index, node_type, edges, labels
+
+
+def frame_to_graph_arrays(frame):
+    """
+    Build the full (all groups included) graph of a frame as arrays:
+        node_type: int64 [N]    node-type code per node
+        edges:     int64 [E, 2] unique directed edges (src, dst)
+        label:     1.0 safe / 0.0 unsafe
+        labels:    list[str] [N]  node label text (G.nodes[n]["label"])
+    Node / edge order matches G.nodes() / G.edges() of the NetworkX builder.
+    Returns None if the label or graph is missing.
+    """
+    named = frame_to_named_graph(frame)
+    if named is None:
+        return None
+    safety_status, _, node_type, edges, labels = named
+
+    edge_arr = np.array(list(edges), dtype=np.int64).reshape(-1, 2)
+    # G.edges() walks adjacency: grouped by source node, insertion order within
+    edge_arr = edge_arr[np.argsort(edge_arr[:, 0], kind="stable")]
+
+    return {
+        "node_type": np.array(node_type, dtype=np.int64),
+        "edges": edge_arr,
+        "label": 1.0 if safety_status == "safe" else 0.0,
+        "labels": labels,
+    }
+
+
+def node_type_keep_mask(node_type, flags):
+    """Boolean mask of nodes kept under the ablation flags."""
+    keep = np.ones(len(node_type), dtype=bool)
+    for flag, code in FLAG_NODE_TYPES.items():
+        if not flags.get(flag, True):
+            keep &= node_type != code
+    return keep
+
+
+def ablate_graph_arrays(node_type, edges, flags):
+    """
+    Apply ablation flags to graph arrays and compute node features.
+    Works on a single graph or on many graphs concatenated with global
+    node indices in `edges` (masking and degree counts never cross graphs).
+
+    Returns:
+        x:         float32 [N_kept, 14]  same features as graph_to_data
+        edges:     int64 [E_kept, 2]     directed edges, reindexed to kept nodes
+        keep:      bool [N]              node mask
+        edge_keep: bool [E]              edge mask
+    """
+    keep = node_type_keep_mask(node_type, flags)
+    new_index = np.cumsum(keep) - 1
+    edge_keep = keep[edges[:, 0]] & keep[edges[:, 1]]
+    edges = new_index[edges[edge_keep]]
+    node_type = node_type[keep]
+    num_nodes = len(node_type)
+
+    x = np.zeros((num_nodes, NUM_NODE_FEATURES), dtype=np.float32)
+    x[:, 0] = NODE_TYPE_SUBSET[node_type]
+    x[:, 1] = np.bincount(edges[:, 1], minlength=num_nodes)
+    x[:, 2] = np.bincount(edges[:, 0], minlength=num_nodes)
+    x[np.arange(num_nodes), 3 + node_type] = 1.0
+    return x, edges, keep, edge_keep
+
+
+def undirected_edge_index(edges):
+    """[E, 2] directed edges -> [2, 2E] edge_index, each edge followed by its reverse."""
+    return np.ascontiguousarray(np.stack([edges, edges[:, ::-1]], axis=1).reshape(-1, 2).T)
+
+
+def graph_arrays_to_tensors(node_type, edges, flags):
+    """
+    Apply ablation flags to a full graph and build (x, edge_index) tensors
+    with the same 14 features and edge layout as graph_to_data.
+    """
+    x, edges, _, _ = ablate_graph_arrays(node_type, edges, flags)
+    return torch.from_numpy(x), torch.from_numpy(undirected_edge_index(edges))
+
+
+def frame_to_graph_data_fast(frame, flags):
+    """
+    Drop-in replacement for frame_to_graph_data that skips NetworkX and the
+    per-node feature loop. Returns Data or None if label can't be determined.
+    """
+    arrays = frame_to_graph_arrays(frame)
+    if arrays is None:
+        return None
+    x, edge_index = graph_arrays_to_tensors(arrays["node_type"], arrays["edges"], flags)
+    y = torch.tensor([arrays["label"]], dtype=torch.float)
+    return Data(x=x, edge_index=edge_index, y=y)
+
+
 def load_multimodal_dataset_variant(json_root, frames_root, flags):
     """
     Load graphs + image paths for a given ablation variant.
@@ -390,7 +597,7 @@ def load_multimodal_dataset_variant(json_root, frames_root, flags):
                 continue
             image_path = os.path.join(image_dir, image_id)
 
-            data_obj = frame_to_graph_data(frame, flags)
+            data_obj = frame_to_graph_data_fast(frame, flags)
             if data_obj is None:
                 continue
 
@@ -404,6 +611,357 @@ def load_multimodal_dataset_variant(json_root, frames_root, flags):
     return graphs, image_paths
 
 
+# ============================================================
+# Build-once graph cache (all ablations are masks over it)
+# ============================================================
+
+GRAPH_CACHE_VERSION = 2
+
+
+def _json_sources(json_root):
+    """{json_file: [size, mtime_ns]} in loader order; used to validate the cache."""
+    sources = {}
+    for json_file in os.listdir(json_root):
+        if json_file.endswith(".json"):
+            st = os.stat(os.path.join(json_root, json_file))
+            sources[json_file] = [st.st_size, st.st_mtime_ns]
+    return sources
+
+
+def build_graph_cache(json_root, frames_root, cache_path=None):
+    """
+    Read every JSON once and store the full graph of every frame as
+    concatenated tensors:
+        node_type [sum N]     semantic group of each node (NODE_* code)
+        node_ptr  [G + 1]     node offsets per graph
+        edges     [sum E, 2]  directed edges, global node indices
+        edge_ptr  [G + 1]     edge offsets per graph
+        y         [G]         1.0 safe / 0.0 unsafe
+        label_id  [sum N]     node label text as an index into `labels`
+        labels                list[str], every distinct node label in the corpus
+        image_paths           list[str], image of graph i
+    An edge belongs to the group of its endpoints: it is dropped whenever
+    either endpoint is masked out, so ablations need only the node tags.
+    """
+    sources = _json_sources(json_root)
+    node_types, edge_chunks, labels, image_paths = [], [], [], []
+    label_ids, label_vocab = [], {}
+    node_counts, edge_counts = [], []
+    offset = 0
+
+    for json_file in sources:
+        video_name = os.path.splitext(json_file)[0]
+        json_path = os.path.join(json_root, json_file)
+        image_dir = os.path.join(frames_root, video_name)
+
+        print(f"[GraphCache] Reading {json_path}")
+        with open(json_path, "r") as f:
+            data = json.load(f)
+
+        for frame in data:
+            image_id = frame.get("image_id", None)
+            if image_id is None:
+                continue
+            arrays = frame_to_graph_arrays(frame)
+            if arrays is None:
+                continue
+
+            num_nodes = len(arrays["node_type"])
+            node_types.append(arrays["node_type"])
+            label_ids.append(np.array(
+                [label_vocab.setdefault(text, len(label_vocab)) for text in arrays["labels"]],
+                dtype=np.int64
+            ))
+            edge_chunks.append(arrays["edges"] + offset)
+            node_counts.append(num_nodes)
+            edge_counts.append(len(arrays["edges"]))
+            labels.append(arrays["label"])
+            image_paths.append(os.path.join(image_dir, image_id))
+            offset += num_nodes
+
+    def ptr(counts):
+        out = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=out[1:])
+        return torch.from_numpy(out)
+
+    cache = {
+        "version": GRAPH_CACHE_VERSION,
+        "sources": sources,
+        "node_type": torch.from_numpy(np.concatenate(node_types) if node_types else np.zeros(0, dtype=np.int64)),
+        "node_ptr": ptr(node_counts),
+        "edges": torch.from_numpy(np.concatenate(edge_chunks) if edge_chunks else np.zeros((0, 2), dtype=np.int64)),
+        "edge_ptr": ptr(edge_counts),
+        "y": torch.tensor(labels, dtype=torch.float),
+        "label_id": torch.from_numpy(np.concatenate(label_ids) if label_ids else np.zeros(0, dtype=np.int64)),
+        "labels": list(label_vocab),
+        "image_paths": image_paths,
+    }
+    if cache_path is not None:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        torch.save(cache, tmp_path)
+        os.replace(tmp_path, cache_path)
+        print(f"[GraphCache] Saved {len(image_paths)} graphs to {cache_path}")
+    return cache
+
+
+def load_graph_cache(json_root, frames_root, cache_path):
+    """
+    Load the graph cache (memory-mapped), rebuilding it if it is missing,
+    from an older version, or any JSON file was added/removed/modified.
+    """
+    if os.path.exists(cache_path):
+        cache = torch.load(cache_path, mmap=True)
+        if cache.get("version") == GRAPH_CACHE_VERSION and cache.get("sources") == _json_sources(json_root):
+            print(f"[GraphCache] Loaded {len(cache['image_paths'])} graphs from {cache_path}")
+            return cache
+        print("[GraphCache] Cache is stale, rebuilding")
+    return build_graph_cache(json_root, frames_root, cache_path)
+
+
+def graphs_from_cache(cache, flags, label_embeddings=None):
+    """
+    Ablation variant from the cache: one mask-and-reindex over all graphs at
+    once, then split into per-graph Data objects. Same result as
+    load_multimodal_dataset_variant(json_root, frames_root, flags).
+
+    label_embeddings: optional [len(cache["labels"]), D] array (see
+    label_embeddings_for_cache); its rows are appended to the 14 structural
+    features of every node, giving 14 + D input channels.
+
+    Returns:
+        graphs: list[Data] (with .image_idx field)
+        image_paths: list[str]
+    """
+    node_type = cache["node_type"].numpy()
+    edges = cache["edges"].numpy()
+    node_ptr = cache["node_ptr"].numpy()
+    edge_ptr = cache["edge_ptr"].numpy()
+    num_graphs = len(node_ptr) - 1
+
+    x, edges, keep, edge_keep = ablate_graph_arrays(node_type, edges, flags)
+    if label_embeddings is not None:
+        text_x = np.asarray(label_embeddings, dtype=np.float32)[cache["label_id"].numpy()[keep]]
+        x = np.concatenate([x, text_x], axis=1)
+
+    # Per-graph counts after masking
+    node_graph = np.repeat(np.arange(num_graphs), np.diff(node_ptr))
+    edge_graph = np.repeat(np.arange(num_graphs), np.diff(edge_ptr))[edge_keep]
+    new_node_counts = np.bincount(node_graph[keep], minlength=num_graphs)
+    new_edge_counts = np.bincount(edge_graph, minlength=num_graphs)
+    new_node_ptr = np.concatenate([[0], np.cumsum(new_node_counts)])
+
+    # Global -> graph-local node indices, then undirected layout
+    edge_index = undirected_edge_index(edges - new_node_ptr[edge_graph][:, None])
+
+    x_parts = np.split(x, new_node_ptr[1:-1])
+    ei_parts = np.split(edge_index, np.cumsum(2 * new_edge_counts)[:-1], axis=1)
+    y = cache["y"]
+
+    graphs = []
+    for i in range(num_graphs):
+        data_obj = Data(
+            x=torch.from_numpy(x_parts[i]),
+            edge_index=torch.from_numpy(np.ascontiguousarray(ei_parts[i])),
+            y=y[i:i + 1].clone(),
+        )
+        data_obj.image_idx = i
+        graphs.append(data_obj)
+
+    print(f"Built {len(graphs)} graphs from cache for flags={flags}.")
+    return graphs, list(cache["image_paths"])
+
+
+# ============================================================
+# Node label text embeddings (deduplicated, memory-mapped)
+# ============================================================
+
+DEFAULT_LABEL_ENCODER = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def sentence_encoder(model_name=DEFAULT_LABEL_ENCODER, batch_size=256):
+    """Callable list[str] -> float32 [n, D] using a local sentence-transformers model."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError(
+            "Node text features need sentence-transformers (pip install sentence-transformers)"
+        )
+    model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(texts):
+        return model.encode(
+            texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+    return encode
+
+
+class LabelEmbeddingStore:
+    """
+    Every distinct node label string encoded once for the whole corpus:
+        <store_dir>/label_vocab.json       {"encoder", "dim", "labels"}  (row i = labels[i])
+        <store_dir>/label_embeddings.f32   float32 [V, dim], appended as new labels appear
+    """
+    def __init__(self, store_dir, encoder_name=DEFAULT_LABEL_ENCODER):
+        self.store_dir = store_dir
+        self.vocab_path = os.path.join(store_dir, "label_vocab.json")
+        self.matrix_path = os.path.join(store_dir, "label_embeddings.f32")
+        self.encoder_name = encoder_name
+        self.labels = []
+        self.dim = None
+        os.makedirs(store_dir, exist_ok=True)
+
+        if os.path.exists(self.vocab_path) and os.path.exists(self.matrix_path):
+            with open(self.vocab_path, "r") as f:
+                vocab = json.load(f)
+            if vocab.get("encoder") == encoder_name and \
+                    os.path.getsize(self.matrix_path) == len(vocab["labels"]) * vocab["dim"] * 4:
+                self.labels = vocab["labels"]
+                self.dim = vocab["dim"]
+        if not self.labels and os.path.exists(self.matrix_path):
+            os.remove(self.matrix_path)
+        self.row_of = {text: i for i, text in enumerate(self.labels)}
+
+    def add(self, labels, encoder=None):
+        """Encode labels not stored yet (encoder: list[str] -> [n, D]; default sentence_encoder)."""
+        todo = [text for text in dict.fromkeys(labels) if text not in self.row_of]
+        if not todo:
+            return 0
+        encoder = encoder or sentence_encoder(self.encoder_name)
+        vectors = np.ascontiguousarray(encoder(todo), dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        with open(self.matrix_path, "ab") as f:
+            f.write(vectors.tobytes())
+        for text in todo:
+            self.row_of[text] = len(self.labels)
+            self.labels.append(text)
+        tmp_path = self.vocab_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"encoder": self.encoder_name, "dim": self.dim, "labels": self.labels}, f)
+        os.replace(tmp_path, self.vocab_path)
+        print(f"[LabelStore] Encoded {len(todo)} new labels ({len(self.labels)} total)")
+        return len(todo)
+
+    def matrix(self):
+        return np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(len(self.labels), self.dim))
+
+    def lookup(self, labels):
+        return np.asarray(self.matrix()[np.array([self.row_of[t] for t in labels], dtype=np.int64)])
+
+
+def label_embeddings_for_cache(cache, store_dir, encoder_name=DEFAULT_LABEL_ENCODER, encoder=None):
+    """[len(cache["labels"]), D] text embeddings aligned with the cache's label ids."""
+    store = LabelEmbeddingStore(store_dir, encoder_name)
+    store.add(cache["labels"], encoder)
+    return store.lookup(cache["labels"])
+
+
+# ============================================================
+# On-device graph batching (no per-step CPU collation)
+# ============================================================
+
+class DeviceBatch:
+    """Minimal stand-in for a PyG Batch with the fields the training loop uses."""
+    def __init__(self, x, edge_index, batch, y, image_idx, num_graphs):
+        self.x = x
+        self.edge_index = edge_index
+        self.batch = batch
+        self.y = y
+        self.image_idx = image_idx
+        self.num_graphs = num_graphs
+
+    def to(self, device):
+        return self  # already resident
+
+
+class DeviceGraphStore:
+    """
+    All graphs of a split pre-collated once into device tensors:
+        x [sum N, F], edge_index [2, sum E] (graph-local node ids), y [G], image_idx [G]
+    with per-graph node/edge offset pointers. Mini-batches are formed by index
+    gathering on the device. Pointer copies are also kept on the host, so batch
+    sizes are known without a device sync.
+    """
+    def __init__(self, graphs, device):
+        self.device = torch.device(device)
+        self.num_graphs = len(graphs)
+
+        self.node_counts_host = np.array([g.num_nodes for g in graphs], dtype=np.int64)
+        self.edge_counts_host = np.array([g.edge_index.size(1) for g in graphs], dtype=np.int64)
+        node_ptr = np.concatenate([[0], np.cumsum(self.node_counts_host)])
+        edge_ptr = np.concatenate([[0], np.cumsum(self.edge_counts_host)])
+
+        self.x = torch.cat([g.x for g in graphs], dim=0).to(self.device)
+        self.edge_index = torch.cat([g.edge_index for g in graphs], dim=1).to(self.device)
+        self.y = torch.cat([g.y.view(-1) for g in graphs], dim=0).to(self.device)
+        self.image_idx = torch.tensor([int(g.image_idx) for g in graphs], dtype=torch.long, device=self.device)
+        self.node_ptr = torch.from_numpy(node_ptr[:-1]).to(self.device)
+        self.edge_ptr = torch.from_numpy(edge_ptr[:-1]).to(self.device)
+        self.node_counts = torch.from_numpy(self.node_counts_host).to(self.device)
+        self.edge_counts = torch.from_numpy(self.edge_counts_host).to(self.device)
+
+    def __len__(self):
+        return self.num_graphs
+
+    def _ranges(self, ids, counts, starts, total):
+        """Flat element indices of the selected graphs + owning batch position per element."""
+        owner = torch.repeat_interleave(
+            torch.arange(len(counts), device=self.device), counts, output_size=total
+        )
+        new_ptr = torch.cumsum(counts, dim=0) - counts
+        flat = starts[owner] + torch.arange(total, device=self.device) - new_ptr[owner]
+        return flat, owner, new_ptr
+
+    def batch(self, ids_host):
+        """DeviceBatch of the graphs with indices ids_host (1D int numpy array)."""
+        ids = torch.from_numpy(ids_host).to(self.device, non_blocking=True)
+        total_nodes = int(self.node_counts_host[ids_host].sum())
+        total_edges = int(self.edge_counts_host[ids_host].sum())
+
+        node_idx, batch_vec, new_node_ptr = self._ranges(
+            ids, self.node_counts[ids], self.node_ptr[ids], total_nodes
+        )
+        edge_idx, edge_owner, _ = self._ranges(
+            ids, self.edge_counts[ids], self.edge_ptr[ids], total_edges
+        )
+        edge_index = self.edge_index[:, edge_idx] + new_node_ptr[edge_owner]
+
+        return DeviceBatch(
+            x=self.x[node_idx],
+            edge_index=edge_index,
+            batch=batch_vec,
+            y=self.y[ids],
+            image_idx=self.image_idx[ids],
+            num_graphs=len(ids_host),
+        )
+
+
+class DeviceGraphLoader:
+    """Iterates DeviceBatch mini-batches over a DeviceGraphStore (DataLoader-like)."""
+    def __init__(self, store, batch_size, shuffle=False):
+        self.store = store
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+
+    def __len__(self):
+        return (len(self.store) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        if self.shuffle:
+            order = torch.randperm(len(self.store)).numpy()
+        else:
+            order = np.arange(len(self.store))
+        for start in range(0, len(order), self.batch_size):
+            yield self.store.batch(order[start:start + self.batch_size])
+
+
+def make_device_loader(graphs, batch_size, shuffle, device):
+    if not graphs:
+        return None
+    return DeviceGraphLoader(DeviceGraphStore(graphs, device), batch_size, shuffle=shuffle)
+
+
 # ============================================================
 # Image preprocessing
 # ============================================================
@@ -436,15 +994,361 @@ def load_images_from_indices(image_idx_tensor, all_image_paths, device, transfor
     return imgs
 
 
+# ============================================================
+# Image sources: how a batch's images reach the model
+# ============================================================
+
+class ImageSource:
+    """
+    Produces the image input of MultiModalModel for a batch.
+    embedding_dim is None for pixel sources (model builds its CNN).
+    """
+    embedding_dim = None
+
+    def make_loader(self, graphs, batch_size, shuffle):
+        if not graphs:
+            return None
+        return DataLoader(graphs, batch_size=batch_size, shuffle=shuffle)
+
+    def __call__(self, batch, device):
+        raise NotImplementedError
+
+
+class PathImageSource(ImageSource):
+    """Decode + transform JPEGs from disk for every batch (original behaviour)."""
+    def __init__(self, image_paths, transform=None):
+        self.image_paths = image_paths
+        self.transform = transform or get_image_transform()
+
+    def __call__(self, batch, device):
+        return load_images_from_indices(batch.image_idx, self.image_paths, device, self.transform)
+
+
+# Frozen ResNet-18 weights for embeddings mode, by name -> encoder tag of the
+# store rows they produce. "imagenet" needs the torchvision checkpoint (downloaded
+# once into the torch hub cache); "random" is a seeded random init, offline but
+# only a fixed random projection of the image.
+EMBEDDING_WEIGHTS = {
+    "imagenet": "resnet18-imagenet1k-v1",
+    "random": "resnet18-seed42",
+}
+DEFAULT_EMBEDDING_WEIGHTS = "imagenet"
+DEFAULT_ENCODER_TAG = EMBEDDING_WEIGHTS[DEFAULT_EMBEDDING_WEIGHTS]
+
+
+class ImageEmbeddingStore:
+    """
+    Frozen-encoder image embeddings in a memory-mapped float32 [N, dim] file,
+    keyed by image path:
+        <store_dir>/image_embeddings.f32         raw rows, appended as needed
+        <store_dir>/image_embeddings_index.json  {"encoder", "dim", "paths"}
+    Rows are only valid for the encoder they were computed with, so a store
+    whose encoder tag differs is discarded.
+    """
+    def __init__(self, store_dir, encoder_tag=DEFAULT_ENCODER_TAG, dim=512):
+        self.store_dir = store_dir
+        self.matrix_path = os.path.join(store_dir, "image_embeddings.f32")
+        self.index_path = os.path.join(store_dir, "image_embeddings_index.json")
+        self.encoder_tag = encoder_tag
+        self.dim = dim
+        self.paths = []
+        os.makedirs(store_dir, exist_ok=True)
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if index.get("encoder") == encoder_tag and index.get("dim") == dim:
+                self.paths = index["paths"]
+        n_bytes = len(self.paths) * dim * 4
+        if not os.path.exists(self.matrix_path) or os.path.getsize(self.matrix_path) < n_bytes:
+            self.paths = []
+            n_bytes = 0
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(n_bytes)  # drop rows not covered by the index
+        self.row_of = {p: i for i, p in enumerate(self.paths)}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def missing(self, image_paths):
+        seen = set()
+        out = []
+        for p in image_paths:
+            if p not in self.row_of and p not in seen:
+                seen.add(p)
+                out.append(p)
+        return out
+
+    def append(self, image_paths, embeddings):
+        """Append rows for new paths; embeddings: float32 array [len(image_paths), dim]."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if embeddings.shape != (len(image_paths), self.dim):
+            raise ValueError(f"Expected embeddings of shape {(len(image_paths), self.dim)}, got {embeddings.shape}")
+        with open(self.matrix_path, "ab") as f:
+            f.write(embeddings.tobytes())
+        for p in image_paths:
+            self.row_of[p] = len(self.paths)
+            self.paths.append(p)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"encoder": self.encoder_tag, "dim": self.dim, "paths": self.paths}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def matrix(self):
+        """Read-only memmap of all stored rows."""
+        if not self.paths:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(len(self.paths), self.dim))
+
+    def lookup(self, image_paths):
+        """Embeddings [len(image_paths), dim] in the order of image_paths."""
+        rows = np.array([self.row_of[p] for p in image_paths], dtype=np.int64)
+        return np.asarray(self.matrix()[rows])
+
+
+def compute_image_embeddings(image_paths, store_dir, encoder=None, device=None, batch_size=64,
+                             encoder_tag=None, weights=DEFAULT_EMBEDDING_WEIGHTS):
+    """
+    Fill an ImageEmbeddingStore with embeddings for every path not yet stored.
+    The default encoder is the same ResNet-18 as ImageEncoder, kept frozen, with
+    `weights` from EMBEDDING_WEIGHTS: ImageNet-pretrained ("imagenet", default)
+    or a random init with seed 42 ("random"). A custom encoder needs its own
+    encoder_tag, so its rows never mix with another encoder's.
+    """
+    if weights not in EMBEDDING_WEIGHTS:
+        raise ValueError(f"Unknown embedding weights: {weights}")
+    if encoder_tag is None:
+        if encoder is not None:
+            raise ValueError("compute_image_embeddings: pass an encoder_tag for a custom encoder")
+        encoder_tag = EMBEDDING_WEIGHTS[weights]
+    store = ImageEmbeddingStore(store_dir, encoder_tag)
+    todo = store.missing(image_paths)
+    if not todo:
+        return store
+
+    device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if encoder is None and weights == "imagenet":
+        try:
+            encoder = ImageEncoder(pretrained=True)
+        except OSError as e:
+            raise RuntimeError(
+                "Could not load the ImageNet ResNet-18 weights for image embeddings "
+                f"({e}); run once with network access, or use weights='random' (--embedding-weights random)"
+            ) from e
+    elif encoder is None:
+        # Seeded init without touching the caller's global RNG state
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(42)
+            encoder = ImageEncoder()
+    encoder = encoder.to(device).eval()
+    transform = get_image_transform()
+
+    print(f"[Embeddings] Encoding {len(todo)} images into {store_dir}")
+    with torch.no_grad():
+        for start in range(0, len(todo), batch_size):
+            chunk = todo[start:start + batch_size]
+            images = load_images_from_indices(torch.arange(len(chunk)), chunk, device, transform)
+            store.append(chunk, encoder(images).float().cpu().numpy())
+    return store
+
+
+class EmbeddingImageSource(ImageSource):
+    """
+    Precomputed embeddings gathered by image_idx; no image I/O during training.
+    The [N, dim] table (aligned with image_paths) is moved to the device once.
+    """
+    def __init__(self, store, image_paths):
+        self.embeddings = torch.from_numpy(store.lookup(image_paths))
+        self.embedding_dim = self.embeddings.size(1)
+
+    def __call__(self, batch, device):
+        if self.embeddings.device != device:
+            self.embeddings = self.embeddings.to(device)
+        return self.embeddings[batch.image_idx.to(device)]
+
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def load_resized_uint8(path, size):
+    """PIL decode + Resize((size, size)) -> uint8 CHW array (same pixels as get_image_transform before ToTensor)."""
+    img = Image.open(path).convert("RGB")
+    img = transforms.functional.resize(img, [size, size])
+    return np.array(img, dtype=np.uint8).transpose(2, 0, 1)
+
+
+class ImageShard:
+    """
+    Every referenced frame preprocessed once into one memory-mapped
+    uint8 [N, 3, size, size] file:
+        <shard_dir>/images_u8.bin
+        <shard_dir>/images_u8_index.json   {"size", "paths"}
+    The memmap is opened lazily (copy-on-write), so the object pickles
+    cheaply into DataLoader workers.
+    """
+    def __init__(self, shard_dir, size=224):
+        self.shard_dir = shard_dir
+        self.data_path = os.path.join(shard_dir, "images_u8.bin")
+        self.index_path = os.path.join(shard_dir, "images_u8_index.json")
+        self.size = size
+        self.paths = []
+        if os.path.exists(self.index_path) and os.path.exists(self.data_path):
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if index.get("size") == size and \
+                    os.path.getsize(self.data_path) == len(index["paths"]) * 3 * size * size:
+                self.paths = index["paths"]
+        self.row_of = {p: i for i, p in enumerate(self.paths)}
+        self._images = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.memmap(
+                self.data_path, dtype=np.uint8, mode="c",
+                shape=(len(self.paths), 3, self.size, self.size)
+            )
+        return self._images
+
+    def rows(self, image_paths):
+        return np.array([self.row_of[p] for p in image_paths], dtype=np.int64)
+
+    @classmethod
+    def build(cls, image_paths, shard_dir, size=224, num_workers=8):
+        """
+        Write (or reuse) a shard covering image_paths. Decoding is spread over
+        a thread pool (PIL releases the GIL); rows are written straight into the memmap.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        shard = cls(shard_dir, size)
+        if shard.paths and not any(p not in shard.row_of for p in image_paths):
+            return shard
+
+        paths = list(dict.fromkeys(list(shard.paths) + list(image_paths)))
+        os.makedirs(shard_dir, exist_ok=True)
+        tmp_path = shard.data_path + ".tmp"
+        out = np.memmap(tmp_path, dtype=np.uint8, mode="w+", shape=(len(paths), 3, size, size))
+
+        print(f"[ImageShard] Writing {len(paths)} frames to {shard.data_path}")
+
+        def write(i):
+            out[i] = load_resized_uint8(paths[i], size)
+
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            list(pool.map(write, range(len(paths))))
+        out.flush()
+        del out
+
+        os.replace(tmp_path, shard.data_path)
+        with open(shard.index_path + ".tmp", "w") as f:
+            json.dump({"size": size, "paths": paths}, f)
+        os.replace(shard.index_path + ".tmp", shard.index_path)
+        return cls(shard_dir, size)
+
+
+class GraphImageDataset(torch.utils.data.Dataset):
+    """
+    Graphs paired with their preprocessed frame: item i is graph i with an
+    extra `image` field, uint8 [1, 3, H, W] sliced from the shard (no copy
+    until collation). PyG's collate stacks it into [B, 3, H, W].
+    """
+    def __init__(self, graphs, shard, shard_rows):
+        self.graphs = graphs
+        self.shard = shard
+        self.shard_rows = shard_rows  # image_idx -> shard row
+
+    def __len__(self):
+        return len(self.graphs)
+
+    def __getitem__(self, i):
+        g = self.graphs[i]
+        row = self.shard_rows[int(g.image_idx)]
+        data_obj = Data(x=g.x, edge_index=g.edge_index, y=g.y)
+        data_obj.image_idx = g.image_idx
+        data_obj.image = torch.from_numpy(self.shard.images[row:row + 1])
+        return data_obj
+
+
+class ShardImageSource(ImageSource):
+    """
+    Pixels for a trainable CNN from an ImageShard. Batches carry uint8 images
+    prefetched by DataLoader workers; scaling and normalisation run on the device.
+    """
+    def __init__(self, shard, image_paths, num_workers=4):
+        self.shard = shard
+        self.shard_rows = shard.rows(image_paths)
+        self.num_workers = num_workers
+        self._mean = None
+        self._std = None
+
+    def make_loader(self, graphs, batch_size, shuffle):
+        if not graphs:
+            return None
+        return DataLoader(
+            GraphImageDataset(graphs, self.shard, self.shard_rows),
+            batch_size=batch_size,
+            shuffle=shuffle,
+            num_workers=self.num_workers,
+            pin_memory=torch.cuda.is_available(),
+            persistent_workers=self.num_workers > 0,
+        )
+
+    def __call__(self, batch, device):
+        images = getattr(batch, "image", None)
+        if images is None:
+            rows = self.shard_rows[batch.image_idx.cpu().numpy()]
+            images = torch.from_numpy(self.shard.images[rows])
+        if self._mean is None or self._mean.device != device:
+            self._mean = torch.tensor(IMAGENET_MEAN, device=device).view(1, 3, 1, 1)
+            self._std = torch.tensor(IMAGENET_STD, device=device).view(1, 3, 1, 1)
+        images = images.to(device, non_blocking=True).float().div_(255.0)
+        return (images - self._mean) / self._std
+
+
+IMAGE_MODES = ("pixels", "embeddings", "shard")
+
+
+def make_image_source(image_mode, image_paths, output_root, num_workers=4,
+                      embedding_weights=DEFAULT_EMBEDDING_WEIGHTS):
+    """
+    Image source for a run, by mode:
+      "pixels":     train ResNet-18 end-to-end on JPEGs decoded every batch
+      "embeddings": frozen ResNet-18 (embedding_weights, ImageNet by default),
+                    embeddings computed once and memory-mapped
+      "shard":      train ResNet-18 on a preprocessed uint8 224x224 shard, worker prefetch
+    Stores live under output_root and are reused across calls.
+    """
+    if image_mode == "pixels":
+        return PathImageSource(image_paths)
+    if image_mode == "embeddings":
+        store = compute_image_embeddings(
+            image_paths, os.path.join(output_root, "image_embeddings"), weights=embedding_weights
+        )
+        return EmbeddingImageSource(store, image_paths)
+    if image_mode == "shard":
+        shard = ImageShard.build(image_paths, os.path.join(output_root, "image_shard"))
+        return ShardImageSource(shard, image_paths, num_workers=num_workers)
+    raise ValueError(f"Unknown image_mode: {image_mode}")
+
+
 # ============================================================
 # Multimodal model: Image + Graph, with multiple GNN backbones
 # ============================================================
 
 class ImageEncoder(nn.Module):
     """ResNet-18 backbone producing a global image embedding."""
-    def __init__(self):
+    def __init__(self, pretrained=False):
         super().__init__()
-        base = models.resnet18(weights=None)  # no pretrained download
+        # Random init unless pretrained (ImageNet checkpoint, downloaded on first use)
+        weights = models.ResNet18_Weights.IMAGENET1K_V1 if pretrained else None
+        base = models.resnet18(weights=weights)
         modules = list(base.children())[:-1]  # remove final FC
         self.cnn = nn.Sequential(*modules)
         self.out_dim = base.fc.in_features  # usually 512
@@ -462,14 +1366,17 @@ class GraphEncoderGCN(nn.Module):
         self.conv2 = GCNConv(hidden_channels, hidden_channels)
         self.hidden_channels = hidden_channels
 
-    def forward(self, x, edge_index, batch):
+    def node_embeddings(self, x, edge_index):
         x = self.conv1(x, edge_index)
         x = F.relu(x)
         x = F.dropout(x, p=0.2, training=self.training)
 
         x = self.conv2(x, edge_index)
         x = F.relu(x)
+        return x
 
+    def forward(self, x, edge_index, batch):
+        x = self.node_embeddings(x, edge_index)
         x = global_mean_pool(x, batch)
         return x
 
@@ -481,14 +1388,17 @@ class GraphEncoderSAGE(nn.Module):
         self.conv2 = SAGEConv(hidden_channels, hidden_channels)
         self.hidden_channels = hidden_channels
 
-    def forward(self, x, edge_index, batch):
+    def node_embeddings(self, x, edge_index):
         x = self.conv1(x, edge_index)
         x = F.relu(x)
         x = F.dropout(x, p=0.2, training=self.training)
 
         x = self.conv2(x, edge_index)
         x = F.relu(x)
+        return x
 
+    def forward(self, x, edge_index, batch):
+        x = self.node_embeddings(x, edge_index)
         x = global_mean_pool(x, batch)
         return x
 
@@ -502,14 +1412,17 @@ class GraphEncoderGAT(nn.Module):
                              concat=False, dropout=0.2)
         self.hidden_channels = hidden_channels
 
-    def forward(self, x, edge_index, batch):
+    def node_embeddings(self, x, edge_index):
         x = self.conv1(x, edge_index)
         x = F.elu(x)
         x = F.dropout(x, p=0.3, training=self.training)
 
         x = self.conv2(x, edge_index)
         x = F.elu(x)
+        return x
 
+    def forward(self, x, edge_index, batch):
+        x = self.node_embeddings(x, edge_index)
         x = global_mean_pool(x, batch)
         return x
 
@@ -533,14 +1446,17 @@ class GraphEncoderTransformer(nn.Module):
         )
         self.hidden_channels = hidden_channels
 
-    def forward(self, x, edge_index, batch):
+    def node_embeddings(self, x, edge_index):
         x = self.conv1(x, edge_index)
         x = F.relu(x)
         x = F.dropout(x, p=0.3, training=self.training)
 
         x = self.conv2(x, edge_index)
         x = F.relu(x)
+        return x
 
+    def forward(self, x, edge_index, batch):
+        x = self.node_embeddings(x, edge_index)
         x = global_mean_pool(x, batch)
         return x
 
@@ -549,10 +1465,13 @@ class MultiModalModel(nn.Module):
     """
     Full multimodal model:
       - GraphEncoder (one of: GCN, GraphSAGE, GAT, Transformer)
-      - ImageEncoder (ResNet-18)
+      - ImageEncoder (ResNet-18), or precomputed image embeddings
       - Fusion + classifier -> safe vs unsafe.
+
+    With image_embedding_dim set, forward() takes [B, image_embedding_dim]
+    embeddings instead of pixels and no CNN is built.
     """
-    def __init__(self, in_channels, graph_backbone: str = "Transformer"):
+    def __init__(self, in_channels, graph_backbone: str = "Transformer", image_embedding_dim=None):
         super().__init__()
 
         graph_backbone = graph_backbone.lower()
@@ -571,8 +1490,13 @@ class MultiModalModel(nn.Module):
         else:
             raise ValueError(f"Unknown graph_backbone: {graph_backbone}")
 
-        self.image_enc = ImageEncoder()
-        fusion_in_dim = g_hidden + self.image_enc.out_dim
+        if image_embedding_dim is None:
+            self.image_enc = ImageEncoder()
+            img_dim = self.image_enc.out_dim
+        else:
+            self.image_enc = nn.Identity()
+            img_dim = image_embedding_dim
+        fusion_in_dim = g_hidden + img_dim
 
         fusion_hidden = 128
         self.classifier = nn.Sequential(
@@ -584,52 +1508,134 @@ class MultiModalModel(nn.Module):
 
     def forward(self, x, edge_index, batch, images):
         g_emb = self.graph_enc(x, edge_index, batch)   # [B, g_hidden]
-        img_emb = self.image_enc(images)               # [B, img_dim]
+        img_emb = self.image_enc(images)               # [B, img_dim] (identity for embeddings)
         fused = torch.cat([g_emb, img_emb], dim=-1)
         out = self.classifier(fused).view(-1)          # [B]
         return out
 
 
+def load_model_checkpoint(path, device="cpu"):
+    """Rebuild a MultiModalModel from the model.pt written by the training function."""
+    ckpt = torch.load(path, map_location=device)
+    model = MultiModalModel(
+        in_channels=ckpt["in_channels"],
+        graph_backbone=ckpt["graph_backbone"],
+        image_embedding_dim=ckpt["image_embedding_dim"]
+    )
+    model.load_state_dict(ckpt["state_dict"])
+    return model.to(device).eval()
+
 # ============================================================
 # Metrics, evaluation, training
 # ============================================================
 
-def compute_binary_metrics(logits, labels):
+def _empty_binary_metrics():
+    return {
+        "num_samples": 0,
+        "accuracy": 0.0,
+        "precision": 0.0,
+        "recall": 0.0,
+        "f1": 0.0,
+        "tp": 0,
+        "tn": 0,
+        "fp": 0,
+        "fn": 0,
+        "auroc": None,
+        "auprc": None,
+        "best_f1": 0.0,
+        "best_threshold": 0.5,
+        "ece": 0.0,
+    }
+
+
+def compute_binary_metrics(logits, labels, threshold=0.5, n_bins=15, return_curves=False):
     """
-    Compute accuracy, precision, recall, F1, confusion matrix.
+    Accuracy / precision / recall / F1 / confusion matrix at `threshold`, plus
+    AUROC, AUPRC (average precision), best-F1 threshold and expected
+    calibration error.
+
+    Everything is computed on the tensors' device from a single descending
+    sort: cumulative TP/FP counts give every ROC / PR point, tie groups are
+    handled with masks (no data-dependent shapes), and all results are copied
+    to the host in one transfer.
     logits: tensor [N]
     labels: tensor [N] with values 0 or 1
+    With return_curves=True the PR/ROC curves and calibration bins are included.
+    Undefined metrics (AUROC of a single-class split, AUPRC without
+    positives, anything non-finite) are None.
     """
-    probs = torch.sigmoid(logits)
-    preds = (probs >= 0.5).float()
-
-    labels = labels.float()
+    logits = logits.detach().float().view(-1)
+    labels = labels.detach().float().view(-1).to(logits.device)
     N = labels.numel()
-
     if N == 0:
-        return {
-            "num_samples": 0,
-            "accuracy": 0.0,
-            "precision": 0.0,
-            "recall": 0.0,
-            "f1": 0.0,
-            "tp": 0,
-            "tn": 0,
-            "fp": 0,
-            "fn": 0
-        }
+        return _empty_binary_metrics()
 
-    tp = int(((preds == 1) & (labels == 1)).sum().item())
-    tn = int(((preds == 0) & (labels == 0)).sum().item())
-    fp = int(((preds == 1) & (labels == 0)).sum().item())
-    fn = int(((preds == 0) & (labels == 1)).sum().item())
-
-    accuracy = (tp + tn) / N if N > 0 else 0.0
+    probs = torch.sigmoid(logits)
+    device = probs.device
+
+    # Confusion matrix at the fixed threshold
+    preds = (probs >= threshold).float()
+    tp = (preds * labels).sum()
+    fp = (preds * (1 - labels)).sum()
+    fn = ((1 - preds) * labels).sum()
+    tn = N - tp - fp - fn
+
+    # One sort; position k = "predict positive for the top k+1 scores"
+    p_sorted, order = torch.sort(probs, descending=True)
+    y_sorted = labels[order]
+    tps = torch.cumsum(y_sorted, dim=0)
+    fps = torch.cumsum(1 - y_sorted, dim=0)
+    n_pos = tps[-1]
+    n_neg = fps[-1]
+
+    # Only the last position of a run of equal scores is a valid threshold
+    group_end = torch.ones(N, dtype=torch.bool, device=device)
+    group_end[:-1] = p_sorted[1:] != p_sorted[:-1]
+
+    tpr = tps / n_pos.clamp(min=1)
+    fpr = fps / n_neg.clamp(min=1)
+    prec = tps / (tps + fps)
+
+    # Value at the previous group end (0 before the first one)
+    idx = torch.arange(N, device=device)
+    last_end = torch.cummax(torch.where(group_end, idx, torch.full_like(idx, -1)), dim=0).values
+    prev = torch.cat([torch.full((1,), -1, dtype=idx.dtype, device=device), last_end[:-1]])
+    has_prev = prev >= 0
+    prev_c = prev.clamp(min=0)
+    prev_tpr = torch.where(has_prev, tpr[prev_c], torch.zeros_like(tpr))
+    prev_fpr = torch.where(has_prev, fpr[prev_c], torch.zeros_like(fpr))
+
+    zero = torch.zeros_like(tpr)
+    auroc = torch.where(group_end, (fpr - prev_fpr) * (tpr + prev_tpr) / 2, zero).sum()
+    auprc = torch.where(group_end, (tpr - prev_tpr) * prec, zero).sum()
+
+    f1_curve = 2 * tps / (2 * tps + fps + (n_pos - tps)).clamp(min=1)
+    best = torch.argmax(torch.where(group_end, f1_curve, torch.full_like(f1_curve, -1.0)))
+
+    # Calibration: equal-width confidence bins (scatter_add keeps a fixed shape)
+    bins = (probs * n_bins).long().clamp(max=n_bins - 1)
+    bin_count = torch.zeros(n_bins, device=device).scatter_add_(0, bins, torch.ones_like(probs))
+    bin_conf = torch.zeros(n_bins, device=device).scatter_add_(0, bins, probs)
+    bin_acc = torch.zeros(n_bins, device=device).scatter_add_(0, bins, labels)
+    ece = (bin_acc - bin_conf).abs().sum() / N
+
+    scalars = torch.stack([
+        tp, tn, fp, fn, n_pos, n_neg, auroc, auprc, f1_curve[best], p_sorted[best], ece
+    ])
+    parts = [scalars, bin_count, bin_conf, bin_acc]
+    if return_curves:
+        parts += [p_sorted, tpr, fpr, prec, group_end.float()]
+    host = torch.cat(parts).cpu().numpy()  # the single device -> host sync
+
+    tp, tn, fp, fn, n_pos, n_neg, auroc, auprc, best_f1, best_thr, ece = host[:11].tolist()
+    tp, tn, fp, fn = int(tp), int(tn), int(fp), int(fn)
+    accuracy = (tp + tn) / N
     precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
     recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
     f1 = (2 * precision * recall / (precision + recall)) if (precision + recall) > 0 else 0.0
+    both_classes = n_pos > 0 and n_neg > 0
 
-    return {
+    metrics = {
         "num_samples": N,
         "accuracy": accuracy,
         "precision": precision,
@@ -638,12 +1644,44 @@ def compute_binary_metrics(logits, labels):
         "tp": tp,
         "tn": tn,
         "fp": fp,
-        "fn": fn
+        "fn": fn,
+        "auroc": auroc if both_classes else None,
+        "auprc": auprc if n_pos > 0 else None,
+        "best_f1": best_f1,
+        "best_threshold": best_thr,
+        "ece": ece,
     }
+    # Undefined values are None (not NaN), so metrics.json stays strict JSON
+    metrics = {k: None if isinstance(v, float) and not np.isfinite(v) else v for k, v in metrics.items()}
+
+    if return_curves:
+        b = 11
+        counts, conf, acc = host[b:b + n_bins], host[b + n_bins:b + 2 * n_bins], host[b + 2 * n_bins:b + 3 * n_bins]
+        c = b + 3 * n_bins
+        thr, tpr_c, fpr_c, prec_c, ends = (host[c + k * N:c + (k + 1) * N] for k in range(5))
+        ends = ends.astype(bool)
+        nonempty = np.maximum(counts, 1)
+        metrics["calibration"] = {
+            "bin_edges": np.linspace(0.0, 1.0, n_bins + 1).tolist(),
+            "count": counts.astype(int).tolist(),
+            "confidence": (conf / nonempty).tolist(),
+            "accuracy": (acc / nonempty).tolist(),
+        }
+        metrics["curves"] = {
+            "thresholds": thr[ends].tolist(),
+            "tpr": tpr_c[ends].tolist(),
+            "fpr": fpr_c[ends].tolist(),
+            "precision": prec_c[ends].tolist(),
+            "recall": tpr_c[ends].tolist(),
+        }
+    return metrics
 
 
-def evaluate_model(model, loader, device, transform, all_image_paths):
+def evaluate_model(model, loader, device, transform, all_image_paths, image_source=None,
+                   return_curves=False):
     model.eval()
+    if image_source is None:
+        image_source = PathImageSource(all_image_paths, transform)
     all_logits = []
     all_labels = []
 
@@ -653,18 +1691,18 @@ def evaluate_model(model, loader, device, transform, all_image_paths):
     with torch.no_grad():
         for batch in loader:
             batch = batch.to(device)
-            images = load_images_from_indices(batch.image_idx, all_image_paths, device, transform)
+            images = image_source(batch, device)
             logits = model(batch.x, batch.edge_index, batch.batch, images)
             labels = batch.y.view(-1)
-            all_logits.append(logits.cpu())
-            all_labels.append(labels.cpu())
+            all_logits.append(logits)
+            all_labels.append(labels)
 
     if not all_logits:
         return compute_binary_metrics(torch.tensor([]), torch.tensor([]))
 
     logits_all = torch.cat(all_logits, dim=0)
     labels_all = torch.cat(all_labels, dim=0)
-    return compute_binary_metrics(logits_all, labels_all)
+    return compute_binary_metrics(logits_all, labels_all, return_curves=return_curves)
 
 
 def train_multimodal_model_for_variant_and_backbone(
@@ -675,20 +1713,35 @@ def train_multimodal_model_for_variant_and_backbone(
     output_root,
     num_epochs=25,
     batch_size=8,
-    lr=1e-4
+    lr=1e-4,
+    image_source=None,
+    seed=42,
+    device=None,
+    run_dir=None,
+    device_graphs=False,
+    run_config=None
 ):
     """
     Train the multimodal model (graph + image) for one (ablation variant, backbone).
-    Saves metrics and training curves inside:
+    image_source decides how batch images are produced (default: decode JPEGs
+    from image_paths; EmbeddingImageSource for a frozen image encoder;
+    ShardImageSource for a trainable encoder fed from a preprocessed shard).
+    seed fixes the split and initialisation; device defaults to cuda if available.
+    device_graphs=True keeps every split pre-collated on the device and batches
+    by index gathering (DeviceGraphLoader) instead of the PyG DataLoader.
+    Saves metrics and training curves inside run_dir, by default:
         output_root/variant_name/backbone_name/
+    run_config (optional dict) is stored as metrics["config"], so a finished
+    run can be matched to the settings it was trained with (gnn_sweep resume).
     Returns metrics + training history.
     """
     if len(graphs) < 2:
         print(f"[{variant_name}/{backbone_name}] Not enough graphs to train (need >= 2).")
         return None
 
-    random.seed(42)
-    torch.manual_seed(42)
+    random.seed(seed)
+    torch.manual_seed(seed)
+    graphs = list(graphs)  # shuffle a copy: every backbone sees the same split
     random.shuffle(graphs)
 
     n_total = len(graphs)
@@ -710,27 +1763,41 @@ def train_multimodal_model_for_variant_and_backbone(
     print(f"[{variant_name}/{backbone_name}] Split: "
           f"train={len(train_graphs)}, val={len(val_graphs)}, test={len(test_graphs)}")
 
-    train_loader = DataLoader(train_graphs, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_graphs, batch_size=batch_size, shuffle=False) if val_graphs else None
-    test_loader = DataLoader(test_graphs, batch_size=batch_size, shuffle=False) if test_graphs else None
-
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    device = torch.device(device)
     print(f"[{variant_name}/{backbone_name}] Using device: {device}")
 
+    transform = get_image_transform()
+    if image_source is None:
+        image_source = PathImageSource(image_paths, transform)
+
+    if device_graphs:
+        train_loader = make_device_loader(train_graphs, batch_size, True, device)
+        val_loader = make_device_loader(val_graphs, batch_size, False, device)
+        test_loader = make_device_loader(test_graphs, batch_size, False, device)
+    else:
+        train_loader = image_source.make_loader(train_graphs, batch_size, shuffle=True)
+        val_loader = image_source.make_loader(val_graphs, batch_size, shuffle=False)
+        test_loader = image_source.make_loader(test_graphs, batch_size, shuffle=False)
+
     in_channels = graphs[0].x.size(1)
-    model = MultiModalModel(in_channels=in_channels, graph_backbone=backbone_name).to(device)
+    model = MultiModalModel(
+        in_channels=in_channels,
+        graph_backbone=backbone_name,
+        image_embedding_dim=image_source.embedding_dim
+    ).to(device)
 
     criterion = nn.BCEWithLogitsLoss()
     optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=1e-4)
 
-    transform = get_image_transform()
-
     history = {
         "train_loss": [],
         "val_f1": []
     }
 
-    run_dir = os.path.join(output_root, variant_name, backbone_name)
+    if run_dir is None:
+        run_dir = os.path.join(output_root, variant_name, backbone_name)
     os.makedirs(run_dir, exist_ok=True)
 
     # Training loop
@@ -741,7 +1808,7 @@ def train_multimodal_model_for_variant_and_backbone(
 
         for batch in train_loader:
             batch = batch.to(device)
-            images = load_images_from_indices(batch.image_idx, image_paths, device, transform)
+            images = image_source(batch, device)
 
             optimizer.zero_grad()
             logits = model(batch.x, batch.edge_index, batch.batch, images)
@@ -756,16 +1823,21 @@ def train_multimodal_model_for_variant_and_backbone(
         avg_loss = total_loss / max(total_graphs, 1)
         history["train_loss"].append(avg_loss)
 
-        val_metrics = evaluate_model(model, val_loader, device, transform, image_paths)
+        val_metrics = evaluate_model(model, val_loader, device, transform, image_paths, image_source)
         history["val_f1"].append(val_metrics["f1"])
 
         print(f"[{variant_name}/{backbone_name}] Epoch {epoch:03d} - "
               f"Train Loss: {avg_loss:.4f} | Val F1: {val_metrics['f1']:.4f}")
 
     # Final evaluation
-    train_metrics = evaluate_model(model, train_loader, device, transform, image_paths)
-    val_metrics = evaluate_model(model, val_loader, device, transform, image_paths)
-    test_metrics = evaluate_model(model, test_loader, device, transform, image_paths)
+    train_metrics = evaluate_model(model, train_loader, device, transform, image_paths, image_source)
+    val_metrics = evaluate_model(model, val_loader, device, transform, image_paths, image_source)
+    test_metrics = evaluate_model(model, test_loader, device, transform, image_paths, image_source,
+                                  return_curves=True)
+    test_curves = {
+        "curves": test_metrics.pop("curves", None),
+        "calibration": test_metrics.pop("calibration", None),
+    }
 
     metrics = {
         "num_graphs": n_total,
@@ -776,13 +1848,27 @@ def train_multimodal_model_for_variant_and_backbone(
         "val_metrics": val_metrics,
         "test_metrics": test_metrics
     }
+    if run_config is not None:
+        metrics["config"] = run_config
+
+    # Save weights (for gnn_inference)
+    torch.save({
+        "state_dict": model.state_dict(),
+        "in_channels": in_channels,
+        "graph_backbone": backbone_name,
+        "image_embedding_dim": image_source.embedding_dim,
+    }, os.path.join(run_dir, "model.pt"))
 
     # Save metrics JSON
     metrics_path = os.path.join(run_dir, "metrics.json")
     with open(metrics_path, "w") as f:
-        json.dump(metrics, f, indent=4)
+        json.dump(metrics, f, indent=4, allow_nan=False)
     print(f"[{variant_name}/{backbone_name}] Saved metrics to: {metrics_path}")
 
+    # Test-set PR/ROC curves and calibration bins
+    with open(os.path.join(run_dir, "test_curves.json"), "w") as f:
+        json.dump(test_curves, f)
+
     # Plot training loss
     plt.figure(figsize=(8, 5))
     plt.plot(history["train_loss"], label="Train Loss")
@@ -813,6 +1899,98 @@ def train_multimodal_model_for_variant_and_backbone(
     return metrics
 
 
+# ============================================================
+# Experiment grid
+# ============================================================
+
+# Ablation settings over semantic groups
+ABLATIONS = {
+    "full": {
+        "include_importance": True,
+        "include_status": True,
+        "include_safety": True,
+        "include_position": True,
+        "include_goal": True,
+        "include_action": True,
+        "include_traffic": True,
+        "include_causal": True
+    },
+    "causal": {
+        "include_importance": False,
+        "include_status": False,
+        "include_safety": False,
+        "include_position": False,
+        "include_goal": False,
+        "include_action": False,
+        "include_traffic": False,
+        "include_causal": True
+    },
+    "Six-Space": {
+        "include_importance": True,
+        "include_status": True,
+        "include_safety": True,
+        "include_position": True,
+        "include_goal": True,
+        "include_action": True,
+        "include_traffic": True,
+        "include_causal": False
+    }
+    # "no_importance": {
+    #     "include_importance": False,
+    #     "include_status": True,
+    #     "include_safety": True,
+    #     "include_position": True,
+    #     "include_goal": True,
+    #     "include_action": True,
+    #     "include_traffic": True,
+    #     "include_causal": True
+    # },
+    # "no_status": {
+    #     "include_importance": True,
+    #     "include_status": False,
+    #     "include_safety": True,
+    #     "include_position": True,
+    #     "include_goal": True,
+    #     "include_action": True,
+    #     "include_traffic": True,
+    #     "include_causal": True
+    # },
+    # "no_safety": {
+    #     "include_importance": True,
+    #     "include_status": True,
+    #     "include_safety": False,
+    #     "include_position": True,
+    #     "include_goal": True,
+    #     "include_action": True,
+    #     "include_traffic": True,
+    #     "include_causal": True
+    # },
+    # "no_position": {
+    #     "include_importance": True,
+    #     "include_status": True,
+    #     "include_safety": True,
+    #     "include_position": False,
+    #     "include_goal": True,
+    #     "include_action": True,
+    #     "include_traffic": True,
+    #     "include_causal": True
+    # },
+    # "no_goal_action_traffic": {
+    #     "include_importance": True,
+    #     "include_status": True,
+    #     "include_safety": True,
+    #     "include_position": True,
+    #     "include_goal": False,
+    #     "include_action": False,
+    #     "include_traffic": False,
+    #     "include_causal": True
+    # },
+}
+
+# Graph backbones to compare (SOTA-ish + baselines)
+BACKBONES = ["GCN", "GraphSAGE", "GAT", "Transformer"]
+
+
 # ============================================================
 # Ablation + model comparison main
 # ============================================================
@@ -831,106 +2009,35 @@ def main():
     output_root = os.path.join(dataset_root, "multimodal_ablation")
     os.makedirs(output_root, exist_ok=True)
 
-    # Ablation settings over semantic groups
-    ablations = {
-        "full": {
-            "include_importance": True,
-            "include_status": True,
-            "include_safety": True,
-            "include_position": True,
-            "include_goal": True,
-            "include_action": True,
-            "include_traffic": True,
-            "include_causal": True
-        },
-     "causal": {
-            "include_importance": False,
-            "include_status": False,
-            "include_safety": False,
-            "include_position": False,
-            "include_goal": False,
-            "include_action": False,
-            "include_traffic": False,
-            "include_causal": True
-        },
-        "Six-Space": {
-            "include_importance": True,
-            "include_status": True,
-            "include_safety": True,
-            "include_position": True,
-            "include_goal": True,
-            "include_action": True,
-            "include_traffic": True,
-            "include_causal": False
-        }
-        # "no_importance": {
-        #     "include_importance": False,
-        #     "include_status": True,
-        #     "include_safety": True,
-        #     "include_position": True,
-        #     "include_goal": True,
-        #     "include_action": True,
-        #     "include_traffic": True,
-        #     "include_causal": True
-        # },
-        # "no_status": {
-        #     "include_importance": True,
-        #     "include_status": False,
-        #     "include_safety": True,
-        #     "include_position": True,
-        #     "include_goal": True,
-        #     "include_action": True,
-        #     "include_traffic": True,
-        #     "include_causal": True
-        # },
-        # "no_safety": {
-        #     "include_importance": True,
-        #     "include_status": True,
-        #     "include_safety": False,
-        #     "include_position": True,
-        #     "include_goal": True,
-        #     "include_action": True,
-        #     "include_traffic": True,
-        #     "include_causal": True
-        # },
-        # "no_position": {
-        #     "include_importance": True,
-        #     "include_status": True,
-        #     "include_safety": True,
-        #     "include_position": False,
-        #     "include_goal": True,
-        #     "include_action": True,
-        #     "include_traffic": True,
-        #     "include_causal": True
-        # },
-        # "no_goal_action_traffic": {
-        #     "include_importance": True,
-        #     "include_status": True,
-        #     "include_safety": True,
-        #     "include_position": True,
-        #     "include_goal": False,
-        #     "include_action": False,
-        #     "include_traffic": False,
-        #     "include_causal": True
-        # },
-    }
+    all_results = {}
 
-    # Graph backbones to compare (SOTA-ish + baselines)
-    backbones = ["GCN", "GraphSAGE", "GAT", "Transformer"]
+    # Full graphs are built once; each variant is a mask over the cache
+    graph_cache = load_graph_cache(
+        json_root, frames_root, os.path.join(output_root, "graph_cache.pt")
+    )
 
-    all_results = {}
+    # "pixels" / "embeddings" / "shard", see make_image_source
+    image_source = make_image_source("pixels", graph_cache["image_paths"], output_root)
+
+    # Optional node label text features, e.g. label_encoder = DEFAULT_LABEL_ENCODER
+    label_encoder = None
+    label_embeddings = None
+    if label_encoder is not None:
+        label_embeddings = label_embeddings_for_cache(
+            graph_cache, os.path.join(output_root, "label_embeddings"), label_encoder
+        )
 
-    for variant_name, flags in ablations.items():
+    for variant_name, flags in ABLATIONS.items():
         print("=" * 100)
         print(f"Loading data for ablation variant: {variant_name} with flags={flags}")
-        graphs, image_paths = load_multimodal_dataset_variant(json_root, frames_root, flags)
+        graphs, image_paths = graphs_from_cache(graph_cache, flags, label_embeddings)
         if len(graphs) < 2:
             print(f"[{variant_name}] Not enough graphs, skipping this variant.")
             continue
 
         all_results[variant_name] = {}
 
-        for backbone in backbones:
+        for backbone in BACKBONES:
             print("-" * 80)
             print(f"Training model backbone: {backbone} on variant: {variant_name}")
             metrics = train_multimodal_model_for_variant_and_backbone(
@@ -941,7 +2048,8 @@ def main():
                 output_root,
                 num_epochs=5,
                 batch_size=8,
-                lr=1e-4
+                lr=1e-4,
+                image_source=image_source
             )
             if metrics is not None:
                 all_results[variant_name][backbone] = metrics
@@ -1,20 +1,113 @@
 import os
 import json
+import hashlib
+import itertools
 import logging
 import re
+from functools import cached_property
 from shapely.geometry import Polygon, MultiPoint
 
+try:
+    from src.utils import geometry, json_stream
+except ImportError:
+    # Run as a script from this folder: load the modules next to this folder by path
+    import importlib.util
+
+    def _load_utils_module(name):
+        spec = importlib.util.spec_from_file_location(
+            name, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, f"{name}.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    geometry = _load_utils_module("geometry")
+    json_stream = _load_utils_module("json_stream")
+
+from qa_templates import Block, QuestionSpec, meta, register
+from qa_temporal import SUSTAINED_FRAMES, TEMPORAL_WINDOW, TemporalState
+
 # ------------------------------------------------------------
 # Configure logging
 # ------------------------------------------------------------
-logging.basicConfig(
-    filename='QA_generation.log',
-    filemode='a',
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Module logger: importing QA.py (qa_parallel, lazy_qa) leaves the
+# application's logging alone; the command-line entry points call
+# configure_logging().
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+def configure_logging():
+    logging.basicConfig(
+        filename='QA_generation.log',
+        filemode='a',
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+
+# ------------------------------------------------------------
+# Object label sets (matched against the lower-cased obj_name)
+# ------------------------------------------------------------
+PROHIBITED_TURN_SIGN_LABELS = {"ts_no_u_turn", "ts_no_left_turn", "ts_no_right_turn", "ts_no_left_u_turn"}
+ALLOWED_TURN_SIGN_LABELS = {"ts_only_left_turn", "ts_only_right_turn", "ts_only_u_turn"}
+TURN_SIGN_LABELS = PROHIBITED_TURN_SIGN_LABELS | ALLOWED_TURN_SIGN_LABELS
+DIRECTIONAL_ARROW_LABELS = {
+    "right directional arrow": ("right",),
+    "straight directional arrow": ("straight",),
+    "left directional arrow": ("left",),
+    "left and straight directional arrow": ("left", "straight"),
+    "right and straight directional arrow": ("right", "straight"),
+}
+ROAD_MARKING_LABELS = {
+    "stop marking", "marking speed_limit_20", "pedestrian crossing marking",
+    "bicycle lane", "lane marking", "hazard_zone", "speed_bump"
+}
+TRAFFIC_SIGN_LABELS = {
+    "ts_stop", "ts_yield", "ts_speed_limit_15", "ts_speed_limit_20", "ts_speed_limit_25",
+    "ts_speed_limit_30", "ts_speed_limit_40", "ts_speed_limit_45", "ts_speed_limit_50",
+    "ts_speed_limit_60", "ts_speed_limit_70", "ts_speed_limit_80", "ts_railroad_crossing",
+    "railway_crossing_ahead_skew_left", "railway_crossing_ahead_skew_right",
+    "ts_pedestrian_crossing", "ts_keep_left_road", "ts_keep_right_road", "ts_no_entry",
+    "ts_parking", "ts_no_parking", "ts_school_zone", "ts_directional", "ts_warning",
+    "ts_no_u_turn", "ts_no_left_u_turn", "ts_no_left_turn", "ts_no_right_turn", "ts_hospital",
+    "ts_road_work", "ts_traffic_signal_ahead", "ts_roundabout_ahead", "ts_bus_stop",
+    "ts_bicycle_crossing", "ts_construction_sign"
+}
+TRAFFIC_LIGHT_LABELS = {"traffic light", "traffic light pedestrian"}
+INFRASTRUCTURE_KEYWORDS = {
+    "bridge", "crosswalk", "street furniture", "pedestrian crossing marking", "road", "bicycle lane",
+    "train lane", "sidewalk", "t-intersection", "four-way intersection", "drivable area", "traffic light",
+    "traffic light pedestrian", "ts_stop", "stop marking", "ts_yield", "ts_speed_limit_15", "ts_speed_limit_20",
+    "ts_speed_limit_25", "ts_speed_limit_30", "ts_speed_limit_40", "ts_speed_limit_45", "ts_speed_limit_50",
+    "ts_speed_limit_60", "ts_speed_limit_70", "ts_speed_limit_80", "ts_railroad_crossing",
+    "railway_crossing_ahead_skew_left", "railway_crossing_ahead_skew_right", "ts_pedestrian_crossing",
+    "ts_keep_left_road", "ts_keep_right_road", "ts_no_entry", "ts_parking", "ts_no_parking", "ts_school_zone",
+    "ts_directional", "ts_warning", "ts_no_u_turn", "ts_no_left_u_turn", "ts_no_left_turn", "ts_no_right_turn",
+    "ts_hospital", "ts_road_work", "ts_traffic_signal_ahead", "ts_roundabout_ahead", "ts_bus_stop",
+    "ts_bicycle_crossing", "ts_construction_sign", "construction_zone", "bus station", "gas station",
+    "manhole", "parking_space", "parking_lot", "parking_meter", "barrier", "bollard", "cone", "trash_bin",
+    "tree", "pole", "road divider", "street sign"
+}
+VEHICLE_KEYWORDS = {
+    "car", "truck", "bus", "motorcycle", "construction vehicle",
+    "police vehicle", "ambulance", "fire truck"
+}
+EMERGENCY_VEHICLE_KEYWORDS = {"police vehicle", "ambulance", "fire truck"}
+ROAD_USER_KEYWORDS = {
+    "pedestrian", "cyclist", "bicycle", "dog", "skateboard",
+    "baby stroller", "flat car trolley", "handbag"
+}
+# Bump whenever generate_qa's output changes, so incremental runs regenerate every frame.
+QA_GENERATOR_VERSION = "1"
+QA_MANIFEST_DIR = ".qa_manifest"
+
+ALLOWED_CAUSAL_RELATIONS = ("Direct", "Chain", "Confounder", "Collider", "Mediator", "correlations")
+DRIVABLE_AREA_SIZE_THRESHOLD = 50000
+NEAR_DISTANCE_PIXELS = 50  # box-to-box gap counted as "close" by the relational Q&A
+
 # ========================= Helper Functions =============================
-def determine_scenario(frame_data, image_id):
+def determine_scenario(frame_data, image_id, index=None):
     """
     Determines the scenario type based on the image_id and objects' causal relations.
     
@@ -26,29 +119,14 @@ def determine_scenario(frame_data, image_id):
       
     Additionally, this function builds lists for all objects that have an attack indication and those that are considered Out-of-Distribution (OoD).
     """
-    objects = frame_data.get('graph', {}).get('nodes', [])
+    if index is None:
+        index = FrameIndex.from_frame(frame_data)
     traffic_regulations = frame_data.get("Traffic Regulations Suggestions", "").strip()
 
-    attack_objects = []
-    noise_objects = []
-    ood_objects = []
-    for obj_id, obj_info in objects:
-        obj_name = obj_info.get("obj_name", "").strip()
-        boxes = obj_info.get("boxes", "")
-        position = extract_position_description(obj_info)
-        object_safety = obj_info.get("Object_Safety", [])
-        
-        # Only consider objects that affect safety.
-        if "Affects Safety" in object_safety:
-            # Check if the object is marked as causal.
-            if obj_info.get("Is_causal", "").lower() == "cause":
-                causal_relation = obj_info.get("Causal_Relation", "").lower()
-                if "attack" in causal_relation:
-                    attack_objects.append(f"{obj_name} <bb>{boxes}</bb> and positions: ({position})")
-                elif "ood" in causal_relation:
-                    ood_objects.append(f"{obj_name} <bb>{boxes}</bb> and positions: ({position})")
-                elif "noise" in causal_relation:
-                    noise_objects.append(f"{obj_name} <bb>{boxes}</bb> and positions: ({position})")
+    # Causal objects that affect safety, split by their causal relation (see FrameIndex).
+    attack_objects = index.attack_objects
+    noise_objects = index.noise_objects
+    ood_objects = index.ood_objects
                     
     attack_desc = ""
     if attack_objects:
@@ -113,24 +191,30 @@ def categorize_turn_signs(objects):
     allowed_turns = set()
     for obj_id, obj_info in objects:
         label = obj_info.get("obj_name", "").strip().lower()
-        if label in ["ts_no_u_turn", "ts_no_left_turn", "ts_no_right_turn", "ts_no_left_u_turn"]:
-            if "no_u_turn" in label:
-                prohibited_turns.add("No u-turn")
-            if "no_left_turn" in label:
-                prohibited_turns.add("No left")
-            if "no_right_turn" in label:
-                prohibited_turns.add("No right")
-            if "ts_no_left_u_turn" in label:
-                prohibited_turns.add("No Left U-Turn")
-        elif label in ["ts_only_left_turn", "ts_only_right_turn", "ts_only_u_turn"]:
-            if "only_left_turn" in label:
-                allowed_turns.add("left")
-            if "only_right_turn" in label:
-                allowed_turns.add("right")
-            if "only_u_turn" in label:
-                allowed_turns.add("u-turn")
+        add_turn_sign(label, prohibited_turns, allowed_turns)
     return prohibited_turns, allowed_turns
 
+def add_turn_sign(label, prohibited_turns, allowed_turns):
+    """
+    Adds the turns a (lower-cased) turn-sign label prohibits / allows to the two sets.
+    """
+    if label in PROHIBITED_TURN_SIGN_LABELS:
+        if "no_u_turn" in label:
+            prohibited_turns.add("No u-turn")
+        if "no_left_turn" in label:
+            prohibited_turns.add("No left")
+        if "no_right_turn" in label:
+            prohibited_turns.add("No right")
+        if "ts_no_left_u_turn" in label:
+            prohibited_turns.add("No Left U-Turn")
+    elif label in ALLOWED_TURN_SIGN_LABELS:
+        if "only_left_turn" in label:
+            allowed_turns.add("left")
+        if "only_right_turn" in label:
+            allowed_turns.add("right")
+        if "only_u_turn" in label:
+            allowed_turns.add("u-turn")
+
 def categorize_directional_arrows(objects):
     """
     Returns a set of allowed directions from directional arrow signs.
@@ -138,23 +222,7 @@ def categorize_directional_arrows(objects):
     allowed_directions = set()
     for obj_id, obj_info in objects:
         label = obj_info.get("obj_name", "").strip().lower()
-        if label in [
-            "right directional arrow",
-            "straight directional arrow",
-            "left directional arrow",
-            "left and straight directional arrow",
-            "right and straight directional arrow"
-        ]:
-            if label == "right directional arrow":
-                allowed_directions.add("right")
-            elif label == "straight directional arrow":
-                allowed_directions.add("straight")
-            elif label == "left directional arrow":
-                allowed_directions.add("left")
-            elif label == "left and straight directional arrow":
-                allowed_directions.update(["left", "straight"])
-            elif label == "right and straight directional arrow":
-                allowed_directions.update(["right", "straight"])
+        allowed_directions.update(DIRECTIONAL_ARROW_LABELS.get(label, ()))
     return allowed_directions
 
 def determine_intended_turn(steering):
@@ -229,56 +297,47 @@ def detect_markings(objects):
     Identify road markings.
     """
     markings_list = []
-    road_marking_labels = {
-        "stop marking", "marking speed_limit_20", "pedestrian crossing marking",
-        "bicycle lane", "lane marking", "hazard_zone", "speed_bump"
-    }
     for obj_id, obj_info in objects:
         obj_name = obj_info.get("obj_name", "").strip().lower()
-        if obj_name in road_marking_labels:
-            markings_list.append({
-                "obj_id": obj_id,
-                "obj_name": obj_info.get("obj_name", ""),
-                "position": obj_info.get("position", []),
-                "status": obj_info.get("Status", "Unknown"),
-                "importance": obj_info.get("importance_ranking", ""),
-                "object_safety": obj_info.get("Object_Safety", [])
-            })
+        if obj_name in ROAD_MARKING_LABELS:
+            markings_list.append(marking_record(obj_id, obj_info))
     return markings_list
 
+def marking_record(obj_id, obj_info):
+    return {
+        "obj_id": obj_id,
+        "obj_name": obj_info.get("obj_name", ""),
+        "position": obj_info.get("position", []),
+        "status": obj_info.get("Status", "Unknown"),
+        "importance": obj_info.get("importance_ranking", ""),
+        "object_safety": obj_info.get("Object_Safety", [])
+    }
+
 def detect_traffic_signs(objects):
     """
     Identify traffic signs.
     """
     traffic_sign_list = []
-    traffic_sign_labels = {
-        "ts_stop", "ts_yield", "ts_speed_limit_15", "ts_speed_limit_20", "ts_speed_limit_25",
-        "ts_speed_limit_30", "ts_speed_limit_40", "ts_speed_limit_45", "ts_speed_limit_50",
-        "ts_speed_limit_60", "ts_speed_limit_70", "ts_speed_limit_80", "ts_railroad_crossing",
-        "railway_crossing_ahead_skew_left", "railway_crossing_ahead_skew_right",
-        "ts_pedestrian_crossing", "ts_keep_left_road", "ts_keep_right_road", "ts_no_entry",
-        "ts_parking", "ts_no_parking", "ts_school_zone", "ts_directional", "ts_warning",
-        "ts_no_u_turn", "ts_no_left_u_turn", "ts_no_left_turn", "ts_no_right_turn", "ts_hospital",
-        "ts_road_work", "ts_traffic_signal_ahead", "ts_roundabout_ahead", "ts_bus_stop",
-        "ts_bicycle_crossing", "ts_construction_sign"
-    }
     for obj_id, obj_info in objects:
         obj_name = obj_info.get("obj_name", "").strip().lower()
-        if obj_name in traffic_sign_labels:
-            traffic_sign_list.append({
-                "obj_id": obj_id,
-                "obj_name": obj_info.get("obj_name", ""),
-                "position": obj_info.get("position", []),
-                "boxes": obj_info.get("boxes", []),
-                "Object_Causal": obj_info.get("Object_Causal",""),
-                "Causal_Relation": obj_info.get("Causal_Relation",""),
-                "Is_causal": obj_info.get("Is_causal", ""),
-                "status": obj_info.get("Status", "Unknown"),
-                "importance": obj_info.get("importance_ranking", ""),
-                "object_safety": obj_info.get("Object_Safety", [])
-            })
+        if obj_name in TRAFFIC_SIGN_LABELS:
+            traffic_sign_list.append(traffic_sign_record(obj_id, obj_info))
     return traffic_sign_list
 
+def traffic_sign_record(obj_id, obj_info):
+    return {
+        "obj_id": obj_id,
+        "obj_name": obj_info.get("obj_name", ""),
+        "position": obj_info.get("position", []),
+        "boxes": obj_info.get("boxes", []),
+        "Object_Causal": obj_info.get("Object_Causal",""),
+        "Causal_Relation": obj_info.get("Causal_Relation",""),
+        "Is_causal": obj_info.get("Is_causal", ""),
+        "status": obj_info.get("Status", "Unknown"),
+        "importance": obj_info.get("importance_ranking", ""),
+        "object_safety": obj_info.get("Object_Safety", [])
+    }
+
 def generate_rule_description(sign_name, boxes):
     """
     Generate a rule description based on the traffic sign identifier.
@@ -379,20 +438,22 @@ def detect_traffic_lights(objects):
     Identify traffic lights.
     """
     traffic_light_list = []
-    traffic_light_labels = {"traffic light", "traffic light pedestrian"}
     for obj_id, obj_info in objects:
         obj_name = obj_info.get("obj_name", "").strip().lower()
-        if obj_name in traffic_light_labels:
-            traffic_light_list.append({
-                "obj_id": obj_id,
-                "obj_name": obj_info.get("obj_name", ""),
-                "position": obj_info.get("position", []),
-                "light_status": obj_info.get("Status", "Unknown"),
-                "TL_importance": obj_info.get("importance_ranking", ""),
-                "TL_object_safety": obj_info.get("Object_Safety", [])
-            })
+        if obj_name in TRAFFIC_LIGHT_LABELS:
+            traffic_light_list.append(traffic_light_record(obj_id, obj_info))
     return traffic_light_list
 
+def traffic_light_record(obj_id, obj_info):
+    return {
+        "obj_id": obj_id,
+        "obj_name": obj_info.get("obj_name", ""),
+        "position": obj_info.get("position", []),
+        "light_status": obj_info.get("Status", "Unknown"),
+        "TL_importance": obj_info.get("importance_ranking", ""),
+        "TL_object_safety": obj_info.get("Object_Safety", [])
+    }
+
 def group_objects(frame_data):
     """
     Filter out objects with low or no importance and that do not affect safety.
@@ -439,6 +500,713 @@ def group_objects(frame_data):
             traffic_signs.append(node)    
     return infra_objs, vehicle_objs, road_user_objs, traffic_signs
 
+def drivable_area_size(polyline):
+    """
+    Returns (area, size_category) of a drivable-area polyline; size_category is
+    "big", "small", or "unknown" when no polygon can be formed.
+    """
+    try:
+        if len(polyline) < 3:
+            raise ValueError("Insufficient points to form a polygon.")
+        if polyline[0] != polyline[-1]:
+            closed_polyline = polyline + [polyline[0]]
+        else:
+            closed_polyline = polyline
+        polygon = Polygon(closed_polyline)
+        if not polygon.is_valid:
+            logger.debug("Invalid polygon detected. Using convex hull to approximate the area.")
+            polygon = MultiPoint(polyline).convex_hull
+        area = polygon.area
+        size_category = drivable_size_category(area)
+    except Exception as e:
+        logger.warning(f"Error calculating drivable area: {e}")
+        area = None
+        size_category = "unknown"
+    return area, size_category
+
+def drivable_size_category(area):
+    return "big" if area > DRIVABLE_AREA_SIZE_THRESHOLD else "small"
+
+# ============================ Frame Index ================================
+
+class FrameIndex:
+    """
+    Everything the Q&A generators look up about a frame's objects, built in a
+    single pass over frame_data['graph']['nodes'] (generate_qa builds it once
+    and hands it to every generator).
+
+    Per object (same order as `objects`): stripped name and lower-cased name.
+    Per frame: the keyword categories, safety-flagged objects, ego node,
+    speed-limit sign labels, turn restrictions, scenario evidence and the
+    drivable area with its size.
+
+    `frame_geometry` (geometry.FrameGeometry, optional) supplies the precomputed
+    drivable-area size; without it (or for a non-simple polygon) Shapely is used.
+
+    Built on first use, as only some objects or generators need them:
+    position(i) / status(i) descriptions (only ranked and safety-flagged
+    objects are described), the traffic sign / light / marking records and
+    the causal edges.
+
+    For relational questions, built on first use: position_index / status_index
+    (label -> indices of the objects carrying it, see objects_at) and
+    spatial_grid (geometry.SpatialGrid over the objects' boxes / points) with
+    near_objects, every object's neighbours within NEAR_DISTANCE_PIXELS from
+    a single grid.pairs query.
+    """
+    def __init__(self, objects, frame_geometry=None):
+        self.objects = objects
+        self.frame_geometry = frame_geometry
+        self.names = []           # obj_name.strip()
+        self.labels = []          # obj_name.lower() (keyword-set membership)
+        self._positions = [None] * len(objects)   # see position / status
+        self._statuses = [None] * len(objects)
+
+        self.infra_objects = []
+        self.vehicle_objects = []
+        self.emergency_vehicle_objects = []
+        self.road_user_objects = []
+        self._traffic_sign_objects = []         # records built by traffic_signs etc.
+        self._traffic_light_objects = []
+        self._marking_objects = []
+
+        self.affecting_safety = []              # indices into objects
+        self.affecting_safety_names = []        # obj_name (default "Unknown"), stripped
+        self.potentially_affecting_names = []
+        self.high_ranking_objects = []          # identify_high_ranking_objects(objects, "high")
+        self.attack_objects = []                # determine_scenario evidence
+        self.ood_objects = []
+        self.noise_objects = []
+
+        self.ego_object = None                  # first ego node
+        self.ego_status = None                  # Status of the last ego node
+        self.speed_limit_labels = []            # "TS_Speed_Limit_*" names, in order
+        self.prohibited_turns = set()
+        self.allowed_turns = set()
+        self.allowed_directions = set()
+        self.drivable_object = None
+        self.drivable_area = None
+        self.drivable_size_category = "unknown"
+
+        for i, obj in enumerate(objects):
+            obj_id, obj_info = obj
+            raw_name = obj_info.get("obj_name", "")
+            name = raw_name.strip()
+            label = raw_name.lower()
+            key = name.lower()
+            self.names.append(name)
+            self.labels.append(label)
+
+            if label in INFRASTRUCTURE_KEYWORDS:
+                self.infra_objects.append(obj)
+            if label in VEHICLE_KEYWORDS:
+                self.vehicle_objects.append(obj)
+                if label in EMERGENCY_VEHICLE_KEYWORDS:
+                    self.emergency_vehicle_objects.append(obj)
+            if label in ROAD_USER_KEYWORDS:
+                self.road_user_objects.append(obj)
+            if key in TRAFFIC_SIGN_LABELS:
+                self._traffic_sign_objects.append(obj)
+            if key in TRAFFIC_LIGHT_LABELS:
+                self._traffic_light_objects.append(obj)
+            if key in ROAD_MARKING_LABELS:
+                self._marking_objects.append(obj)
+            if key in TURN_SIGN_LABELS:
+                add_turn_sign(key, self.prohibited_turns, self.allowed_turns)
+            if key in DIRECTIONAL_ARROW_LABELS:
+                self.allowed_directions.update(DIRECTIONAL_ARROW_LABELS[key])
+
+            if key == "ego":
+                if self.ego_object is None:
+                    self.ego_object = obj
+                self.ego_status = obj_info.get("Status", [])
+            if name.startswith("TS_Speed_Limit_"):
+                self.speed_limit_labels.append(name)
+            if self.drivable_object is None and label == "drivable area":
+                self.drivable_object = obj
+
+            object_safety = obj_info.get("Object_Safety", [])
+            if "Affects Safety" in object_safety:
+                self.affecting_safety.append(i)
+                self.affecting_safety_names.append(obj_info.get("obj_name", "Unknown").strip())
+                if obj_info.get("importance_ranking", "").lower() == "high":
+                    self.high_ranking_objects.append(f"{name} (positions: {self.position(i)}, Status: {self.status(i)})")
+                if obj_info.get("Is_causal", "").lower() == "cause":
+                    causal_relation = obj_info.get("Causal_Relation", "").lower()
+                    evidence = f"{name} <bb>{obj_info.get('boxes', '')}</bb> and positions: ({self.position(i)})"
+                    if "attack" in causal_relation:
+                        self.attack_objects.append(evidence)
+                    elif "ood" in causal_relation:
+                        self.ood_objects.append(evidence)
+                    elif "noise" in causal_relation:
+                        self.noise_objects.append(evidence)
+            elif "Potentially Affect Safety" in object_safety:
+                self.potentially_affecting_names.append(obj_info.get("obj_name", "Unknown").strip())
+
+        if self.drivable_object is not None:
+            area = frame_geometry.drivable_area if frame_geometry is not None else None
+            if area is not None:
+                self.drivable_area, self.drivable_size_category = area, drivable_size_category(area)
+            else:
+                polyline = self.drivable_object[1].get("polyline", [])
+                self.drivable_area, self.drivable_size_category = drivable_area_size(polyline)
+
+    @classmethod
+    def from_frame(cls, frame_data, frame_geometry=None):
+        return cls(frame_data.get('graph', {}).get('nodes', []), frame_geometry)
+
+    def position(self, i):
+        """extract_position_description of object i."""
+        position = self._positions[i]
+        if position is None:
+            position = self._positions[i] = extract_position_description(self.objects[i][1])
+        return position
+
+    def status(self, i):
+        """extract_status_description of object i."""
+        status = self._statuses[i]
+        if status is None:
+            status = self._statuses[i] = extract_status_description(self.objects[i][1])
+        return status
+
+    @cached_property
+    def traffic_signs(self):
+        return [traffic_sign_record(obj_id, obj_info) for obj_id, obj_info in self._traffic_sign_objects]
+
+    @cached_property
+    def traffic_lights(self):
+        return [traffic_light_record(obj_id, obj_info) for obj_id, obj_info in self._traffic_light_objects]
+
+    @cached_property
+    def markings(self):
+        return [marking_record(obj_id, obj_info) for obj_id, obj_info in self._marking_objects]
+
+    @cached_property
+    def causal_edges(self):
+        edges = (causal_edge(obj_id, obj_info) for obj_id, obj_info in self.objects)
+        return [edge for edge in edges if edge is not None]
+
+    @cached_property
+    def position_index(self):
+        return label_index(info.get("position", []) for _, info in self.objects)
+
+    @cached_property
+    def status_index(self):
+        return label_index(info.get("Status", []) for _, info in self.objects)
+
+    @cached_property
+    def spatial_grid(self):
+        if self.frame_geometry is not None:
+            extents = self.frame_geometry.column("extents")
+        else:
+            extents = geometry.object_extents([info for _, info in self.objects])
+        return geometry.SpatialGrid(extents)
+
+    @cached_property
+    def near_objects(self):
+        """[(index, [(neighbour index, gap), ...]), ...] for the objects with a neighbour, nearest first."""
+        i, j, gaps = self.spatial_grid.pairs(NEAR_DISTANCE_PIXELS)
+        near = {}
+        for a, b, gap in zip(i.tolist(), j.tolist(), gaps.tolist()):
+            near.setdefault(a, []).append((gap, b))
+            near.setdefault(b, []).append((gap, a))
+        return [(k, [(b, gap) for gap, b in sorted(near[k])]) for k in sorted(near)]
+
+    def objects_at(self, labels):
+        """Indices of the objects whose position includes every label (in object order)."""
+        if isinstance(labels, str):
+            labels = [labels]
+        postings = [self.position_index.get(label, ()) for label in labels]
+        if not postings:
+            return []
+        found = set(min(postings, key=len)).intersection(*postings)
+        return sorted(found)
+
+def label_index(label_lists):
+    """{label: [object indices]} over per-object label lists (a single label may be a plain string)."""
+    index = {}
+    for i, labels in enumerate(label_lists):
+        if isinstance(labels, str):
+            labels = [labels] if labels else []
+        for label in dict.fromkeys(labels):
+            index.setdefault(label, []).append(i)
+    return index
+
+# ========================== Q&A Templates ================================
+# Declarative question families (see qa_templates.py); the generate_*_qa
+# functions below run them (family.qa). A new question is a new
+# QuestionSpec entry.
+
+META_OBJECT_DIRECTION = meta("Discovery", "Object-Centric Questions", "object direction", "perception")
+META_COUNTING = meta("Discovery", "Object-Centric Questions", "Counting", "perception")
+META_POSITION = meta("Discovery", "Object-Centric Questions", "Position Identification", "perception")
+META_STATE = meta("Discovery", "Object-Centric Questions", "State Identification", "perception")
+META_STATE_TASK = meta("Discovery", "State Identification", "State Identification", "perception")
+META_POSITION_AND_STATE = meta("Discovery", "Object-Centric Questions", "Position and State Identification", "perception")
+META_EXISTENCE = meta("Discovery", "Object-Centric Questions", "existence", "perception")
+META_EGO = meta("Discovery", "Object-Centric Questions", "Object-Centric Questions", "perception")
+META_SCENE = meta("Association", "Context-Based Questions", "Scene Classification", "perception")
+META_SCENE_PLAN = meta("Association", "Context-Based Questions", "Scene Classification", "plan")
+META_RELATIONSHIP = meta("Association", "Context-Based Questions", "Relationship", "perception")
+META_EMERGENCY_PRESENCE = meta("Association", "Object-Centric Questions", "existence", "perception")
+META_EMERGENCY_STATE = meta("Association", "Object-Centric Questions", "State Identification", "perception")
+META_EGO_SITUATION = meta("Association", "Object-Centric Questions", "Context-Based Questions", "perception")
+META_RISK = meta("Intervention", "Safety-Based Questions", "Risk & Anomaly Detection", "perception")
+META_EGO_MANEUVER = meta("Intervention", "Object-Centric Questions", "Planning-Based Questions", "plan")
+META_TEMPORAL = meta("Intervention", "Event(Temporal)-Based Questions", "Predictive", "perception")
+
+
+def status_text(status, empty):
+    """Status list (or single value) as text; `empty` if there is none."""
+    if isinstance(status, list):
+        return ', '.join(status) if status else empty
+    return str(status) if status else empty
+
+def each(items):
+    return items
+
+def infra_objects(index):
+    return index.infra_objects
+
+def vehicle_objects(index):
+    return index.vehicle_objects
+
+def marking_fields(item, items):
+    return {
+        "name": item["obj_id"],
+        "position": item["position"],
+        "status": status_text(item["status"], "No status"),
+    }
+
+def sign_fields(sign, signs):
+    name = sign['obj_name'].lower()
+    boxes = str(sign["boxes"])
+    return {
+        "name": name,
+        "label": sign.get('obj_name', name),
+        "position": sign['position'],
+        "boxes": boxes,
+        "status": status_text(sign["status"], "No status"),
+        "rule": generate_rule_description(name, boxes),
+    }
+
+def light_fields(tl, lights):
+    pos_list = tl.get("position", [])
+    status_list = tl.get("Status", [])
+    safety_objects = tl.get("Object_Safety", [])
+    return {
+        "name": tl.get("obj_name", "traffic light"),
+        "boxes": tl.get("boxes", ""),
+        "position": " ".join(pos_list) if pos_list else "an unknown position",
+        "status": " ".join(status_list) if status_list else "status unknown",
+        "importance": tl.get("importance_ranking", "not specified"),
+        "safety": ", ".join(safety_objects) if safety_objects else "no specific safety affecting",
+    }
+
+def object_fields(obj, index):
+    oid, info = obj
+    status = info.get("Status", [])
+    return {
+        "oid": oid,
+        "name": info.get("obj_name", ""),
+        "position": info.get("position", "Unknown"),
+        "status": ", ".join(status) if status else "No status info",
+    }
+
+def present_elements(objects, keywords):
+    """{"elements": "<a>, <b>"} for the keywords found in the objects' names, else None."""
+    labels = [info["obj_name"].lower() for _, info in objects]
+    elements = [element for keyword, element in keywords if any(keyword in label for label in labels)]
+    return {"elements": ', '.join(elements)} if elements else None
+
+def emergency_fields(obj, index):
+    oid, info = obj
+    pos = info.get("position", "Unknown")
+    if isinstance(pos, list):
+        pos = " ".join(pos)
+    status = info.get("Status", [])
+    # The emergency statuses might include phrases such as:
+    # "Emergency Lights On", "Emergency Lights Off", "Flashing Lights", "Responding", "Patrolling", "drivable area"
+    return {
+        "oid": oid,
+        "name": info.get('obj_name', 'emergency vehicle'),
+        "position": pos,
+        "status": ", ".join(status) if status else "No emergency status provided",
+    }
+
+def road_user_fields(obj, index):
+    oid, info = obj
+    # Normalize position: join if it's a list.
+    pos = info.get("position", "Unknown")
+    if isinstance(pos, list):
+        pos = " ".join(pos)
+    safety_list = info.get("Object_Safety", [])
+    exiting = info.get("exiting", None)
+    if exiting is None:
+        exiting_str = "not specified"
+    elif isinstance(exiting, bool):
+        exiting_str = "Yes" if exiting else "No"
+    else:
+        exiting_str = str(exiting)
+    return {
+        "oid": oid,
+        "position": pos,
+        "status": status_text(info.get("Status", []), "unknown"),
+        "importance": info.get("importance_ranking") or info.get("importance", "not specified"),
+        "safety": ", ".join(safety_list) if safety_list else "none",
+        "exiting": exiting_str,
+        "has_exiting": "exiting" in info,
+    }
+
+def ego_fields(ctx, _):
+    frame_data, index = ctx
+    speed = frame_data.get("speed", None)
+    steering = frame_data.get("steering", None)
+    ego_status_info = []
+    if speed is not None:
+        ego_status_info.append(f"Speed: {speed}")
+    if steering is not None:
+        ego_status_info.append(f"Steering: {steering}")
+    return {
+        "ego_status": " and ".join(ego_status_info),
+        "caption": frame_data.get("caption", ""),
+        "maneuver": frame_data.get("maneuver", ""),
+    }
+
+
+TRAFFIC_MARKINGS_QA = register("traffic_markings", [
+    Block(fields=lambda items, _: {
+        "names": ', '.join(dict.fromkeys(item['obj_name'] for item in items)),
+        "count": len(items),
+    } if items else None, specs=[
+        QuestionSpec("Which traffic road markings are present in the scene?",
+                     "road markings are present: {names}.", META_OBJECT_DIRECTION),
+        QuestionSpec("How many traffic road markings are present in the scene?",
+                     "the Number of road markings are present: {count}", META_COUNTING),
+    ]),
+    Block(source=each, fields=marking_fields, specs=[
+        QuestionSpec("Where is the {name} located?", "{name} is located at {position}", META_POSITION),
+        QuestionSpec("Where is the {name} status?", "{name} is status: {status}", META_STATE_TASK),
+        QuestionSpec("Where is the {name} located, and what is its status?",
+                     "{name} is located at {position}, with status: {status}", META_POSITION_AND_STATE),
+    ]),
+])
+
+TRAFFIC_SIGN_QA = register("traffic_signs", [
+    Block(fields=lambda signs, _: {
+        "names": ', '.join(ts['obj_name'] for ts in signs),
+        "positions": ', '.join(str(ts['position']) for ts in signs),
+        "count": len(signs),
+    } if signs else None, specs=[
+        QuestionSpec("Which traffic signs are present in the scene, and where are they located?",
+                     "Traffic signs found: {names} at positions {positions}", META_OBJECT_DIRECTION),
+        QuestionSpec("How many traffic signs are present in the scene?",
+                     "number of traffic signs: {names}. Total count: {count}", META_COUNTING),
+    ]),
+    Block(source=each, fields=sign_fields, specs=[
+        QuestionSpec("Where is the {name} located, and what is its status?",
+                     "{name} is located at {position} <bb>{boxes}</bb>", META_POSITION),
+        QuestionSpec("Where is the {name} located, and what is its status?",
+                     "{name} status: {status}", META_STATE),
+        QuestionSpec("Where is the {name} located, and what is its status?",
+                     "{name} is located at {position} <bb>{boxes}</bb>, with status: {status}",
+                     META_POSITION_AND_STATE),
+        QuestionSpec("What rule does the {label} at position {position} impose?", "{rule}",
+                     meta("Association", "Context-Based Questions", "Scene Classification", "plan")),
+    ]),
+])
+
+TRAFFIC_LIGHT_QA = register("traffic_lights", [
+    Block(fields=lambda lights, _: {
+        "count": len(lights),
+        "verb": 'is' if len(lights) == 1 else 'are',
+        "plural": 's' if len(lights) != 1 else '',
+    } if lights else None, specs=[
+        QuestionSpec("How many traffic lights are present in the scene?",
+                     "There {verb} {count} traffic light{plural} detected.", META_COUNTING),
+    ]),
+    Block(source=each, fields=light_fields, specs=[
+        QuestionSpec("Where is the {name} <bb>{boxes}</bb> located?",
+                     "The {name} <bb>{boxes}</bb> is located at {position}.", META_OBJECT_DIRECTION),
+        QuestionSpec("What is the current status of the {name} <bb>{boxes}</bb> ?",
+                     "The current status of the {name} <bb>{boxes}</bb>  is {status}.", META_STATE),
+        QuestionSpec("What is the importance ranking of the {name} <bb>{boxes}</bb> ?",
+                     "The {name} <bb>{boxes}</bb>  has a {importance} importance ranking.", META_RELATIONSHIP),
+        QuestionSpec("What is affecting the ego's safety from this {name} <bb>{boxes}</bb>?",
+                     "The {name} is associated with the following safety: {safety}.", META_RELATIONSHIP),
+    ]),
+])
+
+DRIVABLE_AREA_QA = register("drivable_area", [
+    Block(fields=lambda index, _: None if index.drivable_object else {}, specs=[
+        QuestionSpec("Is there a drivable area for the ego?",
+                     "No, a drivable area is not detected in the scene.", META_SCENE_PLAN),
+    ]),
+    Block(fields=lambda index, _: {"size": index.drivable_size_category} if index.drivable_object else None, specs=[
+        QuestionSpec("Is there a drivable area for the ego?", "Yes, a drivable area is present.", META_SCENE_PLAN),
+        QuestionSpec("Is the drivable area big or small?", "The drivable area is {size}.", META_SCENE_PLAN),
+        QuestionSpec(
+            "Explain situational awareness concerning the ego in relation to the drivable area.",
+            "1) The scene includes a drivable area which is crucial for navigation. "
+            "2) The drivable area defines the safe navigable space. "
+            "3) It is categorized as a {size} area, affecting the ego's maneuvering strategy.",
+            META_SCENE_PLAN,
+        ),
+    ]),
+])
+
+INFRASTRUCTURE_QA = register("infrastructure", [
+    Block(fields=lambda index, _: {
+        "names": ', '.join(dict.fromkeys(inf[1]["obj_name"] for inf in index.infra_objects)),
+    } if index.infra_objects else None, specs=[
+        QuestionSpec("What infrastructure is present in the scene?",
+                     "Infrastructure objects found: {names}", META_SCENE),
+    ]),
+    Block(fields=lambda index, _: present_elements(index.infra_objects, (
+        ("t-intersection", "T-intersection"),
+        ("four-way intersection", "4 way intersection"),
+        ("roundabout", "roundabout"),
+    )), specs=[
+        QuestionSpec("Is this a driving situation involving an 4 way intersection, T-intersection or roundabout?",
+                     "The scene includes: {elements}", META_SCENE),
+    ]),
+    Block(source=infra_objects, fields=object_fields, specs=[
+        QuestionSpec("What objects are located at {position}?", "{name} is located at {position}.", META_POSITION),
+    ]),
+    Block(source=infra_objects, fields=object_fields, specs=[
+        QuestionSpec("Where can I find {oid}?", "You can find object {oid} ({name}) at {position}.", META_POSITION),
+    ]),
+    Block(source=infra_objects, fields=object_fields, specs=[
+        QuestionSpec("What is the status of {oid} on {position}?", "The status of object {oid} is: {status}", META_STATE),
+    ]),
+])
+
+VEHICLE_QA = register("vehicles", [
+    Block(fields=lambda index, _: present_elements(index.vehicle_objects, (
+        ("police vehicle", "police vehicle"),
+        ("ambulance", "ambulance"),
+        ("fire truck", "fire truck"),
+        ("construction vehicle", "construction vehicle"),
+    )), specs=[
+        QuestionSpec("Is this a driving situation involving a police vehicle, ambulance, construction vehicle or fire truck?",
+                     "yes, includes: {elements}", META_EMERGENCY_PRESENCE),
+    ]),
+    Block(fields=lambda index, _: {
+        "count": len(index.vehicle_objects),
+        "types": ', '.join(dict.fromkeys(v[1]["obj_name"] for v in index.vehicle_objects)),
+    } if index.vehicle_objects else None, specs=[
+        QuestionSpec("What types of vehicles are present in the scene, and how many are there?",
+                     "There are {count} vehicles in total. Types: {types}", META_COUNTING),
+    ]),
+    Block(source=vehicle_objects, fields=object_fields, specs=[
+        QuestionSpec("Where can I find {oid}?", lambda v: f"The object {v['name'].strip()} is at position {v['position']}.",
+                     META_POSITION),
+    ]),
+    Block(source=vehicle_objects, fields=object_fields, specs=[
+        QuestionSpec("What is the status of {oid} on {position}?", "The status of object {oid} is: {status}", META_STATE),
+    ]),
+    Block(source=vehicle_objects, fields=object_fields, specs=[
+        QuestionSpec("Where can I find {oid}?", "You can find object {oid} ({name}) at {position}.", META_POSITION),
+    ]),
+    Block(source=vehicle_objects, fields=object_fields, specs=[
+        QuestionSpec("What is the status of {oid} on {position}?", "The status of object {oid} is: {status}", META_STATE),
+    ]),
+    # Additional spatial Q&A for emergency vehicles.
+    Block(source=lambda index: index.emergency_vehicle_objects, fields=emergency_fields, specs=[
+        QuestionSpec("What are the spatial details and emergency status of {name} {oid}?",
+                     "The {name} is located at {position}. Its emergency status includes: {status}.",
+                     META_EMERGENCY_STATE),
+    ]),
+])
+
+ROAD_USER_QA = register("road_users", [
+    Block(fields=lambda index, _: {
+        "users": ', '.join(dict.fromkeys(info.get("obj_name", "unknown") for oid, info in index.road_user_objects)),
+        "count": len(index.road_user_objects),
+    } if index.road_user_objects else None, specs=[
+        QuestionSpec("What are the road users depicted in the scene?",
+                     "The road users in this scene include: {users}.", META_SCENE),
+        QuestionSpec("How many road users are present in the scene?",
+                     "There are {count} road user(s) detected.", META_COUNTING),
+    ]),
+    Block(source=lambda index: index.road_user_objects, fields=road_user_fields, specs=[
+        QuestionSpec("Where is the {oid} located?", "The {oid} is located at {position}.", META_POSITION),
+        QuestionSpec("What is the status of the {oid}?", "The current status of the {oid} is: {status}.", META_STATE),
+        QuestionSpec("What is the importance ranking of the {oid}?",
+                     "The {oid} has an importance ranking of: {importance}.", META_RELATIONSHIP),
+        QuestionSpec("What safety annotations are associated with the {oid}?",
+                     "The {oid} has the following safety annotations: {safety}.", META_RISK),
+        QuestionSpec("Is the {oid} exiting the scene?", "The exiting status of the {oid} is: {exiting}.",
+                     META_EXISTENCE, when=lambda v: v["has_exiting"]),
+    ]),
+])
+
+EGO_QA = register("ego", [
+    Block(fields=lambda ctx, _: {
+        "position": ctx[1].ego_object[1].get("position", "Unknown"),
+    } if ctx[1].ego_object else None, specs=[
+        QuestionSpec("Where is the ego located now?", "The ego is located at {position}", META_EGO),
+    ]),
+    Block(fields=ego_fields, specs=[
+        QuestionSpec("What is the status of the ego? (Speed and steering)", "{ego_status}", META_EGO,
+                     when=lambda v: v["ego_status"]),
+        QuestionSpec("Explain the current situation for this scene.",
+                     "The ego is navigating the environment with {caption}", META_EGO_SITUATION),
+        QuestionSpec("Explain the maneuver that can be performed in this situation.", lambda v: v["maneuver"],
+                     META_EGO_MANEUVER, when=lambda v: v["maneuver"]),
+    ]),
+])
+
+# Relational questions (generate_qa(..., relational=True)), answered from the
+# FrameIndex label indices and spatial grid instead of comparing object pairs.
+
+def object_names(index, ids):
+    return ', '.join(str(index.objects[i][0]) for i in ids)
+
+def shared_positions(index):
+    """(position labels, object indices) for each distinct position held, in full, by 2+ objects."""
+    positions = dict.fromkeys(
+        tuple(info["position"]) for _, info in index.objects if isinstance(info.get("position"), list) and info["position"]
+    )
+    groups = []
+    for labels in positions:
+        ids = index.objects_at(labels)
+        if len(ids) > 1:
+            groups.append((list(labels), ids))
+    return groups
+
+def shared_labels(label_index_of):
+    def source(index):
+        return [(label, ids) for label, ids in label_index_of(index).items() if len(ids) > 1]
+    return source
+
+def group_fields(group, index):
+    labels, ids = group
+    return {"label": labels, "count": len(ids), "names": object_names(index, ids)}
+
+def neighbour_fields(item, index):
+    i, neighbours = item
+    return {
+        "oid": index.objects[i][0],
+        "max_gap": NEAR_DISTANCE_PIXELS,
+        "neighbours": ', '.join(
+            f"{index.objects[j][0]} ({'overlapping' if gap == 0 else f'{gap:.0f} px'})" for j, gap in neighbours
+        ),
+    }
+
+RELATIONAL_QA = register("relational", [
+    Block(source=shared_positions, fields=group_fields, specs=[
+        QuestionSpec("What objects are located at {label}?", "{count} objects are located at {label}: {names}.",
+                     META_POSITION),
+    ]),
+    Block(source=shared_labels(lambda index: index.position_index), fields=group_fields, specs=[
+        QuestionSpec("How many objects have the position {label}?",
+                     "{count} objects have the position {label}: {names}.", META_COUNTING),
+    ]),
+    Block(source=shared_labels(lambda index: index.status_index), fields=group_fields, specs=[
+        QuestionSpec("Which objects have the status {label}?", "{count} objects have the status {label}: {names}.",
+                     META_STATE),
+    ]),
+    Block(source=lambda index: index.near_objects, fields=neighbour_fields, specs=[
+        QuestionSpec("Which objects are close to the {oid}?",
+                     "Objects within {max_gap} pixels of the {oid}: {neighbours}.", META_RELATIONSHIP),
+    ]),
+])
+
+# Windowed temporal questions (generate_qa(..., temporal_state=...)), from the
+# rolling qa_temporal.TemporalState of the video: the last TEMPORAL_WINDOW frames.
+
+TRACKED_LABELS = sorted(VEHICLE_KEYWORDS | ROAD_USER_KEYWORDS)
+
+def speed_trend(state, stats):
+    run = state.speed_run
+    if run >= SUSTAINED_FRAMES:
+        return f"sustained acceleration over the last {run} frames"
+    if run <= -SUSTAINED_FRAMES:
+        return f"sustained deceleration over the last {-run} frames"
+    if stats["min"] == stats["max"]:
+        return "constant speed"
+    change = stats["last"] - stats["first"]
+    if abs(change) < 1:
+        return "roughly constant speed"
+    return "accelerating overall" if change > 0 else "decelerating overall"
+
+def speed_window_fields(state, _):
+    stats = state.statistics("speed")
+    if stats is None:
+        return None
+    return dict(stats, mean=f"{stats['mean']:.2f}", trend=speed_trend(state, stats))
+
+def sustained_speed_fields(state, _):
+    run = state.speed_run
+    if abs(run) < SUSTAINED_FRAMES:
+        return None
+    return {
+        "direction": "accelerating" if run > 0 else "decelerating",
+        "change": "increased" if run > 0 else "decreased",
+        "frames": abs(run),
+        "start": state.frames[-abs(run) - 1].speed,
+        "last": state.current.speed,
+    }
+
+def steering_window_fields(state, _):
+    stats = state.statistics("steering")
+    if stats is None:
+        return None
+    return dict(stats, mean=f"{stats['mean']:.2f}", turn=determine_intended_turn(stats["last"]))
+
+def persistence_fields(state, _):
+    nodes = state.persistent_nodes()
+    if not nodes:
+        return None
+    return {"n": len(state), "count": len(nodes), "names": ', '.join(nodes)}
+
+def count_trends(state):
+    if len(state) < 2:
+        return []
+    trends = []
+    for label in TRACKED_LABELS:
+        first, last = state.label_counts(label)
+        if first != last:
+            trends.append({"label": label, "first": first, "last": last, "n": len(state)})
+    return trends
+
+def safety_streak_fields(state, _):
+    if len(state) < 2 or not state.current.safe:
+        return None
+    return {"status": state.current.safe, "frames": state.safety_streak, "window": len(state)}
+
+TEMPORAL_QA = register("temporal", [
+    Block(fields=speed_window_fields, specs=[
+        QuestionSpec("How has the ego vehicle's speed changed over the last {n} frames?",
+                     "The speed went from {first} to {last} MPh (mean {mean} MPh, between {min} and {max} MPh): {trend}.",
+                     META_TEMPORAL),
+    ]),
+    Block(fields=sustained_speed_fields, specs=[
+        QuestionSpec("Has the ego vehicle been {direction} steadily?",
+                     "Yes, the speed {change} in each of the last {frames} frames, from {start} to {last} MPh.",
+                     META_TEMPORAL),
+    ]),
+    Block(fields=steering_window_fields, specs=[
+        QuestionSpec("How has the ego vehicle's steering changed over the last {n} frames?",
+                     "The steering went from {first} to {last} (mean {mean}); the ego is currently heading {turn}.",
+                     META_TEMPORAL),
+    ]),
+    Block(fields=persistence_fields, specs=[
+        QuestionSpec("Which objects have been present in each of the last {n} frames?",
+                     "{count} objects have been present throughout: {names}.", META_TEMPORAL),
+    ]),
+    Block(source=count_trends, fields=lambda trend, _: trend, specs=[
+        QuestionSpec("How has the number of {label} objects changed over the last {n} frames?",
+                     "The number of {label} objects went from {first} to {last}.", META_TEMPORAL),
+    ]),
+    Block(fields=safety_streak_fields, specs=[
+        QuestionSpec("How long has the scene's safety status been unchanged?",
+                     "The safety status has been '{status}' for {frames} of the last {window} frames.",
+                     META_TEMPORAL),
+    ]),
+])
+
 # ====================== Q&A Generation Functions =========================
 
 # def generate_expert_planning_humanized_qa(frame_data):
@@ -561,7 +1329,7 @@ def group_objects(frame_data):
 #     }
 #     return qa_pair
 
-def generate_object_safety_categorization_qa(objects, scenario, scenario_type, predefined_categories=None):
+def generate_object_safety_categorization_qa(objects, scenario, scenario_type, predefined_categories=None, index=None):
     """
     Generate Q&A pairs for objects based on the combination of their 'Object_Safety'
     categories. If an object belongs to more than one category (for example,
@@ -572,6 +1340,7 @@ def generate_object_safety_categorization_qa(objects, scenario, scenario_type, p
         scenario (str): Scenario information to be attached in each Q&A.
         scenario_type (str): (Unused in this example but kept for consistency.)
         predefined_categories (list, optional): List of safety categories. Defaults to None.
+        index (FrameIndex, optional): Prebuilt index of `objects`.
     
     Returns:
         list: A list of dictionaries, each representing a Q&A pair.
@@ -592,10 +1361,12 @@ def generate_object_safety_categorization_qa(objects, scenario, scenario_type, p
         "Requires Monitoring": "require monitoring"
     }
     
+    if index is None:
+        index = FrameIndex(objects)
+
     # Group objects by the sorted tuple of safety categories they belong to.
     groups = {}
-    for obj_id, obj_info in objects:
-        obj_name = obj_info.get("obj_name", "").strip()
+    for (obj_id, obj_info), obj_name in zip(objects, index.names):
         # Only include valid categories from the predefined list.
         obj_categories = [cat for cat in obj_info.get("Object_Safety", []) if cat in predefined_categories]
         if not obj_categories:
@@ -636,304 +1407,27 @@ def generate_traffic_markings_qa(ts_and_markings, scenario, scenario_type):
     """
     Generate Q&A for traffic road markings.
     """
-    qa_list = []
-    if not ts_and_markings:
-        return qa_list
-    names = [item['obj_name'] for item in ts_and_markings]
-    unique_names = set(names)
-    qa_list.append({
-        "Q": "Which traffic road markings are present in the scene?",
-        "A": f"road markings are present: {', '.join(unique_names)}.",
-        "Type": "Discovery",
-        "Task": "Object-Centric Questions",
-        "question_task": "object direction",
-        "AV_Task": "perception",
-        "scene_scenario": scenario,
-    })
-    
-    qa_list.append({
-        "Q": "How many traffic road markings are present in the scene?",
-        "A": f"the Number of road markings are present: {len(ts_and_markings)}",
-        "Type": "Discovery",
-        "Task": "Object-Centric Questions",
-        "question_task": "Counting",
-        "AV_Task": "perception",
-        "scene_scenario": scenario,
-    })
-    
-    for item in ts_and_markings:
-        name = item["obj_id"]
-        position = item["position"]
-        status = item["status"]
-        if isinstance(status, list):
-            status_str = ', '.join(status) if status else "No status"
-        else:
-            status_str = str(status) if status else "No status"
-        qa_list.append({
-            "Q": f"Where is the {name} located?",
-            "A": f"{name} is located at {position}",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Position Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        qa_list.append({
-            "Q": f"Where is the {name} status?",
-            "A": f"{name} is status: {status_str}",
-            "Type": "Discovery",
-            "Task": "State Identification",
-            "question_task": "State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        qa_list.append({
-            "Q": f"Where is the {name} located, and what is its status?",
-            "A": f"{name} is located at {position}, with status: {status_str}",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Position and State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    return qa_list
+    return TRAFFIC_MARKINGS_QA.qa(ts_and_markings, scenario)
 
 def generate_traffic_sign_qa(traffic_signs, scenario, scenario_type):
     """
     Generate Q&A for traffic signs.
     """
-    qa_list = []
-    if not traffic_signs:
-        return qa_list
-    sign_names = [ts['obj_name'] for ts in traffic_signs]
-    sign_positions = [ts['position'] for ts in traffic_signs]
-    
-    
-    qa_list.append({
-        "Q": "Which traffic signs are present in the scene, and where are they located?",
-        "A": f"Traffic signs found: {', '.join(sign_names)} at positions {', '.join(str(pos) for pos in sign_positions)}",
-        "Type": "Discovery",
-        "Task": "Object-Centric Questions",
-        "question_task": "object direction",
-        "AV_Task": "perception",
-        "scene_scenario": scenario,
-    })
-    qa_list.append({
-        "Q": "How many traffic signs are present in the scene?",
-        "A": f"number of traffic signs: {', '.join(sign_names)}. Total count: {len(traffic_signs)}",
-        "Type": "Discovery",
-        "Task": "Object-Centric Questions",
-        "question_task": "Counting",
-        "AV_Task": "perception",
-        "scene_scenario": scenario,
-    })
-    for sign in traffic_signs:
-        sign_name = sign['obj_name'].lower()
-        sign_position = sign['position']
-        status = sign["status"]
-        boxes= str(sign["boxes"])
-        if isinstance(status, list):
-            status_str = ', '.join(status) if status else "No status"
-        else:
-            status_str = str(status) if status else "No status"
-        qa_list.append({
-            "Q": f"Where is the {sign_name} located, and what is its status?",
-            "A": f"{sign_name} is located at {sign_position} <bb>{boxes}</bb>",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Position Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        qa_list.append({
-            "Q": f"Where is the {sign_name} located, and what is its status?",
-            "A": f"{sign_name} status: {status_str}",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        qa_list.append({
-            "Q": f"Where is the {sign_name} located, and what is its status?",
-            "A": f"{sign_name} is located at {sign_position} <bb>{boxes}</bb>, with status: {status_str}",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Position and State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        
-        rule_description = generate_rule_description(sign_name, boxes)
-        qa_list.append({
-            "Q": f"What rule does the {sign.get('obj_name', sign_name)} at position {sign_position} impose?",
-            "A": rule_description,
-            "Type": "Association",
-            "Task": "Context-Based Questions",
-            "question_task": "Scene Classification",
-            "AV_Task": "plan",
-            "scene_scenario": scenario,
-        })
-        
-    return qa_list
+    return TRAFFIC_SIGN_QA.qa(traffic_signs, scenario)
 
 def generate_traffic_light_qa(traffic_lights, scenario, scenario_type):
     """
     Generate Q&A for traffic lights.
     """
-    qa_list = []
-    if not traffic_lights:
-        return qa_list
-    
-    # Q&A for overall count of traffic lights.
-    num_lights = len(traffic_lights)
-    qa_list.append({
-        "Q": "How many traffic lights are present in the scene?",
-        "A": f"There {'is' if num_lights == 1 else 'are'} {num_lights} traffic light{'s' if num_lights != 1 else ''} detected.",
-        "Type": "Discovery",
-        "Task": "Object-Centric Questions",
-        "question_task": "Counting",
-        "AV_Task": "perception",
-        "scene_scenario": scenario,
-    })
-    # For each traffic light, split the Q&A into multiple questions.
-    for tl in traffic_lights:
-        obj_name = tl.get("obj_name", "traffic light")
-        boxes= tl.get("boxes","")
-        # Q&A for position.
-        pos_list = tl.get("position", [])
-        position = " ".join(pos_list) if pos_list else "an unknown position"
-        qa_list.append({
-            "Q": f"Where is the {obj_name} <bb>{boxes}</bb> located?",
-            "A": f"The {obj_name} <bb>{boxes}</bb> is located at {position}.",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "object direction",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        
-        # Q&A for status.
-        status_list = tl.get("Status", [])
-        status = " ".join(status_list) if status_list else "status unknown"
-        qa_list.append({
-            "Q": f"What is the current status of the {obj_name} <bb>{boxes}</bb> ?",
-            "A": f"The current status of the {obj_name} <bb>{boxes}</bb>  is {status}.",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        
-        # Q&A for importance ranking.
-        importance = tl.get("importance_ranking", "not specified")
-        qa_list.append({
-            "Q": f"What is the importance ranking of the {obj_name} <bb>{boxes}</bb> ?",
-            "A": f"The {obj_name} <bb>{boxes}</bb>  has a {importance} importance ranking.",
-            "Type": "Association",
-            "Task": "Context-Based Questions",
-            "question_task": "Relationship",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        
-        # Q&A for safety annotations.
-        safety_objects = tl.get("Object_Safety", [])
-        safety_text = ", ".join(safety_objects) if safety_objects else "no specific safety affecting"
-        qa_list.append({
-            "Q": f"What is affecting the ego's safety from this {obj_name} <bb>{boxes}</bb>?",
-            "A": f"The {obj_name} is associated with the following safety: {safety_text}.",
-            "Type": "Association",
-            "Task": "Context-Based Questions",
-            "question_task": "Relationship",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    return qa_list
+    return TRAFFIC_LIGHT_QA.qa(traffic_lights, scenario)
 
-def generate_drivable_area_qa(objects, frame_data, scenario, scenario_type):
+def generate_drivable_area_qa(objects, frame_data, scenario, scenario_type, index=None):
     """
     Generate Q&A related to the drivable area.
     """
-    qa_list = []
-    drivable_object = None
-    for obj in objects:
-        oid, info = obj
-        if info.get("obj_name", "").lower() == "drivable area":
-            drivable_object = obj
-            break
-    if not drivable_object:
-        qa_list.append({
-            "Q": "Is there a drivable area for the ego?",
-            "A": "No, a drivable area is not detected in the scene.",
-            "Type": "Association",
-            "Task": "Context-Based Questions",
-            "question_task": "Scene Classification",
-            "AV_Task": "plan",
-            "scene_scenario": scenario,
-        })
-        return qa_list
-    oid, info = drivable_object
-    coordinates = "; ".join([f"({point[0]}, {point[1]})" for point in info.get("polyline", [])])
-    try:
-        polyline = info.get("polyline", [])
-        if len(polyline) < 3:
-            raise ValueError("Insufficient points to form a polygon.")
-        if polyline[0] != polyline[-1]:
-            closed_polyline = polyline + [polyline[0]]
-        else:
-            closed_polyline = polyline
-        polygon = Polygon(closed_polyline)
-        if not polygon.is_valid:
-            print("Invalid polygon detected. Using convex hull to approximate the area.")
-            polygon = MultiPoint(polyline).convex_hull
-        area = polygon.area
-        size_threshold = 50000
-        size_category = "big" if area > size_threshold else "small"
-    except Exception as e:
-        print(f"Error calculating area: {e}")
-        area = None
-        size_category = "unknown"
-    
-    qa_list.append({
-        "Q": "Is there a drivable area for the ego?",
-        "A": "Yes, a drivable area is present.",
-        "Type": "Discovery",
-        "Type": "Association",
-        "Task": "Context-Based Questions",
-        "question_task": "Scene Classification",
-        "AV_Task": "plan",
-        "scene_scenario": scenario,
-    })
-    
-    qa_list.append({
-        "Q": "Is the drivable area big or small?",
-        "A": f"The drivable area is {size_category}.",
-        "Type": "Discovery",
-        "Type": "Association",
-        "Task": "Context-Based Questions",
-        "question_task": "Scene Classification",
-        "AV_Task": "plan",
-        "scene_scenario": scenario,
-    })
-    
-    qa_list.append({
-        "Q": "Explain situational awareness concerning the ego in relation to the drivable area.",
-        "A": (
-            f"1) The scene includes a drivable area which is crucial for navigation. "
-            f"2) The drivable area defines the safe navigable space. "
-            f"3) It is categorized as a {size_category} area, affecting the ego's maneuvering strategy."
-        ),
-        "Type": "Association",
-        "Task": "Context-Based Questions",
-        "question_task": "Scene Classification",
-        "AV_Task": "plan",
-        "scene_scenario": scenario,
-    })
-    
-    return qa_list
+    if index is None:
+        index = FrameIndex(objects)
+    return DRIVABLE_AREA_QA.qa(index, scenario)
 
 # def generate_relation_qa(relations, scenario, scenario_type):
 #     """
@@ -968,24 +1462,31 @@ def generate_causal_relations(objects):
       - "Is_causal": either "Cause" or "Effect" (or empty)
     """
     edges = []
-    ALLOWED_CAUSAL_RELATIONS = ("Direct", "Chain", "Confounder", "Collider", "Mediator", "correlations")
     for node in objects:
         node_id, node_info = node
-        object_causal = node_info.get("Object_Causal", "").strip()
-        causal_relation = node_info.get("Causal_Relation", "").strip()
-        is_causal = node_info.get("Is_causal", "").strip()  # "Cause", "Effect", or empty
-        if object_causal and is_causal in ("Cause", "Effect"):
-            if causal_relation not in ALLOWED_CAUSAL_RELATIONS:
-                causal_relation = "Direct"
-            if is_causal == "Cause":
-                edges.append([node_id, object_causal, {"relation": f"{causal_relation} (causal)", "causal": True}])
-            elif is_causal == "Effect":
-                edges.append([object_causal, node_id, {"relation": f"{causal_relation} (causal)", "causal": True}])
+        edge = causal_edge(node_id, node_info)
+        if edge is not None:
+            edges.append(edge)
     return edges
 
+def causal_edge(node_id, node_info):
+    """
+    The causal edge a single node declares, or None.
+    """
+    object_causal = node_info.get("Object_Causal", "").strip()
+    causal_relation = node_info.get("Causal_Relation", "").strip()
+    is_causal = node_info.get("Is_causal", "").strip()  # "Cause", "Effect", or empty
+    if object_causal and is_causal in ("Cause", "Effect"):
+        if causal_relation not in ALLOWED_CAUSAL_RELATIONS:
+            causal_relation = "Direct"
+        if is_causal == "Cause":
+            return [node_id, object_causal, {"relation": f"{causal_relation} (causal)", "causal": True}]
+        return [object_causal, node_id, {"relation": f"{causal_relation} (causal)", "causal": True}]
+    return None
+
 
 ##################### Our Generates a causal-chain-of-thought (CCoT) reasoning Q&A pair that provides step-by-step ######################################
-def generate_ccot_reasoning(frame_data, scenario, scenario_type):
+def generate_ccot_reasoning(frame_data, scenario, scenario_type, index=None):
     """
     Generates a causal-chain-of-thought (CCoT) reasoning Q&A pair that provides step-by-step
     directional guidance for how the ego vehicle should act given the current conditions.
@@ -997,7 +1498,9 @@ def generate_ccot_reasoning(frame_data, scenario, scenario_type):
       - A concluding directive to pursue the intended goal when conditions allow.
     """
     # Extract basic frame data
-    objects = frame_data.get('graph', {}).get('nodes', [])
+    if index is None:
+        index = FrameIndex.from_frame(frame_data)
+    objects = index.objects
     image_id = frame_data.get("image_id", "").strip()
     goal = frame_data.get("goal-oriented", "").strip()
     safety_status_raw = frame_data.get("safe", "").strip().lower()
@@ -1010,15 +1513,13 @@ def generate_ccot_reasoning(frame_data, scenario, scenario_type):
     safety_status, safety_reasoning = determine_safety_status(safety_status_raw)
     
     # Identify objects that impact safety with positional and status info.
-    affecting_safety = []
-    for obj_id, obj_info in objects:
-        position = extract_position_description(obj_info)
-        status = extract_status_description(obj_info)
-        if "Affects Safety" in obj_info.get("Object_Safety", []):
-            affecting_safety.append(f"{obj_id} (Position: {position}, Status: {status})")
+    affecting_safety = [
+        f"{objects[i][0]} (Position: {index.position(i)}, Status: {index.status(i)})"
+        for i in index.affecting_safety
+    ]
     
-    # Build description of causal relationships (assumed helper function)
-    causal_edges = generate_causal_relations(objects)
+    # Build description of causal relationships
+    causal_edges = index.causal_edges
     if causal_edges:
         causal_desc = ("Causal relations identified: " +
                        ", ".join([f"{edge[0]} → {edge[1]} (Relation: {edge[2]['relation']})" 
@@ -1107,7 +1608,7 @@ def generate_ccot_reasoning(frame_data, scenario, scenario_type):
     }
 
 
-def generate_ccot_reasoning_1(frame_data, scenario, scenario_type):
+def generate_ccot_reasoning_1(frame_data, scenario, scenario_type, index=None):
     """
     Generates a 7-step causal-chain-of-thought (CCoT) reasoning explanation detailing how the ego vehicle should act.
     
@@ -1123,7 +1624,8 @@ def generate_ccot_reasoning_1(frame_data, scenario, scenario_type):
     This function returns a Q&A pair that can be used in further decision-making processes.
     """
     # Extract basic frame data.
-    objects = frame_data.get('graph', {}).get('nodes', [])
+    if index is None:
+        index = FrameIndex.from_frame(frame_data)
     safety_status_raw = frame_data.get("safe", "").strip().lower()
     cause_list = frame_data.get("cause", [])
     goal = frame_data.get("goal-oriented", "").strip()
@@ -1176,15 +1678,8 @@ def generate_ccot_reasoning_1(frame_data, scenario, scenario_type):
         step4 = "4) Vehicle Intent: No specific goal, maneuver, or scene description provided."
 
     # Step 5: Highlight objects affecting safety and report causal relations.
-    affecting_safety_objects = []
-    potentially_affecting_objects = []
-    for obj_id, obj_info in objects:
-        obj_name = obj_info.get("obj_name", "Unknown").strip()
-        object_safety_list = obj_info.get("Object_Safety", [])
-        if "Affects Safety" in object_safety_list:
-            affecting_safety_objects.append(obj_name)
-        elif "Potentially Affect Safety" in object_safety_list:
-            potentially_affecting_objects.append(obj_name)
+    affecting_safety_objects = index.affecting_safety_names
+    potentially_affecting_objects = index.potentially_affecting_names
     parts = []
     if affecting_safety_objects:
         parts.append(f"Objects affecting safety: {', '.join(affecting_safety_objects)}")
@@ -1192,8 +1687,8 @@ def generate_ccot_reasoning_1(frame_data, scenario, scenario_type):
         parts.append(f"Potentially affecting objects: {', '.join(potentially_affecting_objects)}")
     objects_info = "; ".join(parts) if parts else "No objects flagged for safety concerns."
     
-    # Retrieve causal relations using your helper.
-    causal_edges = generate_causal_relations(objects)
+    # Causal relations (generate_causal_relations, precomputed in the index).
+    causal_edges = index.causal_edges
     if causal_edges:
         causal_str = "Causal relations: " + ", ".join(
             [f"{edge[0]} -> {edge[1]} (relation: {edge[2]['relation']})" for edge in causal_edges]
@@ -1241,7 +1736,7 @@ def generate_ccot_reasoning_1(frame_data, scenario, scenario_type):
     }
 
 
-def generate_ccot_reasoning_2(frame_data, scenario, scenario_type):
+def generate_ccot_reasoning_2(frame_data, scenario, scenario_type, index=None):
     """
     Generates a causal-chain-of-thought (CCoT) explanation that follows a seven-step template with a scenario-specific twist.
     
@@ -1257,7 +1752,8 @@ def generate_ccot_reasoning_2(frame_data, scenario, scenario_type):
     The function returns a Q&A pair along with the raw causal edges for further processing.
     """
     # Extract key metadata.
-    objects = frame_data.get('graph', {}).get('nodes', [])
+    if index is None:
+        index = FrameIndex.from_frame(frame_data)
     safety_status_raw = frame_data.get("safe", "").strip().lower()
     cause_list = frame_data.get("cause", [])
     goal = frame_data.get("goal-oriented", "").strip()
@@ -1269,7 +1765,7 @@ def generate_ccot_reasoning_2(frame_data, scenario, scenario_type):
     caption = frame_data.get("caption", "").strip()
     
     # Step 1: Identify High-Ranking Objects Affecting Ego Safety.
-    high_ranking_objects = identify_high_ranking_objects(objects, ranking_threshold="high")
+    high_ranking_objects = index.high_ranking_objects
     if high_ranking_objects:
         high_ranking_str = ", ".join(high_ranking_objects)
     else:
@@ -1308,15 +1804,8 @@ def generate_ccot_reasoning_2(frame_data, scenario, scenario_type):
         safety_status_str = f"ambiguous: {safety_reasoning}"
     
     # Gather objects that affect safety (both definite and potential).
-    affecting_objects = []
-    potential_objects = []
-    for obj_id, obj_info in objects:
-        obj_name = obj_info.get("obj_name", "Unknown").strip()
-        safety_list = obj_info.get("Object_Safety", [])
-        if "Affects Safety" in safety_list:
-            affecting_objects.append(obj_name)
-        elif "Potentially Affect Safety" in safety_list:
-            potential_objects.append(obj_name)
+    affecting_objects = index.affecting_safety_names
+    potential_objects = index.potentially_affecting_names
     parts = []
     if affecting_objects:
         parts.append(f"affecting: {', '.join(affecting_objects)}")
@@ -1325,7 +1814,7 @@ def generate_ccot_reasoning_2(frame_data, scenario, scenario_type):
     objects_info = "; ".join(parts) if parts else "No objects flagged for safety concerns."
     
     # Retrieve causal relations.
-    causal_edges = generate_causal_relations(objects)
+    causal_edges = index.causal_edges
     if causal_edges:
         causal_str = "Causal relations: " + ", ".join(
             [f"{edge[0]} -> {edge[1]} (relation: {edge[2]['relation']})" for edge in causal_edges]
@@ -1377,250 +1866,28 @@ def generate_ccot_reasoning_2(frame_data, scenario, scenario_type):
     }
 
 ######################### QA bu Grouping ##################################
-def generate_infrastructure_qa(objects, frame_data, scenario, scenario_type):
+def generate_infrastructure_qa(objects, frame_data, scenario, scenario_type, index=None):
     """
-    Generate Q&A for Ego-Infrastructure.
+    Generate Q&A for Ego-Infrastructure, followed by the Q&A for traffic signs,
+    lights, and markings.
     """
-    qa_list = []
-    infrastructure_keywords = {
-        "bridge", "crosswalk", "street furniture", "pedestrian crossing marking", "road", "bicycle lane",
-        "train lane", "sidewalk", "t-intersection", "four-way intersection", "drivable area", "traffic light",
-        "traffic light pedestrian", "ts_stop", "stop marking", "ts_yield", "ts_speed_limit_15", "ts_speed_limit_20",
-        "ts_speed_limit_25", "ts_speed_limit_30", "ts_speed_limit_40", "ts_speed_limit_45", "ts_speed_limit_50",
-        "ts_speed_limit_60", "ts_speed_limit_70", "ts_speed_limit_80", "ts_railroad_crossing",
-        "railway_crossing_ahead_skew_left", "railway_crossing_ahead_skew_right", "ts_pedestrian_crossing",
-        "ts_keep_left_road", "ts_keep_right_road", "ts_no_entry", "ts_parking", "ts_no_parking", "ts_school_zone",
-        "ts_directional", "ts_warning", "ts_no_u_turn", "ts_no_left_u_turn", "ts_no_left_turn", "ts_no_right_turn",
-        "ts_hospital", "ts_road_work", "ts_traffic_signal_ahead", "ts_roundabout_ahead", "ts_bus_stop",
-        "ts_bicycle_crossing", "ts_construction_sign", "construction_zone", "bus station", "gas station",
-        "manhole", "parking_space", "parking_lot", "parking_meter", "barrier", "bollard", "cone", "trash_bin",
-        "tree", "pole", "road divider", "street sign"
-    }
-    infra_objects = [
-        (oid, info) for (oid, info) in objects
-        if info.get("obj_name", "").lower() in infrastructure_keywords
-    ]
-    
-    if infra_objects:
-        infra_names = [inf[1]["obj_name"] for inf in infra_objects]
-        unique_infra = set(infra_names)
-        qa_list.append({
-            "Q": "What infrastructure is present in the scene?",
-            "A": f"Infrastructure objects found: {', '.join(unique_infra)}",
-            "Type": "Association",
-            "Task": "Context-Based Questions",
-            "question_task": "Scene Classification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    has_T_intersection = any("t-intersection" in inf[1]["obj_name"].lower() for inf in infra_objects)
-    has_intersection = any("four-way intersection" in inf[1]["obj_name"].lower() for inf in infra_objects)
-    has_roundabout = any("roundabout" in inf[1]["obj_name"].lower() for inf in infra_objects)
-    
-    scene_elements = []
-    if has_T_intersection:
-        scene_elements.append("T-intersection")
-    if has_intersection:
-        scene_elements.append("4 way intersection")
-    if has_roundabout:
-        scene_elements.append("roundabout")
-    
-    if scene_elements:
-        qa_list.append({
-            "Q": "Is this a driving situation involving an 4 way intersection, T-intersection or roundabout?",
-            "A": f"The scene includes: {', '.join(scene_elements)}",
-            "Type": "Association",
-            "Task": "Context-Based Questions",
-            "question_task": "Scene Classification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    for oid, info in infra_objects:
-        pos = info.get("position", "Unknown")
-        qa_list.append({
-            "Q": f"What objects are located at {pos}?",
-            "A": f"{info.get('obj_name', 'Unknown')} is located at {pos}.",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Position Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    for oid, info in infra_objects:
-        pos = info.get("position", "Unknown")
-        qa_list.append({
-            "Q": f"Where can I find {oid}?",
-            "A": f"You can find object {oid} ({info.get('obj_name', '')}) at {pos}.",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Position Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    for oid, info in infra_objects:
-        pos = info.get("position", "Unknown")
-        status = info.get("Status", [])
-        status_str = ", ".join(status) if status else "No status info"
-        qa_list.append({
-            "Q": f"What is the status of {oid} on {pos}?",
-            "A": f"The status of object {oid} is: {status_str}",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    # Add Q&A for traffic signs, lights, and markings
-    traffic_signs = detect_traffic_signs(objects)
-    qa_list.extend(generate_traffic_sign_qa(traffic_signs, scenario, scenario_type))
-    
-    traffic_lights = detect_traffic_lights(objects)
-    qa_list.extend(generate_traffic_light_qa(traffic_lights, scenario, scenario_type))
-    
-    ts_and_markings = detect_markings(objects)
-    qa_list.extend(generate_traffic_markings_qa(ts_and_markings, scenario, scenario_type))
-    
+    if index is None:
+        index = FrameIndex(objects)
+    qa_list = INFRASTRUCTURE_QA.qa(index, scenario)
+    qa_list += TRAFFIC_SIGN_QA.qa(index.traffic_signs, scenario)
+    qa_list += TRAFFIC_LIGHT_QA.qa(index.traffic_lights, scenario)
+    qa_list += TRAFFIC_MARKINGS_QA.qa(index.markings, scenario)
     return qa_list
 
-def generate_vehicle_qa(objects, frame_data, scenario, scenario_type):
+def generate_vehicle_qa(objects, frame_data, scenario, scenario_type, index=None):
     """
     Generate Q&A for the Ego-Vehicle category.
     """
-    qa_list = []
-    vehicle_keywords = {
-        "car", "truck", "bus", "motorcycle", "construction vehicle",
-        "police vehicle", "ambulance", "fire truck"
-    }
-    vehicle_objects = [
-        (oid, info) for (oid, info) in objects
-        if info.get("obj_name", "").lower() in vehicle_keywords
-    ]
-
-
-    has_police = any("police vehicle" in inf[1]["obj_name"].lower() for inf in vehicle_objects)
-    has_ambulance= any("ambulance" in inf[1]["obj_name"].lower() for inf in vehicle_objects)
-    has_fire = any("fire truck" in inf[1]["obj_name"].lower() for inf in vehicle_objects)
-    has_construction = any("construction vehicle" in inf[1]["obj_name"].lower() for inf in vehicle_objects)
-
-    vehicle_elements = []
-    if has_police:
-        vehicle_elements.append("police vehicle")
-    if has_ambulance:
-        vehicle_elements.append("ambulance")
-    if has_fire:
-        vehicle_elements.append("fire truck")
-    if has_construction:
-        vehicle_elements.append("construction vehicle")
-    
-    if vehicle_elements:
-        qa_list.append({
-            "Q": "Is this a driving situation involving a police vehicle, ambulance, construction vehicle or fire truck?",
-            "A": f"yes, includes: {', '.join(vehicle_elements)}",
-            "Type": "Association",
-            "Task": "Object-Centric Questions",
-            "question_task": "existence",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    if vehicle_objects:
-        names = [v[1]["obj_name"] for v in vehicle_objects]
-        unique_types = set(names)
-        qa_list.append({
-            "Q": "What types of vehicles are present in the scene, and how many are there?",
-            "A": f"There are {len(vehicle_objects)} vehicles in total. Types: {', '.join(unique_types)}",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Counting",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    for oid, info in vehicle_objects:
-        pos = info.get("position", "Unknown")
-        qa_list.append({
-            "Q": f"Where can I find {oid}?",
-            "A": f"The object {info.get('obj_name', '').strip()} is at position {pos}.",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Position Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    for oid, info in vehicle_objects:
-        pos = info.get("position", "Unknown")
-        status = info.get("Status", [])
-        status_str = ", ".join(status) if status else "No status info"
-        qa_list.append({
-            "Q": f"What is the status of {oid} on {pos}?",
-            "A": f"The status of object {oid} is: {status_str}",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        
-    for oid, info in vehicle_objects:
-        pos = info.get("position", "Unknown")
-        qa_list.append({
-            "Q": f"Where can I find {oid}?",
-            "A": f"You can find object {oid} ({info.get('obj_name', '')}) at {pos}.",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Position Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    for oid, info in vehicle_objects:
-        pos = info.get("position", "Unknown")
-        status = info.get("Status", [])
-        status_str = ", ".join(status) if status else "No status info"
-        qa_list.append({
-            "Q": f"What is the status of {oid} on {pos}?",
-            "A": f"The status of object {oid} is: {status_str}",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    # Additional spatial Q&A for emergency vehicles.
-    emergency_keywords = {"police vehicle", "ambulance", "fire truck"}
-    emergency_vehicle_objects = [
-        (oid, info) for (oid, info) in vehicle_objects
-        if info.get("obj_name", "").lower() in emergency_keywords
-    ]
-    
-    for oid, info in emergency_vehicle_objects:
-        pos = info.get("position", "Unknown")
-        if isinstance(pos, list):
-            pos = " ".join(pos)
-        status = info.get("Status", [])
-        # The emergency statuses might include phrases such as:
-        # "Emergency Lights On", "Emergency Lights Off", "Flashing Lights", "Responding", "Patrolling", "drivable area"
-        emergency_status_str = ", ".join(status) if status else "No emergency status provided"
-        qa_list.append({
-            "Q": f"What are the spatial details and emergency status of {info.get('obj_name', 'emergency vehicle')} {oid}?",
-            "A": (f"The {info.get('obj_name', 'emergency vehicle')} is located at {pos}. "
-                  f"Its emergency status includes: {emergency_status_str}."),
-            "Type": "Association",
-            "Task": "Object-Centric Questions",
-            "question_task": "State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    return qa_list
+    if index is None:
+        index = FrameIndex(objects)
+    return VEHICLE_QA.qa(index, scenario)
 
-def generate_road_users_qa(objects, frame_data, scenario, scenario_type):
+def generate_road_users_qa(objects, frame_data, scenario, scenario_type, index=None):
     """
     Generate Q&A pairs for the Ego-Road Users category.
     
@@ -1649,210 +1916,46 @@ def generate_road_users_qa(objects, frame_data, scenario, scenario_type):
         frame_data (dict): (Unused here, but available for additional frame-related info.)
         scenario (str): The scene description.
         scenario_type (str): The type of scenario.
+        index (FrameIndex, optional): Prebuilt index of `objects`.
     
     Returns:
         list: A list of Q&A dictionaries.
     """
-    qa_list = []
-    
-    # Define keywords for road users.
-    road_user_keywords = {
-        "pedestrian", "cyclist", "bicycle", "dog", "skateboard", 
-        "baby stroller", "flat car trolley", "handbag"
-    }
-    
-    # Filter objects based on road user keywords.
-    road_user_objects = [
-        (oid, info) for (oid, info) in objects
-        if info.get("obj_name", "").lower() in road_user_keywords
-    ]
-    
-    # If any road users are detected, add overall Q&A.
-    if road_user_objects:
-        # Overall depiction of road users.
-        names = [info.get("obj_name", "unknown") for oid, info in road_user_objects]
-        unique_users = set(names)
-        qa_list.append({
-            "Q": "What are the road users depicted in the scene?",
-            "A": f"The road users in this scene include: {', '.join(unique_users)}.",
-            "Type": "Association",
-            "Task": "Context-Based Questions",
-            "question_task": "Scene Classification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        # Overall count of road users.
-        qa_list.append({
-            "Q": "How many road users are present in the scene?",
-            "A": f"There are {len(road_user_objects)} road user(s) detected.",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Counting",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    # Generate Q&A for each individual road user.
-    for oid, info in road_user_objects:
-        obj_name = info.get("obj_name", "unknown road user")
-        
-        # Normalize position: join if it's a list.
-        pos = info.get("position", "Unknown")
-        if isinstance(pos, list):
-            pos = " ".join(pos)
-        
-        # Normalize status.
-        status = info.get("Status", [])
-        if isinstance(status, list):
-            status_str = ", ".join(status) if status else "unknown"
-        else:
-            status_str = status or "unknown"
-        
-        # Check for importance ranking.
-        importance = info.get("importance_ranking") or info.get("importance", "not specified")
-        
-        # Get safety annotations.
-        safety_list = info.get("Object_Safety", [])
-        safety_str = ", ".join(safety_list) if safety_list else "none"
-        
-        # Exiting status (if available).
-        exiting = info.get("exiting", None)
-        if exiting is None:
-            exiting_str = "not specified"
-        elif isinstance(exiting, bool):
-            exiting_str = "Yes" if exiting else "No"
-        else:
-            exiting_str = str(exiting)
-        
-        # Q: Where is the road user located?
-        qa_list.append({
-            "Q": f"Where is the {oid} located?",
-            "A": f"The {oid} is located at {pos}.",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Position Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        
-        # Q: What is the current status of the road user?
-        qa_list.append({
-            "Q": f"What is the status of the {oid}?",
-            "A": f"The current status of the {oid} is: {status_str}.",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "State Identification",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        
-        # Q: What is the importance ranking of the road user?
-        qa_list.append({
-            "Q": f"What is the importance ranking of the {oid}?",
-            "A": f"The {oid} has an importance ranking of: {importance}.",
-            "Type": "Association",
-            "Task": "Context-Based Questions",
-            "question_task": "Relationship",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        
-        # Q: What safety annotations are associated with the road user?
-        qa_list.append({
-            "Q": f"What safety annotations are associated with the {oid}?",
-            "A": f"The {oid} has the following safety annotations: {safety_str}.",
-            "Type": "Intervention",
-            "Task": "Safety-Based Questions",
-            "question_task": "Risk & Anomaly Detection",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-        
-        # Q: Is the road user exiting the scene? (if such information exists)
-        if "exiting" in info:
-            qa_list.append({
-                "Q": f"Is the {oid} exiting the scene?",
-                "A": f"The exiting status of the {oid} is: {exiting_str}.",
-                "Type": "Discovery",
-                "Task": "Object-Centric Questions",
-                "question_task": "existence",
-                "AV_Task": "perception",
-                "scene_scenario": scenario,
-            })
-    
-    return qa_list
+    if index is None:
+        index = FrameIndex(objects)
+    return ROAD_USER_QA.qa(index, scenario)
 
-def generate_ego_qa(objects, frame_data, scenario, scenario_type):
+def generate_relational_qa(objects, frame_data, scenario, scenario_type, index=None):
+    """
+    Generate relational Q&A: objects sharing a position or status, and the
+    objects close to each object (within NEAR_DISTANCE_PIXELS).
+    """
+    if index is None:
+        index = FrameIndex(objects)
+    return RELATIONAL_QA.qa(index, scenario)
+
+def generate_temporal_qa(temporal_state, scenario, scenario_type):
+    """
+    Generate windowed temporal Q&A (speed / steering trends, object persistence,
+    count trends, safety-status duration) from the video's TemporalState,
+    already updated with the current frame.
+    """
+    return TEMPORAL_QA.qa(temporal_state, scenario)
+
+def generate_ego_qa(objects, frame_data, scenario, scenario_type, index=None):
     """
     Generate Q&A for the Ego-Ego category.
     """
-    qa_list = []
-    ego_object = None
-    for oid, info in objects:
-        if info.get("obj_name", "").strip().lower() == "ego":
-            ego_object = (oid, info)
-            break
-    speed = frame_data.get("speed", None)
-    steering = frame_data.get("steering", None)
-    
-    if ego_object:
-        position = ego_object[1].get("position", "Unknown")
-        qa_list.append({
-            "Q": "Where is the ego located now?",
-            "A": f"The ego is located at {position}",
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Object-Centric Questions",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    ego_status_info = []
-    if speed is not None:
-        ego_status_info.append(f"Speed: {speed}")
-    if steering is not None:
-        ego_status_info.append(f"Steering: {steering}")
-    
-    if ego_status_info:
-        qa_list.append({
-            "Q": "What is the status of the ego? (Speed and steering)",
-            "A": " and ".join(ego_status_info),
-            "Type": "Discovery",
-            "Task": "Object-Centric Questions",
-            "question_task": "Object-Centric Questions",
-            "AV_Task": "perception",
-            "scene_scenario": scenario,
-        })
-    
-    caption = frame_data.get("caption", "")
-    qa_list.append({
-        "Q": "Explain the current situation for this scene.",
-        "A": f"The ego is navigating the environment with {caption}",
-        "Type": "Association",
-        "Task": "Object-Centric Questions",
-        "question_task": "Context-Based Questions",
-        "AV_Task": "perception",
-        "scene_scenario": scenario,
-    })
-    
-    maneuver = frame_data.get("maneuver", "")
-    if maneuver:
-        qa_list.append({
-            "Q": "Explain the maneuver that can be performed in this situation.",
-            "A": maneuver,
-            "Type": "Intervention",
-            "Task": "Object-Centric Questions",
-            "question_task": "Planning-Based Questions",
-            "AV_Task": "plan",
-            "scene_scenario": scenario,
-        })
-    
-    return qa_list
+    if index is None:
+        index = FrameIndex(objects)
+    return EGO_QA.qa((frame_data, index), scenario)
 
-def generate_global_qa(frame_data, objects, scenario, scenario_type):
+def generate_global_qa(frame_data, objects, scenario, scenario_type, index=None):
     """
     Generate global Q&A for the scene.
     """
+    if index is None:
+        index = FrameIndex(objects)
     qa_list = []
     goal = frame_data.get("goal-oriented", "")
     maneuver = frame_data.get("maneuver", "")
@@ -1923,8 +2026,7 @@ def generate_global_qa(frame_data, objects, scenario, scenario_type):
         })
     
     # Existence questions (object-centric)
-    for obj_id, obj_info in objects:
-        obj_name = obj_info.get("obj_name", "").strip()
+    for (obj_id, obj_info), obj_name in zip(objects, index.names):
         status = obj_info.get("Status", "Unknown")
         qa_list.append({
             "Q": f"Is there a {obj_id} in the scene?",
@@ -1971,7 +2073,7 @@ def generate_global_qa(frame_data, objects, scenario, scenario_type):
         })
         
     # Safety categories Q&A (Association type, reasoning about objects)
-    safety_categorization_qa = generate_object_safety_categorization_qa(objects, scenario, scenario_type)
+    safety_categorization_qa = generate_object_safety_categorization_qa(objects, scenario, scenario_type, index=index)
     qa_list.extend(safety_categorization_qa)
     
     # Generate QA from relation edges ---
@@ -1979,7 +2081,7 @@ def generate_global_qa(frame_data, objects, scenario, scenario_type):
     # qa_list.extend(relation_qa)
     
     # Causal Relations QA (if any causal relations were added in the frame)
-    causal_edges = generate_causal_relations(objects)
+    causal_edges = index.causal_edges
     if causal_edges:
         qa_list.append({
             "Q": "Are there any causal relationships between objects in the scene?",
@@ -1996,9 +2098,14 @@ def generate_global_qa(frame_data, objects, scenario, scenario_type):
 
 # ======================= High-Level Q&A Generation =======================
 
-def generate_qa(objects, frame_data, previous_frame=None, next_frame=None):
+def generate_qa(objects, frame_data, previous_frame=None, next_frame=None, frame_geometry=None, relational=False,
+                temporal_state=None):
     """
-    Generate a list of Q&A pairs for a given frame.
+    Generate a list of Q&A pairs for a given frame. `frame_geometry` is the frame's
+    geometry.FrameGeometry when the caller precomputed it for the whole run.
+    relational=True adds the relational Q&A (generate_relational_qa);
+    temporal_state (the video's qa_temporal.TemporalState, updated with this
+    frame) adds the windowed temporal Q&A (generate_temporal_qa).
     """
     qa_list = []
     
@@ -2014,28 +2121,33 @@ def generate_qa(objects, frame_data, previous_frame=None, next_frame=None):
     speed = frame_data.get("speed", None)
     steering = frame_data.get("steering", None)
     
+    # One pass over the objects, shared by every generator below
+    index = FrameIndex(objects, frame_geometry)
+    
     image_id = frame_data.get("image_id", "").strip()
-    scenario, scenario_type = determine_scenario(frame_data, image_id)
+    scenario, scenario_type = determine_scenario(frame_data, image_id, index=index)
     
     # Generate Q&A from various categories
-    infra_qa = generate_infrastructure_qa(objects, frame_data, scenario, scenario_type)
-    vehicle_qa = generate_vehicle_qa(objects, frame_data, scenario, scenario_type)
-    road_user_qa = generate_road_users_qa(objects, frame_data, scenario, scenario_type)
-    ego_qa = generate_ego_qa(objects, frame_data, scenario, scenario_type)
-    global_qa = generate_global_qa(frame_data, objects, scenario, scenario_type)
-    drivable_area = generate_drivable_area_qa(objects, frame_data, scenario, scenario_type)
+    infra_qa = generate_infrastructure_qa(objects, frame_data, scenario, scenario_type, index=index)
+    vehicle_qa = generate_vehicle_qa(objects, frame_data, scenario, scenario_type, index=index)
+    road_user_qa = generate_road_users_qa(objects, frame_data, scenario, scenario_type, index=index)
+    ego_qa = generate_ego_qa(objects, frame_data, scenario, scenario_type, index=index)
+    global_qa = generate_global_qa(frame_data, objects, scenario, scenario_type, index=index)
+    drivable_area = generate_drivable_area_qa(objects, frame_data, scenario, scenario_type, index=index)
     
     combined_qa = infra_qa + vehicle_qa + road_user_qa + ego_qa + global_qa + drivable_area
+    if relational:
+        combined_qa += generate_relational_qa(objects, frame_data, scenario, scenario_type, index=index)
     qa_list.extend(combined_qa)
     
-    cot_qa_full1 = generate_ccot_reasoning_1(frame_data, scenario, scenario_type)
+    cot_qa_full1 = generate_ccot_reasoning_1(frame_data, scenario, scenario_type, index=index)
     qa_list.append(cot_qa_full1)
 
-    cot_qa_full2 = generate_ccot_reasoning_2(frame_data, scenario, scenario_type)
+    cot_qa_full2 = generate_ccot_reasoning_2(frame_data, scenario, scenario_type, index=index)
     qa_list.append(cot_qa_full2)
     
         
-    cot_qa = generate_ccot_reasoning(frame_data, scenario, scenario_type)
+    cot_qa = generate_ccot_reasoning(frame_data, scenario, scenario_type, index=index)
     qa_list.append(cot_qa)
     
     # expert_planning_qa = generate_expert_planning_humanized_qa(frame_data)
@@ -2078,16 +2190,14 @@ def generate_qa(objects, frame_data, previous_frame=None, next_frame=None):
                     "scene_scenario": scenario,
                 })
         speed_limit = None  # Initialize to None at the start
-        for obj_id, obj_info in objects:
-            label = obj_info.get("obj_name", "").strip()
-            if label.startswith("TS_Speed_Limit_"):
-                try:
-                    speed_limit = int(label.split("TS_Speed_Limit_")[1])
-                    logging.info(f"Detected speed limit sign: {speed_limit} MPh.")
-                    break
-                except (IndexError, ValueError) as e:
-                    logging.error(f"Error extracting speed limit from label '{label}': {e}")
-                    continue
+        for label in index.speed_limit_labels:
+            try:
+                speed_limit = int(label.split("TS_Speed_Limit_")[1])
+                logger.info(f"Detected speed limit sign: {speed_limit} MPh.")
+                break
+            except (IndexError, ValueError) as e:
+                logger.error(f"Error extracting speed limit from label '{label}': {e}")
+                continue
         
         threshold = speed_limit if speed_limit is not None else 25
         if speed > threshold:
@@ -2124,8 +2234,8 @@ def generate_qa(objects, frame_data, previous_frame=None, next_frame=None):
             })
     
     # Turning and Steering Q&A (Intervention and Object-Centric)
-    prohibited_turns, allowed_turns = categorize_turn_signs(objects)
-    allowed_directions = categorize_directional_arrows(objects)
+    prohibited_turns, allowed_turns = index.prohibited_turns, index.allowed_turns
+    allowed_directions = index.allowed_directions
     intended_turn = determine_intended_turn(steering)
     
     if intended_turn in prohibited_turns:
@@ -2265,12 +2375,12 @@ def generate_qa(objects, frame_data, previous_frame=None, next_frame=None):
             "scene_scenario": scenario,
         })
     
-    for obj_id, obj_info in objects:
-        obj_name = obj_info.get("obj_name", "").strip()
+    for i, ((obj_id, obj_info), obj_name) in enumerate(zip(objects, index.names)):
         importance = obj_info.get("importance_ranking", "").strip()
-        position = extract_position_description(obj_info)
         status = obj_info.get("Status", [])
         if importance:
+            # Only the reasoning of ranked objects mentions their position
+            position = index.position(i) if importance not in ("low", "none") else ""
             reasoning = determine_importance_reasoning(obj_name, importance, position, status, goal)
             qa_list.append({
                 "Q": f"Why is the {obj_name} considered important in this scenario?",
@@ -2282,10 +2392,7 @@ def generate_qa(objects, frame_data, previous_frame=None, next_frame=None):
                 "scene_scenario": scenario,
             })
     
-    ego_status = None
-    for obj_id, obj_info in objects:
-        if obj_info.get("obj_name", "").strip().lower() == "ego":
-            ego_status = obj_info.get("Status", [])
+    ego_status = index.ego_status
     
     safety_reasoning_full = determine_safety_reasoningSS(safety_status, ego_status, speed, steering)
     qa_list.append({
@@ -2299,58 +2406,294 @@ def generate_qa(objects, frame_data, previous_frame=None, next_frame=None):
     })
 
 
+    if temporal_state is not None:
+        qa_list.extend(generate_temporal_qa(temporal_state, scenario, scenario_type))
+
     # Optionally, sort the Q&A by a defined order for Type (here we use a simple mapping)
     type_order = {"Discovery": 1, "Association": 2, "Intervention": 3, "Counterfactual": 4}
     qa_list = sorted(qa_list, key=lambda x: type_order.get(x['Type'], 99))
     
     return qa_list
 
-def update_json_with_new_qa(json_dir):
+def load_video_json(input_json_path):
     """
-    Process all JSON files in the input directory, generate Q&A pairs for each frame,
-    and save the updated JSON files.
+    Load the list of frames of one video file (.json or .jsonl). Returns None
+    (and logs why) if the file cannot be read or does not hold a list of frames.
     """
-    for json_file_name in os.listdir(json_dir):
-        if not json_file_name.endswith(".json"):
-            logging.warning(f"Skipping non-JSON file: {json_file_name}")
-            continue
-        input_json_path = os.path.join(json_dir, json_file_name)
-        try:
-            with open(input_json_path, 'r', encoding='utf-8') as json_file:
-                video_data = json.load(json_file)
-            logging.info(f"Successfully loaded JSON file: {json_file_name}")
-        except json.JSONDecodeError as e:
-            logging.error(f"JSONDecodeError in file {json_file_name}: {e}")
-            continue
-        except Exception as e:
-            logging.error(f"Unexpected error reading file {json_file_name}: {e}")
-            continue
-        
-        if not isinstance(video_data, list):
-            logging.error(f"Expected list of frames in file {json_file_name}, got {type(video_data)}")
+    json_file_name = os.path.basename(input_json_path)
+    try:
+        video_data = json_stream.load_json(input_json_path)
+        logger.info(f"Successfully loaded JSON file: {json_file_name}")
+    except json.JSONDecodeError as e:
+        logger.error(f"JSONDecodeError in file {json_file_name}: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error reading file {json_file_name}: {e}")
+        return None
+
+    if not isinstance(video_data, list):
+        logger.error(f"Expected list of frames in file {json_file_name}, got {type(video_data)}")
+        return None
+    return video_data
+
+
+def generate_frames_qa(frames, previous_frame=None, next_frame=None, relational=False, temporal=False, history=()):
+    """
+    Q&A lists for a run of consecutive frames. previous_frame / next_frame are
+    the frames just outside the run (None at the start / end of the video), so
+    a video split into chunks yields the same Q&A as the whole video.
+    The geometry of all frames is computed once, in one batch.
+    temporal=True adds the windowed temporal Q&A; `history` must then hold the
+    frames before the run (qa_temporal.history_frames) to warm up the state.
+    """
+    video_geometry = geometry.VideoGeometry.from_frames(frames)
+    temporal_state = None
+    if temporal:
+        temporal_state = TemporalState()
+        for frame_data in history:
+            temporal_state.update(frame_data)
+    qa_lists = []
+    for frame_index, frame_data in enumerate(frames):
+        objects = frame_data.get('graph', {}).get('nodes', [])
+        prev_frame = frames[frame_index - 1] if frame_index > 0 else previous_frame
+        nxt_frame = frames[frame_index + 1] if frame_index < len(frames) - 1 else next_frame
+        if temporal_state is not None:
+            temporal_state.update(frame_data)
+        qa_lists.append(generate_qa(objects, frame_data, prev_frame, nxt_frame,
+                                    frame_geometry=video_geometry.frame(frame_index), relational=relational,
+                                    temporal_state=temporal_state))
+    return qa_lists
+
+
+def save_video_json(output_json_path, video_data):
+    """Write the updated frames (via a temp file, so a crash never truncates the JSON)."""
+    json_file_name = os.path.basename(output_json_path)
+    try:
+        json_stream.write_frames(output_json_path, video_data, indent=4)
+        logger.info(f"Successfully updated and saved: {json_file_name}")
+        return True
+    except Exception as e:
+        logger.error(f"Error writing JSON file {json_file_name}: {e}")
+        return False
+
+
+# ===================== Incremental Regeneration ==========================
+
+def frame_qa_hash(frame_data, previous_frame=None, next_frame=None):
+    """
+    sha256 of everything generate_qa reads for this frame: the frame itself
+    (without its QA) and the speed of the neighbouring frames.
+    """
+    payload = {
+        "frame": {key: value for key, value in frame_data.items() if key != "QA"},
+        "previous_speed": previous_frame.get("speed", None) if previous_frame else None,
+        "next_speed": next_frame.get("speed", None) if next_frame else None,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def iter_frame_keys(frames):
+    """
+    Manifest key per frame: its image_id (numbered if repeated), or its
+    position for frames without one.
+    """
+    seen = {}
+    for frame_index, frame_data in enumerate(frames):
+        image_id = frame_data.get("image_id", "")
+        if not image_id:
+            yield f"#{frame_index}"
             continue
-        
-        for frame_index, frame_data in enumerate(video_data):
-            objects = frame_data.get('graph', {}).get('nodes', [])
-            previous_frame = video_data[frame_index - 1] if frame_index > 0 else None
-            next_frame = video_data[frame_index + 1] if frame_index < len(video_data) - 1 else None
-            
+        count = seen.get(image_id, 0)
+        seen[image_id] = count + 1
+        yield image_id if count == 0 else f"{image_id}#{count}"
 
-            
-            updated_qa = generate_qa(objects, frame_data, previous_frame, next_frame)
-            frame_data['QA'] = updated_qa
-        
-        try:
-            with open(input_json_path, 'w', encoding='utf-8') as json_file:
-                json.dump(video_data, json_file, indent=4)
-            logging.info(f"Successfully updated and saved: {json_file_name}")
-        except Exception as e:
-            logging.error(f"Error writing JSON file {json_file_name}: {e}")
+def frame_keys(video_data):
+    return list(iter_frame_keys(video_data))
+
+def frame_windows(frames):
+    """
+    Yields (previous_frame, frame, next_frame) over any iterable of frames,
+    holding only three frames at a time.
+    """
+    previous_frame = None
+    frame_data = None
+    for next_frame in frames:
+        if frame_data is not None:
+            yield previous_frame, frame_data, next_frame
+            previous_frame = frame_data
+        frame_data = next_frame
+    if frame_data is not None:
+        yield previous_frame, frame_data, None
+
+def qa_version(relational=False, temporal=False):
+    """Manifest version: QA_GENERATOR_VERSION plus the optional Q&A stages enabled."""
+    return QA_GENERATOR_VERSION + ("+relational" if relational else "") + ("+temporal" if temporal else "")
+
+def manifest_path(json_path):
+    return os.path.join(os.path.dirname(json_path), QA_MANIFEST_DIR, os.path.basename(json_path))
+
+def load_qa_manifest(json_path, version=QA_GENERATOR_VERSION):
+    """
+    {frame key: hash} recorded when the video's QA was last written, or {} if
+    there is none or it was written by another version (see qa_version).
+    """
+    try:
+        with open(manifest_path(json_path), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if manifest.get("version") != version:
+        return {}
+    return manifest.get("frames", {})
+
+def save_qa_manifest(json_path, keys, hashes, version=QA_GENERATOR_VERSION):
+    path = manifest_path(json_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": version, "frames": dict(zip(keys, hashes))}, f)
+    os.replace(tmp_path, path)
+
+def stale_frames(video_data, json_path, force=False, relational=False, temporal=False):
+    """
+    Returns (stale frame indices, frame keys, frame hashes). A frame is stale
+    if it has no QA or its hash differs from the manifest (force: all frames).
+    With temporal Q&A the frames whose window includes a stale frame are
+    stale too (temporal_stale).
+    """
+    keys = frame_keys(video_data)
+    hashes = [frame_qa_hash(frame_data, prev, nxt) for prev, frame_data, nxt in frame_windows(video_data)]
+    manifest = {} if force else load_qa_manifest(json_path, qa_version(relational, temporal))
+    stale = [
+        frame_index for frame_index, (frame_data, key, frame_hash) in enumerate(zip(video_data, keys, hashes))
+        if "QA" not in frame_data or manifest.get(key) != frame_hash
+    ]
+    if temporal:
+        stale = temporal_stale(set(stale).union(shifted_frames(keys, list(manifest))), len(video_data))
+    return stale, keys, hashes
+
+def shifted_frames(keys, manifest_keys):
+    """
+    Indices of the frames whose preceding frame is not the one recorded in the
+    manifest: frames were inserted, removed or reordered just before them, so
+    the temporal window of these frames (and of the window - 1 frames after
+    them) holds other frames than when their QA was written.
+    """
+    manifest_previous = dict(zip(manifest_keys, [None] + manifest_keys[:-1]))
+    return [
+        frame_index for frame_index, key in enumerate(keys)
+        if manifest_previous.get(key, key) != (keys[frame_index - 1] if frame_index else None)
+    ]
+
+def temporal_stale(stale, frame_count, window=TEMPORAL_WINDOW):
+    """
+    Stale frame indices plus the window - 1 frames after each: their temporal
+    Q&A summarise the stale frame. Frames only moved by an insertion or removal
+    keep their hash; pass them in as well (shifted_frames).
+    """
+    expanded = set()
+    for frame_index in stale:
+        expanded.update(range(frame_index, min(frame_index + window, frame_count)))
+    return sorted(expanded)
+
+def contiguous_runs(indices):
+    """
+    Sorted frame indices -> [(start, stop), ...] runs of consecutive frames.
+    """
+    runs = []
+    for frame_index in indices:
+        if runs and runs[-1][1] == frame_index:
+            runs[-1][1] = frame_index + 1
+        else:
+            runs.append([frame_index, frame_index + 1])
+    return [tuple(run) for run in runs]
+
+def iter_keyed_windows(frames):
+    """
+    Yields (key, previous_frame, frame, next_frame), streaming `frames`.
+    """
+    for_keys, for_windows = itertools.tee(frames)
+    for key, (previous_frame, frame_data, next_frame) in zip(iter_frame_keys(for_keys), frame_windows(for_windows)):
+        yield key, previous_frame, frame_data, next_frame
+
+def update_video_qa(json_path, force=False, relational=False, temporal=False):
+    """
+    Incrementally regenerate the Q&A of one video file (.json or .jsonl) while
+    streaming it frame by frame, so memory does not grow with the file:
+      1) hash every frame and compare with the manifest (see stale_frames;
+         temporal=True also checks the frame order, see shifted_frames)
+      2) only if some frame is stale, rewrite the file, regenerating those frames
+         (temporal=True: the rolling TemporalState follows every frame)
+    Returns the number of regenerated frames, or None if the file is unreadable.
+    """
+    json_file_name = os.path.basename(json_path)
+    manifest = {} if force else load_qa_manifest(json_path, qa_version(relational, temporal))
+    keys, hashes, stale = [], [], set()
+    try:
+        for frame_index, (key, prev, frame_data, nxt) in enumerate(
+            iter_keyed_windows(json_stream.iter_frames(json_path))
+        ):
+            frame_hash = frame_qa_hash(frame_data, prev, nxt)
+            keys.append(key)
+            hashes.append(frame_hash)
+            if "QA" not in frame_data or manifest.get(key) != frame_hash:
+                stale.add(frame_index)
+    except (OSError, ValueError, AttributeError) as e:
+        # ValueError covers malformed JSON / not an array, AttributeError non-dict frames
+        logger.error(f"Error reading JSON file {json_file_name}: {e}")
+        return None
+    logger.info(f"Successfully loaded JSON file: {json_file_name}")
+
+    if temporal:
+        stale.update(shifted_frames(keys, list(manifest)))
+    if not stale:
+        logger.info(f"QA up to date: {json_file_name}")
+        return 0
+    if temporal:
+        stale = set(temporal_stale(stale, len(keys)))
+
+    temporal_state = TemporalState() if temporal else None
+    try:
+        # The geometry columns (geometry.VideoGeometry) are computed a batch of frames at a time
+        for_windows, for_geometry = itertools.tee(json_stream.iter_frames(json_path))
+        with json_stream.FrameWriter(json_path, indent=4) as writer:
+            for frame_index, ((prev, frame_data, nxt), frame_geometry) in enumerate(
+                zip(frame_windows(for_windows), geometry.iter_frame_geometry(for_geometry))
+            ):
+                if temporal_state is not None:
+                    temporal_state.update(frame_data)
+                if frame_index in stale:
+                    objects = frame_data.get('graph', {}).get('nodes', [])
+                    frame_data['QA'] = generate_qa(objects, frame_data, prev, nxt, frame_geometry=frame_geometry,
+                                                   relational=relational, temporal_state=temporal_state)
+                writer.write(frame_data)
+    except Exception as e:
+        logger.error(f"Error writing JSON file {json_file_name}: {e}")
+        return None
+    logger.info(f"Regenerated QA for {len(stale)}/{len(keys)} frames of {json_file_name}")
+    logger.info(f"Successfully updated and saved: {json_file_name}")
+    save_qa_manifest(json_path, keys, hashes, qa_version(relational, temporal))
+    return len(stale)
+
+def update_json_with_new_qa(json_dir, force=False, relational=False, temporal=False):
+    """
+    Process all JSON files in the input directory, generate Q&A pairs for each frame,
+    and save the updated JSON files.
+    Only frames whose inputs changed since the last run (see frame_qa_hash) are
+    regenerated, and videos without such frames are not rewritten; force=True
+    regenerates everything. Videos are streamed (update_video_qa), .json or
+    .jsonl. relational=True / temporal=True add the relational / windowed
+    temporal Q&A to every frame.
+    (Single process; qa_parallel.py runs the same steps across all cores.)
+    """
+    for json_file_name in json_stream.video_files(json_dir):
+        update_video_qa(os.path.join(json_dir, json_file_name), force, relational, temporal)
 
 if __name__ == "__main__":
+    configure_logging()
     input_folder = 'E:/Situational Awareness/Last Dataset/HAD/Sample - Copy'
     if not os.path.exists(input_folder):
-        logging.error(f"Input folder does not exist: {input_folder}")
+        logger.error(f"Input folder does not exist: {input_folder}")
     else:
         update_json_with_new_qa(input_folder)
-        logging.info("Q&A generation and updating completed.")
+        logger.info("Q&A generation and updating completed.")
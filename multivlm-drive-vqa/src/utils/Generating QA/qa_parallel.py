@@ -0,0 +1,232 @@
+"""
+Process-parallel version of update_json_with_new_qa (QA.py).
+
+generate_qa is CPU-bound Python that only reads a frame and its neighbours'
+speed, so every video is split into chunks of consecutive frames and each
+chunk (with the frame just before and after it) is a job for a process pool.
+
+    - output is deterministic: chunk results are put back by (video, offset)
+      and a video is written only once all of its chunks are done
+    - incremental like update_json_with_new_qa: only frames whose content hash
+      changed are sent to the pool, unchanged videos are not rewritten
+      (--force regenerates everything)
+    - at most --max-open-videos videos are held in memory by the parent
+    - workers send log records through a queue; only the parent writes
+      QA_generation.log
+    - progress bar plus a frames/s and QA/s summary
+    - --relational / --temporal add the relational / windowed temporal Q&A
+      (see QA.generate_relational_qa, QA.generate_temporal_qa); with
+      --temporal every chunk also carries the frames of its first window
+
+Run from this folder (like QA.py):
+
+    python qa_parallel.py --json-dir "<DATA_ROOT>/json" --jobs 16
+"""
+import os
+import time
+import argparse
+import logging
+import logging.handlers
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from tqdm import tqdm
+
+import QA
+from qa_temporal import history_frames
+
+
+# ============================================================
+# Workers
+# ============================================================
+
+def _init_worker(log_queue):
+    """Route this worker's logging (including QA.py's) to the parent's queue."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
+
+def _strip_qa(frame):
+    """Frame without its (to be replaced) QA list, so it is cheap to send to a worker."""
+    if frame is None:
+        return None
+    return {key: value for key, value in frame.items() if key != "QA"}
+
+
+def run_chunk(job):
+    """Generate the Q&A of one chunk of frames. Returns (video, start, qa_lists)."""
+    video, start, frames, previous_frame, next_frame, history, options = job
+    return video, start, QA.generate_frames_qa(frames, previous_frame, next_frame, history=history, **options)
+
+
+def video_jobs(video, video_data, chunk_size, stale, relational=False, temporal=False):
+    """
+    Chunks of at most chunk_size consecutive stale frames, with their neighbours
+    (and, for temporal Q&A, the frames before the chunk that warm up its state).
+    """
+    options = {"relational": relational, "temporal": temporal}
+    jobs = []
+    for run_start, run_stop in QA.contiguous_runs(stale):
+        for start in range(run_start, run_stop, chunk_size):
+            stop = min(start + chunk_size, run_stop)
+            previous_frame = _strip_qa(video_data[start - 1]) if start > 0 else None
+            next_frame = _strip_qa(video_data[stop]) if stop < len(video_data) else None
+            frames = [_strip_qa(frame) for frame in video_data[start:stop]]
+            history = [_strip_qa(frame) for frame in history_frames(video_data, start)] if temporal else []
+            jobs.append((video, start, frames, previous_frame, next_frame, history, options))
+    return jobs
+
+
+# ============================================================
+# Driver
+# ============================================================
+
+def update_json_with_new_qa_parallel(json_dir, jobs=None, chunk_size=32, max_open_videos=None, force=False,
+                                     relational=False, temporal=False):
+    """
+    Same result as QA.update_json_with_new_qa(json_dir, force, relational, temporal), using `jobs` processes.
+    Returns {"videos", "unchanged", "frames", "qa_pairs", "failed", "seconds"}.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    max_open_videos = max_open_videos or 2 * jobs
+    max_pending = 4 * jobs
+
+    json_files = QA.json_stream.video_files(json_dir)
+
+    stats = {"videos": 0, "unchanged": 0, "frames": 0, "qa_pairs": 0, "failed": 0, "seconds": 0.0}
+    open_videos = {}  # file name -> {"data", "keys", "hashes", "remaining"}
+    failed = set()
+    queued = []       # jobs of open videos not yet submitted
+    file_iter = iter(json_files)
+
+    def open_next_video():
+        for json_file_name in file_iter:
+            json_path = os.path.join(json_dir, json_file_name)
+            video_data = QA.load_video_json(json_path)
+            if video_data is None:
+                continue
+            stale, keys, hashes = QA.stale_frames(video_data, json_path, force, relational, temporal)
+            if not stale:
+                logging.info(f"QA up to date: {json_file_name}")
+                stats["unchanged"] += 1
+                continue
+            chunks = video_jobs(json_file_name, video_data, chunk_size, stale, relational, temporal)
+            open_videos[json_file_name] = {
+                "data": video_data, "keys": keys, "hashes": hashes, "remaining": len(chunks),
+            }
+            queued.extend(chunks)
+            return True
+        return False
+
+    def finish_chunk(video, start, qa_lists):
+        entry = open_videos[video]
+        if qa_lists is not None:
+            for frame_data, updated_qa in zip(entry["data"][start:], qa_lists):
+                frame_data['QA'] = updated_qa
+                stats["qa_pairs"] += len(updated_qa)
+        entry["remaining"] -= 1
+        if entry["remaining"]:
+            return
+        del open_videos[video]
+        if video in failed:
+            stats["failed"] += 1
+            logging.error(f"Not saving {video}: Q&A generation failed for part of it")
+            return
+        json_path = os.path.join(json_dir, video)
+        if QA.save_video_json(json_path, entry["data"]):
+            QA.save_qa_manifest(json_path, entry["keys"], entry["hashes"], QA.qa_version(relational, temporal))
+            stats["videos"] += 1
+        else:
+            stats["failed"] += 1
+
+    log_queue = mp.get_context("spawn").Queue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *logging.getLogger().handlers, respect_handler_level=True
+    )
+    listener.start()
+    start_time = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(log_queue,),
+        ) as pool, tqdm(desc="QA frames", unit="frame") as pbar:
+            pending = {}
+            while True:
+                while len(pending) < max_pending:
+                    if not queued and not (len(open_videos) < max_open_videos and open_next_video()):
+                        break
+                    job = queued.pop(0)
+                    pending[pool.submit(run_chunk, job)] = job
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    video, start, frames = pending.pop(future)[:3]
+                    try:
+                        qa_lists = future.result()[2]
+                    except Exception as e:
+                        logging.error(f"Q&A generation failed in {video} (frames {start}-"
+                                      f"{start + len(frames) - 1}): {e}")
+                        failed.add(video)
+                        qa_lists = None
+                    finish_chunk(video, start, qa_lists)
+                    stats["frames"] += len(frames)
+                    pbar.update(len(frames))
+    finally:
+        stats["seconds"] = time.perf_counter() - start_time
+        listener.stop()
+    return stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Regenerate frame Q&A for every video JSON on all cores")
+    parser.add_argument("--json-dir", type=str, required=True,
+                        help="Folder with per-video .json files (updated in place)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Worker processes (default: all CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=32,
+                        help="Frames per job")
+    parser.add_argument("--max-open-videos", type=int, default=None,
+                        help="Videos held in memory at once (default: 2 x jobs)")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate every frame, not only frames whose inputs changed")
+    parser.add_argument("--relational", action="store_true",
+                        help="Add relational Q&A (shared positions / statuses, nearby objects)")
+    parser.add_argument("--temporal", action="store_true",
+                        help="Add windowed temporal Q&A (speed / steering trends, object persistence)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    QA.configure_logging()
+    if not os.path.exists(args.json_dir):
+        logging.error(f"Input folder does not exist: {args.json_dir}")
+        raise SystemExit(f"Input folder does not exist: {args.json_dir}")
+
+    stats = update_json_with_new_qa_parallel(
+        args.json_dir,
+        jobs=args.jobs,
+        chunk_size=args.chunk_size,
+        max_open_videos=args.max_open_videos,
+        force=args.force,
+        relational=args.relational,
+        temporal=args.temporal,
+    )
+    seconds = max(stats["seconds"], 1e-9)
+    summary = (f"{stats['videos']} videos updated ({stats['unchanged']} unchanged), {stats['frames']} frames, {stats['qa_pairs']} QA pairs "
+               f"in {stats['seconds']:.1f}s ({stats['frames'] / seconds:.1f} frames/s, "
+               f"{stats['qa_pairs'] / seconds:.0f} QA/s), {stats['failed']} failed")
+    logging.info(f"Q&A generation and updating completed: {summary}")
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
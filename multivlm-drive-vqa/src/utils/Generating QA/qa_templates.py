@@ -0,0 +1,157 @@
+"""
+Declarative question templates for QA.py.
+
+A question family is a list of Blocks, evaluated in order:
+
+    - source: function(ctx) -> the items the block runs for (None: once, for ctx)
+    - fields: function(item, ctx) -> dict of template fields, computed once per
+      item and shared by every spec of the block (None skips the item)
+    - specs: QuestionSpec(question, answer, meta, when). question / answer are
+      str.format templates over the fields (or functions of the fields), meta
+      the metadata (Type, Task, question_task, AV_Task) and when an optional
+      predicate on the fields
+
+register() compiles each template once into a function of the fields
+(see compile_template), with no per-Q&A template parsing, and
+family.qa(ctx, scenario) gives the Q&A dicts stored in the video JSON, in the
+same key order as the hand-written literals:
+
+    markings = register("traffic_markings", [
+        Block(source=lambda items: items, fields=marking_fields, specs=[
+            QuestionSpec("Where is the {name} located?", "{name} is located at {position}",
+                         meta("Discovery", "Object-Centric Questions", "Position Identification", "perception")),
+        ]),
+    ])
+    qa_list = markings.qa(index.markings, scenario)
+"""
+import operator
+import string
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+SCENARIO_KEY = "scene_scenario"
+
+
+def meta(qa_type: str, task: Optional[str], question_task: str, av_task: str) -> Dict[str, str]:
+    """Metadata of a Q&A, in stored key order. task=None leaves out the "Task" key."""
+    metadata = {"Type": qa_type}
+    if task is not None:
+        metadata["Task"] = task
+    metadata["question_task"] = question_task
+    metadata["AV_Task"] = av_task
+    return metadata
+
+
+# ============================================================
+# Specs
+# ============================================================
+
+class QuestionSpec(NamedTuple):
+    question: Any            # str.format template or function(fields) -> str
+    answer: Any
+    meta: Dict[str, str]
+    when: Optional[Callable[[dict], bool]] = None
+
+
+class Block(NamedTuple):
+    specs: List[QuestionSpec]
+    source: Optional[Callable[[Any], Any]] = None
+    fields: Optional[Callable[[Any, Any], Optional[dict]]] = None
+
+
+def compile_template(template) -> Callable[[dict], str]:
+    """
+    A template as a function of the fields, parsed once: a template function
+    as is, a template without fields as its constant text, otherwise a
+    %-format of its fields (same text as str.format for plain {name} fields;
+    templates with format specs or conversions use str.format_map).
+    """
+    if callable(template):
+        return template
+    parts = []
+    names = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        parts.append(literal.replace("%", "%%"))
+        if field is None:
+            continue
+        if spec or conversion or not field.isidentifier():
+            return template.format_map
+        parts.append("%s")
+        names.append(field)
+    if not names:
+        text = template.format()
+        return lambda fields: text
+    text = "".join(parts)
+    if len(names) == 1:
+        name = names[0]
+        return lambda fields: text % (fields[name],)
+    getter = operator.itemgetter(*names)
+    return lambda fields: text % getter(fields)
+
+
+class CompiledSpec(NamedTuple):
+    when: Optional[Callable[[dict], bool]]
+    question: Callable[[dict], str]
+    answer: Callable[[dict], str]
+    qa: Dict[str, Any]       # the Q&A dict with Q / A / scenario left None, copied per Q&A
+    spec: QuestionSpec
+
+
+def compile_spec(spec: QuestionSpec) -> CompiledSpec:
+    qa = {"Q": None, "A": None, **spec.meta, SCENARIO_KEY: None}
+    return CompiledSpec(spec.when, compile_template(spec.question), compile_template(spec.answer), qa, spec)
+
+
+class QuestionFamily:
+    """
+    A registered family: family.qa(ctx, scenario) -> Q&A dicts.
+    The specs are compiled once (compile_spec); blocks over the same
+    (source, fields) pair compute the fields once per call.
+    """
+
+    def __init__(self, name: str, blocks: List[Block]):
+        self.name = name
+        self.blocks = blocks
+        self._compiled = [
+            (block, (block.source, block.fields), [compile_spec(spec) for spec in block.specs]) for block in blocks
+        ]
+
+    @staticmethod
+    def _block_fields(block: Block, key, ctx, computed: dict) -> List[Optional[dict]]:
+        """The fields of every item the block runs for (None: item skipped)."""
+        if block.source is None:
+            return [block.fields(ctx, ctx) if block.fields is not None else {}]
+        if block.fields is None:
+            return [{} for _ in block.source(ctx)]
+        values = computed.get(key)
+        if values is None:
+            values = computed[key] = [block.fields(item, ctx) for item in block.source(ctx)]
+        return values
+
+    def qa(self, ctx, scenario) -> List[dict]:
+        qa_list = []
+        append = qa_list.append
+        computed = {}
+        for block, key, specs in self._compiled:
+            for v in self._block_fields(block, key, ctx, computed):
+                if v is None:
+                    continue
+                for when, question, answer, qa_template, spec in specs:
+                    if when is not None and not when(v):
+                        continue
+                    try:
+                        question_text = question(v)
+                        answer_text = answer(v)
+                    except (KeyError, IndexError) as e:
+                        raise ValueError(
+                            f"QA family {self.name!r}: template field {e} missing in {spec.question!r}"
+                        ) from e
+                    qa = qa_template.copy()
+                    qa["Q"] = question_text
+                    qa["A"] = answer_text
+                    qa[SCENARIO_KEY] = scenario
+                    append(qa)
+        return qa_list
+
+
+def register(name: str, blocks: List[Block]) -> QuestionFamily:
+    return QuestionFamily(name, blocks)
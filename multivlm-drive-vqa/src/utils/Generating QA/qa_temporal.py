@@ -0,0 +1,134 @@
+"""
+Rolling per-video state for the windowed temporal Q&A of QA.py.
+
+TemporalState is updated once per frame, in video order, and summarises the
+last `window` frames without re-reading them:
+
+    - speed / steering windows and the signed run of consecutive speed
+      increases / decreases (sustained acceleration / deceleration)
+    - per-object track presence keyed by node id: frames of the window the
+      node is in, and its current run of consecutive frames
+    - object counts per label (lower-cased obj_name), for count trends
+    - how long the frame safety status ("safe") has been unchanged
+
+Every run / count is capped at the window, so the state after a frame depends
+only on the last `window` frames: a chunk of a video that starts with the
+`window - 1` frames before it (history_frames) gets the same state as a pass
+over the whole video. QA.py turns the state into Q&A (TEMPORAL_QA):
+
+    state = TemporalState()
+    for previous_frame, frame_data, next_frame in frame_windows(frames):
+        state.update(frame_data)
+        frame_data["QA"] = generate_qa(..., temporal_state=state)
+"""
+import math
+from collections import Counter, deque
+from typing import List, NamedTuple, Optional
+
+TEMPORAL_WINDOW = 10        # frames summarised by the temporal Q&A
+SUSTAINED_FRAMES = 3        # consecutive speed changes counted as a sustained trend
+
+
+class FrameSummary(NamedTuple):
+    speed: Optional[float]
+    steering: Optional[float]
+    safe: str
+    node_ids: frozenset
+    labels: Counter         # lower-cased obj_name -> objects in the frame
+
+
+def summarize_frame(frame_data) -> FrameSummary:
+    nodes = frame_data.get('graph', {}).get('nodes', [])
+    return FrameSummary(
+        speed=frame_data.get("speed", None),
+        steering=frame_data.get("steering", None),
+        safe=frame_data.get("safe", "").strip(),
+        node_ids=frozenset(str(node[0]) for node in nodes if node),
+        labels=Counter(node[1].get("obj_name", "").lower() for node in nodes if len(node) > 1),
+    )
+
+
+def history_frames(frames, start, window=TEMPORAL_WINDOW):
+    """The (at most window - 1) frames before frames[start], to warm up a TemporalState."""
+    return frames[max(0, start - window + 1):start]
+
+
+class TemporalState:
+    """
+    Summary of the last `window` frames of one video (see the module docstring).
+
+    After update(frame): frames (FrameSummary deque, oldest first), presence
+    {node id: frames of the window it is in}, streaks {node id: consecutive
+    frames up to now}, speed_run (+k: speed rose in each of the last k frames,
+    -k: fell) and safety_streak.
+    """
+
+    def __init__(self, window: int = TEMPORAL_WINDOW):
+        self.window = window
+        self.frames = deque(maxlen=window)
+        self.presence = Counter()
+        self.streaks = {}
+        self.speed_run = 0
+        self.safety_streak = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def update(self, frame_data) -> FrameSummary:
+        summary = summarize_frame(frame_data)
+        previous = self.frames[-1] if self.frames else None
+        if len(self.frames) == self.window:
+            self.presence.subtract(self.frames[0].node_ids)
+        self.frames.append(summary)
+        self.presence.update(summary.node_ids)
+        self.presence = +self.presence  # drop nodes no longer in the window
+
+        limit = self.window
+        self.streaks = {node_id: min(self.streaks.get(node_id, 0) + 1, limit) for node_id in summary.node_ids}
+
+        # speed_run counts speed deltas, of which a window holds window - 1
+        if previous is None or previous.speed is None or summary.speed is None or summary.speed == previous.speed:
+            self.speed_run = 0
+        elif summary.speed > previous.speed:
+            self.speed_run = min(max(self.speed_run, 0) + 1, limit - 1)
+        else:
+            self.speed_run = max(min(self.speed_run, 0) - 1, 1 - limit)
+
+        if previous is not None and summary.safe == previous.safe:
+            self.safety_streak = min(self.safety_streak + 1, limit)
+        else:
+            self.safety_streak = 1
+        return summary
+
+    @property
+    def current(self) -> FrameSummary:
+        return self.frames[-1]
+
+    def values(self, field: str) -> List[float]:
+        """Non-missing values of a FrameSummary field ("speed", "steering") over the window, oldest first."""
+        return [value for value in (getattr(frame, field) for frame in self.frames) if value is not None]
+
+    def statistics(self, field: str) -> Optional[dict]:
+        """{"n", "first", "last", "mean", "min", "max"} of a window field, None with fewer than 2 values."""
+        values = self.values(field)
+        if len(values) < 2:
+            return None
+        return {
+            "n": len(values),
+            "first": values[0],
+            "last": values[-1],
+            "mean": math.fsum(values) / len(values),
+            "min": min(values),
+            "max": max(values),
+        }
+
+    def persistent_nodes(self) -> List[str]:
+        """Node ids of the current frame present in every frame of the window (window of 2+ frames)."""
+        if len(self.frames) < 2:
+            return []
+        n = len(self.frames)
+        return sorted(node_id for node_id, streak in self.streaks.items() if streak >= n)
+
+    def label_counts(self, label: str):
+        """(count in the oldest, count in the current frame) of objects with this label."""
+        return self.frames[0].labels.get(label, 0), self.frames[-1].labels.get(label, 0)
@@ -0,0 +1,371 @@
+"""
+Concurrent, resumable caption/maneuver regeneration (CLI version of
+Generating_caption_maneuver.ipynb).
+
+Run from the repository root:
+
+    python -m src.utils.Generating_caption_maneuver.caption_pipeline \
+        --input-dir "<DATA_ROOT>/json" --output-dir "<DATA_ROOT>/output" \
+        --backend gemini --concurrency 16 --rps 8
+
+API key is read from --api-key or the GEMINI_API_KEY environment variable.
+Use --backend stub to dry-run the pipeline without any network calls.
+"""
+import os
+import json
+import asyncio
+import argparse
+import hashlib
+from glob import glob
+
+from tqdm import tqdm
+
+from src.judge import (
+    CallableBackend,
+    JudgeBackend,
+    ResponseCache,
+    TokenBucket,
+    retry_with_backoff,
+)
+
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+
+###############################################################################
+#                       SCENARIO EXTRACTION AND PROMPT                        #
+###############################################################################
+
+def parse_frame(frame):
+    """
+    Extract relevant details from the frame for use in constructing the prompt.
+    Returns a dictionary with all needed info.
+    """
+    return {
+        "caption": frame.get("caption", ""),
+        "speed": frame.get("speed"),
+        "steering": frame.get("steering"),
+        "maneuver": frame.get("maneuver", ""),
+        "safe": frame.get("safe"),
+        "goal_oriented": frame.get("goal-oriented"),
+        "action_suggestions": frame.get("Action Suggestions"),
+        "traffic_reg_suggestions": frame.get("Traffic Regulations Suggestions"),
+        "nodes": frame.get("graph", {}).get("nodes", []),
+        "edges": frame.get("graph", {}).get("edges", [])
+    }
+
+
+def frame_content_hash(frame_info):
+    """Stable sha256 of the parse_frame output; the per-frame cache key."""
+    payload = json.dumps(frame_info, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def generate_caption_and_maneuver_prompt(frame_info):
+    """
+    Build a prompt asking Gemini to provide:
+      - An improved, context-rich caption summarizing the situation.
+      - A recommended maneuver that is goal-oriented and safe.
+    """
+    # Prepare objects info
+    objects_descriptions = []
+    for node_data in frame_info["nodes"]:
+        if len(node_data) == 2:
+            obj_id, obj_content = node_data
+            obj_name = obj_content.get("obj_name", "unknown object")
+            obj_type = obj_content.get("object_type", "")
+            status = ", ".join(obj_content.get("Status", [])) or "N/A"
+            object_safety = ", ".join(obj_content.get("Object_Safety", [])) or "N/A"
+            positions = ", ".join(obj_content.get("position", [])) or "N/A"
+            importance = obj_content.get("importance_ranking", "N/A")
+
+            objects_descriptions.append(
+                f"- ID: {obj_id}, Name: {obj_name}, Type: {obj_type}, "
+                f"Status: {status}, Safety: {object_safety}, "
+                f"Positions: {positions}, Importance: {importance}"
+            )
+    objects_text = "\n".join(objects_descriptions) if objects_descriptions else "No objects detected."
+
+    # Prepare relations info
+    if frame_info["edges"]:
+        relations_text = "Relations:\n" + "\n".join(
+            [f"- {src} --> {tgt}: {rel_data.get('relation', '')}"
+             for (src, tgt, rel_data) in frame_info["edges"] if len(rel_data) > 0]
+        )
+    else:
+        relations_text = "No explicit relations found."
+
+    # Build the user message for Gemini
+    user_prompt = f"""
+You are an expert in autonomous vehicles, traffic scenarios, and driving environments.
+
+Below is a scenario extracted from a vehicle's video feed.
+Please produce:
+1. 'caption' A refined, context-rich 'caption' summarizing the scene clearly.
+2. 'maneuver' recommendation that helps the vehicle remain safe and aligned with its goals.
+-----------------------
+SAFE: {frame_info['safe']}
+GOAL-ORIENTED: {frame_info['goal_oriented']}
+ACTION SUGGESTIONS: {frame_info['action_suggestions']}
+TRAFFIC REGULATIONS SUGGESTIONS: {frame_info['traffic_reg_suggestions']}
+
+SPEED: {frame_info['speed']}
+STEERING: {frame_info['steering']}
+
+OBJECTS IN SCENE:
+{objects_text}
+{relations_text}
+-----------------------
+Please return valid JSON with exactly key:
+"caption" (a string),
+"maneuver" (a string),
+
+No extra commentary—only JSON.
+    """.strip()
+
+    return user_prompt
+
+
+def parse_caption_response(response):
+    """
+    Parse {"caption", "maneuver"} from a model reply (tolerates ```json fences).
+    Returns None if the reply is not usable JSON.
+    """
+    if not response:
+        return None
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if "{" in text:
+            text = text[text.find("{"):text.rfind("}") + 1]
+    try:
+        result_json = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(result_json, dict):
+        return None
+    return {
+        "caption": result_json.get("caption", ""),
+        "maneuver": result_json.get("maneuver", ""),
+    }
+
+
+###############################################################################
+#                                  BACKENDS                                   #
+###############################################################################
+
+class GeminiBackend(JudgeBackend):
+    """google-generativeai backend using the async generate_content API."""
+    def __init__(self, api_key, model=DEFAULT_MODEL, max_output_tokens=1500):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._model = genai.GenerativeModel(model)
+        self.max_output_tokens = max_output_tokens
+
+    async def complete(self, prompt, model, temperature, max_tokens):
+        response = await self._model.generate_content_async(
+            prompt,
+            generation_config=self._genai.GenerationConfig(
+                max_output_tokens=max_tokens or self.max_output_tokens,
+                temperature=temperature,
+            ),
+        )
+        return response.text
+
+
+def stub_backend():
+    """Local stand-in for dry runs: returns a fixed, well-formed JSON reply."""
+    def reply(prompt):
+        return json.dumps({
+            "caption": "[stub] " + prompt.splitlines()[0][:80],
+            "maneuver": "[stub] maintain lane and speed",
+        })
+    return CallableBackend(reply)
+
+
+###############################################################################
+#                                  PIPELINE                                   #
+###############################################################################
+
+class CaptionPipeline:
+    """
+    Regenerates caption/maneuver for every frame of every video JSON.
+
+    - at most `concurrency` requests in flight across all videos
+    - optional token-bucket rate limit (`requests_per_second`)
+    - per-frame results cached by (model, parse_frame content hash), so an
+      interrupted run resumes without re-paying for finished frames
+    - a video with failed frames is not written, so the next run retries it
+      (only its failed frames cost requests, the others are cached)
+    - videos whose output file already exists are skipped unless overwrite=True
+    """
+    def __init__(
+        self,
+        backend,
+        output_dir,
+        model=DEFAULT_MODEL,
+        concurrency=8,
+        requests_per_second=None,
+        cache_path=None,
+        temperature=0.7,
+        max_output_tokens=1500,
+        retries=5,
+        max_open_videos=4,
+        overwrite=False,
+    ):
+        self.backend = backend
+        self.output_dir = output_dir
+        self.model = model
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.cache = ResponseCache(cache_path or os.path.join(output_dir, ".cache", "captions.sqlite"))
+        self.temperature = temperature
+        self.max_output_tokens = max_output_tokens
+        self.retries = retries
+        self.max_open_videos = max_open_videos
+        self.overwrite = overwrite
+        self.stats = {"frames": 0, "cache_hits": 0, "requests": 0, "failed": 0, "videos_skipped": 0,
+                      "videos_incomplete": 0}
+
+    def output_path(self, json_file):
+        file_name_without_ext = os.path.splitext(os.path.basename(json_file))[0]
+        return os.path.join(self.output_dir, f"output_{file_name_without_ext}.json")
+
+    async def _generate(self, frame_info, sem):
+        """{"caption", "maneuver"} for one frame, None if the request or parsing failed."""
+        key = frame_content_hash(frame_info)
+        cached = self.cache.get(self.model, key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return json.loads(cached)
+
+        prompt = generate_caption_and_maneuver_prompt(frame_info)
+
+        async def call():
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            self.stats["requests"] += 1
+            return await self.backend.complete(
+                prompt, self.model, self.temperature, self.max_output_tokens
+            )
+
+        async with sem:
+            try:
+                response = await retry_with_backoff(call, retries=self.retries)
+            except Exception as e:
+                print(f"DEBUG: request failed after retries: {e}")
+                response = None
+
+        result = parse_caption_response(response)
+        if result is None:
+            self.stats["failed"] += 1
+            if response is not None:
+                print("DEBUG: Failed to decode JSON. Response was:")
+                print(response)
+            return None
+
+        self.cache.put(self.model, key, json.dumps(result, ensure_ascii=False))
+        return result
+
+    async def process_video(self, json_file, sem, video_sem, pbar):
+        output_file_path = self.output_path(json_file)
+        if not self.overwrite and os.path.exists(output_file_path):
+            self.stats["videos_skipped"] += 1
+            return
+
+        async with video_sem:
+            with open(json_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            results = await asyncio.gather(*[
+                self._generate(parse_frame(frame), sem) for frame in data
+            ])
+            self.stats["frames"] += len(data)
+            pbar.update(len(data))
+
+            failed = sum(result is None for result in results)
+            if failed:
+                # No output file, so the next run retries the failed frames
+                self.stats["videos_incomplete"] += 1
+                print(f"DEBUG: {json_file}: {failed} frame(s) failed, output not written")
+                return
+
+            for frame, result in zip(data, results):
+                # Overwrite the frame's caption and maneuver with the improved ones
+                frame["caption"] = result["caption"]
+                frame["maneuver"] = result["maneuver"]
+
+            # Write atomically so a crash never leaves a half-written output
+            # that would be mistaken for a finished video on resume.
+            tmp_path = output_file_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as out_f:
+                json.dump(data, out_f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, output_file_path)
+
+    async def run(self, input_dir):
+        os.makedirs(self.output_dir, exist_ok=True)
+        json_files = sorted(glob(os.path.join(input_dir, "*.json")))
+        sem = asyncio.Semaphore(self.concurrency)
+        video_sem = asyncio.Semaphore(self.max_open_videos)
+        with tqdm(desc="Frames", unit="frame") as pbar:
+            await asyncio.gather(*[
+                self.process_video(json_file, sem, video_sem, pbar) for json_file in json_files
+            ])
+        return self.stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Regenerate caption/maneuver for every frame")
+    parser.add_argument("--input-dir", type=str, required=True,
+                        help="Folder with per-video .json files")
+    parser.add_argument("--output-dir", type=str, required=True,
+                        help="Folder where output_<video>.json files are written")
+    parser.add_argument("--backend", type=str, default="gemini", choices=["gemini", "stub"])
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    parser.add_argument("--api-key", type=str, default=None,
+                        help="Defaults to the GEMINI_API_KEY environment variable")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Max requests in flight")
+    parser.add_argument("--rps", type=float, default=2.0,
+                        help="Max requests per second (0 disables the limit)")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--max-output-tokens", type=int, default=1500)
+    parser.add_argument("--cache-path", type=str, default=None,
+                        help="sqlite result cache (default: <output-dir>/.cache/captions.sqlite)")
+    parser.add_argument("--max-open-videos", type=int, default=4,
+                        help="Videos held in memory at once")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Reprocess videos whose output file already exists")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.backend == "gemini":
+        api_key = args.api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise SystemExit("Set --api-key or GEMINI_API_KEY for the gemini backend.")
+        backend = GeminiBackend(api_key, model=args.model, max_output_tokens=args.max_output_tokens)
+    else:
+        backend = stub_backend()
+
+    pipeline = CaptionPipeline(
+        backend,
+        args.output_dir,
+        model=args.model if args.backend == "gemini" else "stub",
+        concurrency=args.concurrency,
+        requests_per_second=args.rps or None,
+        cache_path=args.cache_path,
+        temperature=args.temperature,
+        max_output_tokens=args.max_output_tokens,
+        max_open_videos=args.max_open_videos,
+        overwrite=args.overwrite,
+    )
+    stats = asyncio.run(pipeline.run(args.input_dir))
+    print(f"Done: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Vectorized H-shape position labelling (script version of H_Shape.ipynb).
+
+Every box center / point of every frame in a video is labelled front / left /
+ground / right in a single NumPy pass. Image sizes come from the JPEG/PNG
+header (no pixel decode) and are memoised in <frames>/<video>/image_sizes.json.
+
+    python h_shape_labels.py --json-folder <DATA_ROOT>/json --frames-folder <DATA_ROOT>/frames
+"""
+import os
+import json
+import struct
+import argparse
+
+import numpy as np
+
+try:
+    from src.utils import geometry
+except ImportError:
+    # Run as a script from this folder: load src/utils/geometry.py by path
+    import importlib.util
+    _spec = importlib.util.spec_from_file_location(
+        "geometry", os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "geometry.py")
+    )
+    geometry = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(geometry)
+
+
+AREA_LABELS = ("front", "left", "ground", "right")
+SIZE_INDEX_NAME = "image_sizes.json"
+
+# JPEG start-of-frame markers carrying the image dimensions (not DHT/JPG/DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+# ============================================================
+# Image size from headers
+# ============================================================
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # standalone markers, no length field
+        seg_len = f.read(2)
+        if len(seg_len) < 2:
+            return None
+        length = struct.unpack(">H", seg_len)[0]
+        if marker in _SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_size(path):
+    """
+    (width, height) read from the JPEG SOF or PNG IHDR header without decoding
+    pixels. Falls back to PIL (which also only parses the header) for other formats.
+    """
+    with open(path, "rb") as f:
+        head = f.read(24)
+        if head[:2] == b"\xff\xd8":
+            size = _jpeg_size(f)
+            if size is not None:
+                return size
+        elif head[:8] == b"\x89PNG\r\n\x1a\n":
+            return struct.unpack(">II", head[16:24])
+
+    from PIL import Image
+
+    with Image.open(path) as img:
+        return img.size
+
+
+def load_size_index(frames_path, image_ids):
+    """
+    {image_id: (width, height)} for the requested frames of one video.
+    Sizes are cached in <frames_path>/image_sizes.json together with the file
+    size and mtime, so only new or changed frames are re-read.
+    """
+    index_path = os.path.join(frames_path, SIZE_INDEX_NAME)
+    cache = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r") as f:
+                cache = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            cache = {}
+
+    sizes = {}
+    dirty = False
+    for image_id in image_ids:
+        image_path = os.path.join(frames_path, image_id)
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            continue  # missing image
+        entry = cache.get(image_id)
+        if entry is None or entry[2] != st.st_size or entry[3] != st.st_mtime_ns:
+            width, height = read_image_size(image_path)
+            entry = [width, height, st.st_size, st.st_mtime_ns]
+            cache[image_id] = entry
+            dirty = True
+        sizes[image_id] = (entry[0], entry[1])
+
+    if dirty:
+        try:
+            with open(index_path, "w") as f:
+                json.dump(cache, f)
+        except OSError:
+            pass  # read-only frames folder: sizes are still returned
+    return sizes
+
+
+# ============================================================
+# Vectorized labelling
+# ============================================================
+
+def area_label_codes(px, py, width, height):
+    """
+    Region code per point, same rectangles and precedence as define_areas /
+    get_area_label: 0=front, 1=left, 2=ground, 3=right, -1=outside the image.
+    All arguments are broadcastable arrays.
+    """
+    px = np.asarray(px, dtype=np.float64)
+    py = np.asarray(py, dtype=np.float64)
+    width = np.asarray(width, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+
+    x_left_split = 0.30 * width
+    x_right_split = 0.70 * width
+    y_mid_split = 0.50 * height
+
+    in_x = (px >= 0) & (px <= width)
+    lower = (py >= y_mid_split) & (py <= height)
+    conditions = [
+        in_x & (py >= 0) & (py <= y_mid_split),
+        lower & (px >= 0) & (px <= x_left_split),
+        lower & (px >= x_left_split) & (px <= x_right_split),
+        lower & (px >= x_right_split) & (px <= width),
+    ]
+    return np.select(conditions, [0, 1, 2, 3], default=-1)
+
+
+def label_video(data, frames_path, sizes=None):
+    """
+    Append H-shape labels to node['position'] for every frame of one video.
+
+    Box centers and points come from the video's geometry columns
+    (geometry.VideoGeometry) and are labelled with one area_label_codes call
+    each, then written back in order (box label before point label, no
+    duplicates), matching the notebook's per-object loop.
+    Returns the number of labels added.
+    """
+    if sizes is None:
+        image_ids = [frame.get("image_id", "") for frame in data]
+        sizes = load_size_index(frames_path, image_ids)
+
+    video_geometry = geometry.VideoGeometry.from_frames(data)
+    if not video_geometry.infos:
+        return 0
+    # (width, height) per frame, NaN if the image is missing (its objects are skipped)
+    frame_sizes = np.array(
+        [sizes.get(frame_dict.get("image_id", ""), (np.nan, np.nan)) for frame_dict in data],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+    widths = frame_sizes[video_geometry.object_frame, 0]
+    heights = frame_sizes[video_geometry.object_frame, 1]
+
+    box_centers = geometry.box_centers(video_geometry.boxes)
+    box_codes = area_label_codes(box_centers[:, 0], box_centers[:, 1], widths, heights)
+    point_codes = area_label_codes(video_geometry.points[:, 0], video_geometry.points[:, 1], widths, heights)
+
+    for k in np.flatnonzero(~np.isnan(widths)).tolist():
+        obj_dict = video_geometry.infos[k]
+        if "position" not in obj_dict:
+            obj_dict["position"] = []
+
+    added = 0
+    labelled = np.flatnonzero((box_codes >= 0) | (point_codes >= 0)).tolist()
+    for k, box_code, point_code in zip(labelled, box_codes[labelled].tolist(), point_codes[labelled].tolist()):
+        position = video_geometry.infos[k]["position"]
+        for code in (box_code, point_code):
+            if code < 0:
+                continue
+            label = AREA_LABELS[code]
+            if label not in position:
+                position.append(label)
+                added += 1
+    return added
+
+
+def label_folder(json_folder, frames_folder):
+    for json_file in sorted(os.listdir(json_folder)):
+        if not json_file.endswith(".json"):
+            continue
+
+        video_name = os.path.splitext(json_file)[0]  # e.g. "video1"
+        frames_path = os.path.join(frames_folder, video_name)
+        json_path = os.path.join(json_folder, json_file)
+
+        with open(json_path, "r") as f:
+            data = json.load(f)
+
+        added = label_video(data, frames_path)
+
+        # Save the updated JSON
+        with open(json_path, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"{json_file}: {added} position labels added")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized H-shape position labelling")
+    parser.add_argument("--json-folder", type=str, required=True)
+    parser.add_argument("--frames-folder", type=str, required=True)
+    args = parser.parse_args()
+    label_folder(args.json_folder, args.frames_folder)
+
+
+if __name__ == "__main__":
+    main()
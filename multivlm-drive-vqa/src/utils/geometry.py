@@ -0,0 +1,398 @@
+"""
+Batch geometry over the scene graphs of a video (NumPy).
+
+VideoGeometry.from_frames(frames) gathers the nodes of every frame into flat
+columns, frame f owning objects object_offsets[f]:object_offsets[f + 1] (in
+node order), and computes in a few array passes:
+
+    - box areas / centers and an object center (box center, else point)
+    - drivable-area polygon areas (shoelace) and whether each polygon is
+      simple (no two non-adjacent edges touch), i.e. the shoelace area is the
+      area Shapely reports for it
+
+QA.py reads these columns instead of computing geometry one object / frame
+at a time: generate_frames_qa (qa_parallel) over a chunk of frames,
+update_video_qa (the serial, streaming path) through iter_frame_geometry,
+batch_frames frames at a time. Only drivable areas that are not simple
+polygons still go through Shapely (QA.drivable_area_size). The H-shape
+labelling reads the box / point columns. SpatialGrid indexes the extents of
+one frame's objects (box, else point) for neighbourhood queries without
+comparing every pair.
+"""
+from functools import cached_property
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+DRIVABLE_AREA_LABEL = "drivable area"
+
+
+# ============================================================
+# Ragged-array helpers
+# ============================================================
+
+def offsets_from_counts(counts) -> np.ndarray:
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def cross_pairs(offsets_a, offsets_b) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    All (i, j) with i in group g of A and j in group g of B, for every group g
+    (e.g. every object x every drivable-area edge of the same frame).
+    """
+    offsets_a = np.asarray(offsets_a, dtype=np.int64)
+    offsets_b = np.asarray(offsets_b, dtype=np.int64)
+    counts_a = np.diff(offsets_a)
+    counts_b = np.diff(offsets_b)
+    n_pairs = counts_a * counts_b
+    total = int(n_pairs.sum())
+    if total == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    group = np.repeat(np.arange(len(n_pairs)), n_pairs)
+    local = np.arange(total) - np.repeat(offsets_from_counts(n_pairs)[:-1], n_pairs)
+    width = counts_b[group]
+    return offsets_a[:-1][group] + local // width, offsets_b[:-1][group] + local % width
+
+
+def within_pairs(offsets) -> Tuple[np.ndarray, np.ndarray]:
+    """All (i, j), i < j, of two members of the same group."""
+    i, j = cross_pairs(offsets, offsets)
+    keep = i < j
+    return i[keep], j[keep]
+
+
+# ============================================================
+# Polygons
+# ============================================================
+
+def polygon_areas(vertices, offsets) -> np.ndarray:
+    """
+    Shoelace area of every polygon (vertices[offsets[k]:offsets[k + 1]], the
+    ring closed implicitly). Polygons with fewer than 3 vertices get NaN.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    areas = np.full(len(counts), np.nan)
+    if len(vertices) == 0:
+        return areas
+    nxt = _next_vertex(offsets)
+    cross = vertices[:, 0] * vertices[nxt, 1] - vertices[nxt, 0] * vertices[:, 1]
+    sums = np.zeros(len(counts))
+    np.add.at(sums, np.repeat(np.arange(len(counts)), counts), cross)
+    valid = counts >= 3
+    areas[valid] = np.abs(sums[valid]) / 2.0
+    return areas
+
+
+def polygons_simple(vertices, offsets) -> np.ndarray:
+    """
+    True for polygons with at least 3 vertices whose non-adjacent edges neither
+    cross nor touch (collinear overlaps count as touching). Conservative: a
+    polygon flagged False may still be valid.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    simple = counts >= 3
+    if len(vertices) == 0:
+        return simple
+    nxt = _next_vertex(offsets)
+    a, b = within_pairs(offsets)
+    polygon = np.repeat(np.arange(len(counts)), counts)[a]
+    first, last = offsets[:-1][polygon], offsets[1:][polygon] - 1
+    non_adjacent = (b != a + 1) & ~((a == first) & (b == last))
+    a, b, polygon = a[non_adjacent], b[non_adjacent], polygon[non_adjacent]
+
+    p1, p2 = vertices[a], vertices[nxt[a]]
+    p3, p4 = vertices[b], vertices[nxt[b]]
+    d1 = _orientation(p3, p4, p1)
+    d2 = _orientation(p3, p4, p2)
+    d3 = _orientation(p1, p2, p3)
+    d4 = _orientation(p1, p2, p4)
+    touching = (d1 * d2 <= 0) & (d3 * d4 <= 0)
+    simple[np.unique(polygon[touching])] = False
+    return simple
+
+
+def _next_vertex(offsets) -> np.ndarray:
+    """Index of the next vertex of the same ring (wrapping to the first)."""
+    counts = np.diff(offsets)
+    nxt = np.arange(int(offsets[-1])) + 1
+    ends = offsets[1:][counts > 0] - 1
+    nxt[ends] = offsets[:-1][counts > 0]
+    return nxt
+
+
+def _orientation(p, q, r) -> np.ndarray:
+    return (q[:, 0] - p[:, 0]) * (r[:, 1] - p[:, 1]) - (q[:, 1] - p[:, 1]) * (r[:, 0] - p[:, 0])
+
+
+# ============================================================
+# Boxes
+# ============================================================
+
+def box_areas(boxes) -> np.ndarray:
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.abs((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]))
+
+
+def box_centers(boxes) -> np.ndarray:
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2.0, (boxes[:, 1] + boxes[:, 3]) / 2.0], axis=1)
+
+
+def box_gaps(boxes_a, boxes_b) -> np.ndarray:
+    """Euclidean gap between boxes (x1, y1, x2, y2), row by row; 0 when they overlap."""
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    a_lo, a_hi = np.minimum(a[:, :2], a[:, 2:]), np.maximum(a[:, :2], a[:, 2:])
+    b_lo, b_hi = np.minimum(b[:, :2], b[:, 2:]), np.maximum(b[:, :2], b[:, 2:])
+    gap = np.maximum(0.0, np.maximum(a_lo - b_hi, b_lo - a_hi))
+    return np.hypot(gap[:, 0], gap[:, 1])
+
+
+def object_extents(infos) -> np.ndarray:
+    """
+    [N, 4] extent of each object: its box (x1, y1, x2, y2, normalised), else
+    its point as a zero-size box, else NaN.
+    """
+    extents = np.full((len(infos), 4), np.nan)
+    for k, info in enumerate(infos):
+        box = info.get("boxes")
+        if box is not None and len(box) == 4:
+            extents[k] = box
+            continue
+        point = info.get("point")
+        if point is not None and len(point) == 2:
+            extents[k] = (point[0], point[1], point[0], point[1])
+    return _normalise_boxes(extents)
+
+
+def _normalise_boxes(boxes) -> np.ndarray:
+    return np.concatenate([np.minimum(boxes[:, :2], boxes[:, 2:]), np.maximum(boxes[:, :2], boxes[:, 2:])], axis=1)
+
+
+# ============================================================
+# Spatial index
+# ============================================================
+
+class SpatialGrid:
+    """
+    Uniform grid over object extents (x1, y1, x2, y2; NaN rows are left out).
+    Every extent is filed under each cell it overlaps, so the objects within
+    max_gap of an extent are among the cells covered by the extent grown by
+    max_gap: a query costs O(objects nearby) instead of O(objects).
+
+    The cell size defaults to the median extent side (at least min_cell_size
+    and never more than max_cells_per_axis cells across the scene), so
+    typical objects span about one cell.
+    """
+
+    def __init__(self, extents, cell_size: Optional[float] = None,
+                 min_cell_size: float = 16.0, max_cells_per_axis: int = 64):
+        self.extents = np.asarray(extents, dtype=np.float64).reshape(-1, 4)
+        self.ids = np.flatnonzero(~np.isnan(self.extents).any(axis=1))
+        self.cells = {}
+        if len(self.ids) == 0:
+            self.cell_size = cell_size or min_cell_size
+            return
+        valid = self.extents[self.ids]
+        if cell_size is None:
+            sides = np.maximum(valid[:, 2] - valid[:, 0], valid[:, 3] - valid[:, 1])
+            span = float(max(valid[:, 2].max() - valid[:, 0].min(), valid[:, 3].max() - valid[:, 1].min()))
+            cell_size = max(float(np.median(sides)), min_cell_size, span / max_cells_per_axis)
+        self.cell_size = cell_size
+
+        cells = self.cells
+        spans = np.floor(valid / cell_size).astype(np.int64).tolist()
+        for k, (cx1, cy1, cx2, cy2) in zip(self.ids.tolist(), spans):
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    cells.setdefault((cx, cy), []).append(k)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, extent, max_gap: float = 0.0) -> List[int]:
+        """Sorted ids of the objects sharing a cell with `extent` grown by max_gap (a superset of the answer)."""
+        x1, y1, x2, y2 = extent
+        size = self.cell_size
+        found = set()
+        cells = self.cells
+        for cx in range(int(np.floor((x1 - max_gap) / size)), int(np.floor((x2 + max_gap) / size)) + 1):
+            for cy in range(int(np.floor((y1 - max_gap) / size)), int(np.floor((y2 + max_gap) / size)) + 1):
+                found.update(cells.get((cx, cy), ()))
+        return sorted(found)
+
+    def pairs(self, max_gap: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(i, j, gap) for every pair i < j at most max_gap apart (gap 0: overlapping)."""
+        i, j = [], []
+        for k in self.ids.tolist():
+            for other in self.candidates(self.extents[k], max_gap):
+                if other > k:
+                    i.append(k)
+                    j.append(other)
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+        gap = box_gaps(self.extents[i], self.extents[j])
+        keep = gap <= max_gap
+        return i[keep], j[keep], gap[keep]
+
+
+# ============================================================
+# Per-video columns
+# ============================================================
+
+class FrameGeometry:
+    """The geometry of one frame of a VideoGeometry (object indices are frame-local)."""
+
+    def __init__(self, video: "VideoGeometry", frame: int):
+        self.video = video
+        self.frame = frame
+        self.start = int(video.object_offsets[frame])
+        self.stop = int(video.object_offsets[frame + 1])
+
+    @property
+    def drivable_area(self) -> Optional[float]:
+        """Shoelace area of the drivable area, or None if it has none or it is not simple."""
+        if not self.video.drivable_simple[self.frame]:
+            return None
+        return float(self.video.drivable_area[self.frame])
+
+    def column(self, name: str) -> np.ndarray:
+        """Per-object column (e.g. "box_areas", "centers", "extents") for this frame."""
+        return getattr(self.video, name)[self.start:self.stop]
+
+
+class VideoGeometry:
+    """
+    Geometry columns for all frames of a video, see the module docstring.
+
+    Per object (N): object_frame, boxes [N, 4] / points [N, 2] (NaN if absent),
+    has_box, has_point, box_areas, centers, extents (see object_extents).
+    Per frame (F): object_offsets [F + 1], drivable_object (object index or -1,
+    the first node named "drivable area", as in QA.FrameIndex), drivable_area
+    (NaN without a polygon), drivable_simple.
+    """
+
+    def __init__(self, infos: List[dict], frame_counts, box_ids, boxes, point_ids, points):
+        self.infos = infos
+        self.object_offsets = offsets_from_counts(frame_counts)
+        self.object_frame = np.repeat(np.arange(len(frame_counts)), frame_counts)
+        n = len(infos)
+        self.boxes = np.full((n, 4), np.nan)
+        self.boxes[box_ids] = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.points = np.full((n, 2), np.nan)
+        self.points[point_ids] = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.has_box = ~np.isnan(self.boxes).any(axis=1)
+        self.has_point = ~np.isnan(self.points).any(axis=1)
+        self.box_areas = box_areas(self.boxes)
+        self.centers = np.where(self.has_box[:, None], box_centers(self.boxes), self.points)
+
+    @classmethod
+    def from_frames(cls, frames) -> "VideoGeometry":
+        infos, frame_counts = [], []
+        box_ids, boxes, point_ids, points = [], [], [], []
+        add_info = infos.append
+        for frame_data in frames:
+            first = len(infos)
+            for node in frame_data.get('graph', {}).get('nodes', []):
+                if len(node) < 2:
+                    continue
+                info = node[1]
+                box = info.get("boxes")
+                if box is not None and len(box) == 4:
+                    box_ids.append(len(infos))
+                    boxes.append(box)
+                point = info.get("point")
+                if point is not None and len(point) == 2:
+                    point_ids.append(len(infos))
+                    points.append(point)
+                add_info(info)
+            frame_counts.append(len(infos) - first)
+        return cls(infos, frame_counts, box_ids, boxes, point_ids, points)
+
+    @cached_property
+    def extents(self) -> np.ndarray:
+        extents = np.where(self.has_box[:, None], self.boxes, self.points[:, [0, 1, 0, 1]])
+        return _normalise_boxes(extents)
+
+    # The drivable-area columns are computed on first use (the H-shape
+    # labelling only needs the box / point columns)
+
+    @cached_property
+    def drivable_object(self) -> np.ndarray:
+        infos = self.infos
+        offsets = self.object_offsets.tolist()
+        drivable_object = []
+        for start, stop in zip(offsets, offsets[1:]):
+            drivable_object.append(next(
+                (k for k in range(start, stop)
+                 if infos[k].get("obj_name", "").lower() == DRIVABLE_AREA_LABEL),
+                -1,
+            ))
+        return np.asarray(drivable_object, dtype=np.int64)
+
+    @cached_property
+    def _drivable_rings(self) -> Tuple[np.ndarray, np.ndarray]:
+        vertices, counts = [], []
+        for k in self.drivable_object.tolist():
+            ring = _ring(self.infos[k].get("polyline", [])) if k >= 0 else []
+            vertices.extend(ring)
+            counts.append(len(ring))
+        return np.asarray(vertices, dtype=np.float64).reshape(-1, 2), offsets_from_counts(counts)
+
+    @property
+    def drivable_vertices(self) -> np.ndarray:
+        return self._drivable_rings[0]
+
+    @property
+    def drivable_offsets(self) -> np.ndarray:
+        return self._drivable_rings[1]
+
+    @cached_property
+    def drivable_area(self) -> np.ndarray:
+        return polygon_areas(self.drivable_vertices, self.drivable_offsets)
+
+    @cached_property
+    def drivable_simple(self) -> np.ndarray:
+        return polygons_simple(self.drivable_vertices, self.drivable_offsets) & (self.drivable_area > 0)
+
+    def __len__(self):
+        return len(self.object_offsets) - 1
+
+    def frame(self, frame: int) -> FrameGeometry:
+        return FrameGeometry(self, frame)
+
+
+def iter_frame_geometry(frames, batch_frames: int = 64) -> Iterator[FrameGeometry]:
+    """
+    FrameGeometry of every frame of an iterable of frames, computed
+    batch_frames frames at a time (for streaming over a video).
+    """
+    batch = []
+    for frame_data in frames:
+        batch.append(frame_data)
+        if len(batch) == batch_frames:
+            video = VideoGeometry.from_frames(batch)
+            yield from (video.frame(k) for k in range(len(batch)))
+            batch = []
+    if batch:
+        video = VideoGeometry.from_frames(batch)
+        yield from (video.frame(k) for k in range(len(batch)))
+
+
+def _ring(polyline) -> list:
+    """[x, y] vertices of a polyline without a repeated closing vertex; [] if malformed."""
+    try:
+        ring = [(float(x), float(y)) for x, y in polyline]
+    except (TypeError, ValueError):
+        return []
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+    return ring
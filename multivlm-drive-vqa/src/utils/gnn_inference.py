@@ -0,0 +1,281 @@
+"""
+Low-latency CPU inference for a trained MultiModalModel (safe / unsafe).
+
+    - precision: fp32, bf16 (CPU autocast) or int8 (dynamic quantization of nn.Linear)
+    - optional torch.compile, falling back to eager if compilation fails
+    - graphs pre-collated once (DeviceGraphStore), image batch buffers preallocated
+    - image decode runs in a thread pool one batch ahead of the model
+    - per-frame latency percentiles + throughput
+
+Run from the repository root:
+
+    python -m src.utils.gnn_inference --run-dir <OUT>/multimodal_ablation/full/GCN \
+        --json-root <DATA_ROOT>/json --frames-root <DATA_ROOT>/frames1 \
+        --variant full --precision bf16 --compile --batch-size 1
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from src.utils import GNN
+
+
+PRECISIONS = ("fp32", "bf16", "int8")
+GRAPH_CACHE_NAME = "graph_cache.pt"
+
+
+class InferenceEngine:
+    """
+    Wraps a MultiModalModel for batched, pipelined inference over a fixed set of graphs.
+
+    image_paths are decoded on demand (pixel models), or image_source supplies
+    precomputed embeddings (models trained with an EmbeddingImageSource).
+    """
+    def __init__(
+        self,
+        model,
+        graphs,
+        image_paths,
+        image_source=None,
+        precision="fp32",
+        compile_model=False,
+        max_batch_size=1,
+        num_decode_threads=4,
+        image_size=224,
+    ):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.device = torch.device("cpu")
+        self.precision = precision
+        self.image_paths = image_paths
+        self.image_source = image_source
+        self.max_batch_size = max_batch_size
+        self.image_size = image_size
+
+        model = model.to(self.device).eval()
+        if precision == "int8":
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.compiled = None
+        if compile_model:
+            try:
+                self.compiled = torch.compile(model, dynamic=True)
+            except Exception as e:
+                print(f"[Inference] torch.compile unavailable ({e}); using eager mode")
+
+        self.store = GNN.DeviceGraphStore(graphs, self.device)
+
+        # Preallocated image buffers, reused by every batch
+        self.pixel_model = image_source is None
+        if self.pixel_model:
+            shape = (max_batch_size, 3, image_size, image_size)
+            self._u8 = torch.empty(shape, dtype=torch.uint8)
+            self._pixels = torch.empty(shape, dtype=torch.float32)
+            self._mean = torch.tensor(GNN.IMAGENET_MEAN).view(1, 3, 1, 1)
+            self._std = torch.tensor(GNN.IMAGENET_STD).view(1, 3, 1, 1)
+            self._decode_pool = ThreadPoolExecutor(max_workers=num_decode_threads)
+
+    # ------------------------------------------------------------------ images
+
+    def _submit_decode(self, ids):
+        """Start decoding the images of graphs `ids` in the pool; returns futures (None for embeddings)."""
+        if not self.pixel_model:
+            return None
+        return [
+            self._decode_pool.submit(GNN.load_resized_uint8, self.image_paths[i], self.image_size)
+            for i in self.store.image_idx[torch.from_numpy(ids)].tolist()
+        ]
+
+    def _collect_pixels(self, futures):
+        """Wait for decoded frames and normalise them into the preallocated buffer."""
+        n = len(futures)
+        for i, fut in enumerate(futures):
+            self._u8[i].copy_(torch.from_numpy(fut.result()))
+        pixels = self._pixels[:n]
+        pixels.copy_(self._u8[:n]).div_(255.0).sub_(self._mean).div_(self._std)
+        return pixels
+
+    # ------------------------------------------------------------------- model
+
+    def _forward(self, batch, images):
+        inputs = (batch.x, batch.edge_index, batch.batch, images)
+        with torch.inference_mode(), \
+                torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.precision == "bf16"):
+            if self.compiled is not None:
+                try:
+                    return self.compiled(*inputs).float()
+                except Exception as e:
+                    print(f"[Inference] compiled model failed ({e}); falling back to eager mode")
+                    self.compiled = None
+            return self.model(*inputs).float()
+
+    def run(self, batch_size=None, warmup=2):
+        """
+        Predict every graph in order. Image decode of batch k+1 overlaps the
+        model on batch k. Returns (probabilities [G], latency report).
+        """
+        batch_size = min(batch_size or self.max_batch_size, self.max_batch_size)
+        order = np.arange(len(self.store))
+        chunks = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+        if not chunks:
+            return torch.empty(0), latency_report([], 0.0)
+
+        # Warm-up (compilation, allocator) on the first batch, not timed
+        for _ in range(warmup):
+            self._predict_chunk(chunks[0], self._submit_decode(chunks[0]))
+
+        probs = []
+        per_frame_ms = []
+        pending = self._submit_decode(chunks[0])
+        start = time.perf_counter()
+        for k, ids in enumerate(chunks):
+            t0 = time.perf_counter()
+            current = pending
+            if k + 1 < len(chunks):
+                pending = self._submit_decode(chunks[k + 1])
+            probs.append(self._predict_chunk(ids, current))
+            per_frame_ms.extend([(time.perf_counter() - t0) * 1000.0 / len(ids)] * len(ids))
+        total = time.perf_counter() - start
+
+        return torch.cat(probs), latency_report(per_frame_ms, total)
+
+    def _predict_chunk(self, ids, decode_futures):
+        batch = self.store.batch(ids)
+        if self.pixel_model:
+            images = self._collect_pixels(decode_futures)
+        else:
+            images = self.image_source(batch, self.device)
+        return torch.sigmoid(self._forward(batch, images))
+
+    def close(self):
+        if self.pixel_model:
+            self._decode_pool.shutdown(wait=True)
+
+
+def latency_report(per_frame_ms, total_seconds):
+    if not per_frame_ms:
+        return {"frames": 0}
+    lat = np.asarray(per_frame_ms)
+    return {
+        "frames": int(lat.size),
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p90_ms": float(np.percentile(lat, 90)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "mean_ms": float(lat.mean()),
+        "throughput_fps": float(lat.size / total_seconds) if total_seconds > 0 else 0.0,
+    }
+
+
+def find_output_root(run_dir):
+    """
+    Training output root of a run: the nearest folder above run_dir holding the
+    graph cache (run_dir is <root>/<ablation>/<backbone>, or
+    <root>/<ablation>/<backbone>/seed_N for gnn_sweep runs). None if there is none.
+    """
+    directory = os.path.abspath(run_dir)
+    while True:
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+        if os.path.exists(os.path.join(directory, GRAPH_CACHE_NAME)):
+            return directory
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark/predict with a trained MultiModalModel on CPU")
+    parser.add_argument("--run-dir", type=str, required=True,
+                        help="Training run folder containing model.pt")
+    parser.add_argument("--json-root", type=str, required=True)
+    parser.add_argument("--frames-root", type=str, required=True)
+    parser.add_argument("--variant", type=str, default="full", choices=list(GNN.ABLATIONS))
+    parser.add_argument("--cache-path", type=str, default=None,
+                        help="Graph cache (default: graph_cache.pt of the training output root above --run-dir)")
+    parser.add_argument("--embeddings-dir", type=str, default=None,
+                        help="Image embedding store, for models trained in embeddings mode")
+    parser.add_argument("--embedding-weights", type=str, default=GNN.DEFAULT_EMBEDDING_WEIGHTS,
+                        choices=list(GNN.EMBEDDING_WEIGHTS),
+                        help="Frozen ResNet-18 the embeddings-mode model was trained with")
+    parser.add_argument("--label-encoder", type=str, default=None,
+                        help="Label text encoder, for models trained with node text features")
+    parser.add_argument("--label-store", type=str, default=None,
+                        help="Label embedding store (default: label_embeddings next to the graph cache)")
+    parser.add_argument("--precision", type=str, default="fp32", choices=PRECISIONS)
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--decode-threads", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Optional JSON file for predictions + latency report")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    model = GNN.load_model_checkpoint(os.path.join(args.run_dir, "model.pt"))
+    cache_path = args.cache_path
+    if cache_path is None:
+        output_root = find_output_root(args.run_dir)
+        if output_root is None:
+            raise SystemExit(f"No {GRAPH_CACHE_NAME} found above {args.run_dir}; pass --cache-path.")
+        cache_path = os.path.join(output_root, GRAPH_CACHE_NAME)
+    cache_path = os.path.normpath(cache_path)
+    cache = GNN.load_graph_cache(args.json_root, args.frames_root, cache_path)
+    label_embeddings = None
+    if model.graph_enc.conv1.in_channels != GNN.NUM_NODE_FEATURES:
+        if args.label_encoder is None:
+            raise SystemExit("This model was trained with node text features; pass --label-encoder.")
+        label_store = args.label_store or os.path.join(os.path.dirname(cache_path), "label_embeddings")
+        label_embeddings = GNN.label_embeddings_for_cache(
+            cache, os.path.normpath(label_store), args.label_encoder
+        )
+    graphs, image_paths = GNN.graphs_from_cache(cache, GNN.ABLATIONS[args.variant], label_embeddings)
+
+    image_source = None
+    if isinstance(model.image_enc, nn.Identity):
+        if args.embeddings_dir is None:
+            raise SystemExit("This model was trained on image embeddings; pass --embeddings-dir.")
+        store = GNN.compute_image_embeddings(
+            image_paths, args.embeddings_dir, weights=args.embedding_weights
+        )
+        image_source = GNN.EmbeddingImageSource(store, image_paths)
+
+    engine = InferenceEngine(
+        model,
+        graphs,
+        image_paths,
+        image_source=image_source,
+        precision=args.precision,
+        compile_model=args.compile,
+        max_batch_size=args.batch_size,
+        num_decode_threads=args.decode_threads,
+    )
+    probs, report = engine.run()
+    engine.close()
+
+    print(f"[Inference] precision={args.precision} compile={args.compile} batch={args.batch_size}")
+    print(json.dumps(report, indent=4))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "report": report,
+                "predictions": [
+                    {"image_path": image_paths[int(i)], "p_safe": float(p)}
+                    for i, p in zip(engine.store.image_idx.tolist(), probs.tolist())
+                ],
+            }, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
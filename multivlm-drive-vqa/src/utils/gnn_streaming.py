@@ -0,0 +1,334 @@
+"""
+Streaming, per-video safety classification with incremental graph updates.
+
+Consecutive frames of a video share most of their scene graph (the annotator
+copies graphs forward), so instead of rebuilding every frame:
+
+    - StreamingGraphState keeps the current graph of one video and applies the
+      node / edge diff of each new frame (only changed nodes are added/removed)
+    - node features depend only on node type and degree, so after L message
+      passing layers a node's embedding is a function of its L-round
+      Weisfeiler-Lehman colour; colours are recomputed only within L hops of a
+      change and node embeddings are cached by colour
+    - nodes with an unseen colour are embedded by running the encoder on their
+      (L + 1)-hop neighbourhood, which contains every degree the GCN
+      normalisation needs, so results match a full forward pass
+
+Run from the repository root:
+
+    python -m src.utils.gnn_streaming --run-dir <OUT>/multimodal_ablation/full/GCN \
+        --json-root <DATA_ROOT>/json --frames-root <DATA_ROOT>/frames1
+"""
+import os
+import json
+import time
+import argparse
+from collections import OrderedDict
+
+import torch
+
+from src.utils import GNN
+
+
+NUM_LAYERS = 2  # every GraphEncoder* has two message passing layers
+
+
+# ============================================================
+# Incremental graph state
+# ============================================================
+
+class StreamingGraphState:
+    """
+    Graph of the current frame of one video, keyed by node name, plus WL colours.
+    update(frame) applies the diff to the previous frame.
+    """
+    def __init__(self, flags=None):
+        flags = flags or {}
+        self.dropped_types = {
+            code for flag, code in GNN.FLAG_NODE_TYPES.items() if not flags.get(flag, True)
+        }
+        self.reset()
+
+    def reset(self):
+        self.node_type = {}   # name -> NODE_* code (insertion ordered)
+        self.out_nbrs = {}    # name -> set of successors
+        self.in_nbrs = {}     # name -> set of predecessors
+        self.edges = set()
+        self.colors = [{} for _ in range(NUM_LAYERS + 1)]  # round -> {name: colour}
+        self.label = None
+
+    def _neighbors(self, name):
+        """Message sources of `name` in the undirected edge_index (self-loops twice)."""
+        return list(self.out_nbrs[name]) + list(self.in_nbrs[name])
+
+    def update(self, frame):
+        """
+        Apply the frame's graph. Returns the diff statistics, or None if the
+        frame has no usable label / graph (state is left unchanged).
+        """
+        named = GNN.frame_to_named_graph(frame)
+        if named is None:
+            return None
+        safety_status, index, types, edges, _ = named
+        names = list(index)
+
+        new_types = {
+            name: types[i] for name, i in index.items() if types[i] not in self.dropped_types
+        }
+        new_edges = {
+            (names[u], names[v]) for u, v in edges
+            if names[u] in new_types and names[v] in new_types
+        }
+
+        touched = set()
+        removed_edges = self.edges - new_edges
+        added_edges = new_edges - self.edges
+        for u, v in removed_edges:
+            self.out_nbrs[u].discard(v)
+            self.in_nbrs[v].discard(u)
+            touched.update((u, v))
+
+        removed_nodes = [name for name in self.node_type if name not in new_types]
+        for name in removed_nodes:
+            del self.node_type[name], self.out_nbrs[name], self.in_nbrs[name]
+            for colors in self.colors:
+                colors.pop(name, None)
+
+        added_nodes = 0
+        for name, code in new_types.items():
+            old = self.node_type.get(name)
+            if old is None:
+                self.out_nbrs[name] = set()
+                self.in_nbrs[name] = set()
+                added_nodes += 1
+            if old != code:
+                self.node_type[name] = code
+                touched.add(name)
+
+        for u, v in added_edges:
+            self.out_nbrs[u].add(v)
+            self.in_nbrs[v].add(u)
+            touched.update((u, v))
+
+        self.edges = new_edges
+        self.label = 1.0 if safety_status == "safe" else 0.0
+        recolored = self._recolor({name for name in touched if name in self.node_type})
+
+        return {
+            "nodes": len(self.node_type),
+            "nodes_added": added_nodes,
+            "nodes_removed": len(removed_nodes),
+            "edges_added": len(added_edges),
+            "edges_removed": len(removed_edges),
+            "recolored": recolored,
+        }
+
+    def base_features(self, name):
+        """(type, in_degree, out_degree): everything graph_to_data puts in x."""
+        return self.node_type[name], len(self.in_nbrs[name]), len(self.out_nbrs[name])
+
+    def _recolor(self, dirty):
+        """WL refinement restricted to the region a change can reach. Returns #nodes recoloured."""
+        region = set(dirty)
+        for name in region:
+            self.colors[0][name] = hash(self.base_features(name))
+        for r in range(1, NUM_LAYERS + 1):
+            region |= {n for name in region for n in self._neighbors(name)}
+            prev = self.colors[r - 1]
+            for name in region:
+                self.colors[r][name] = hash((
+                    prev[name], tuple(sorted(prev[n] for n in self._neighbors(name)))
+                ))
+        return len(region)
+
+    def final_colors(self):
+        return self.colors[NUM_LAYERS]
+
+    def k_hop(self, targets, hops):
+        nodes = set(targets)
+        frontier = set(targets)
+        for _ in range(hops):
+            frontier = {n for name in frontier for n in self._neighbors(name)} - nodes
+            nodes |= frontier
+        return nodes
+
+
+# ============================================================
+# Streaming classifier
+# ============================================================
+
+class StreamingSafetyClassifier:
+    """
+    Per-frame safe/unsafe probability for a live feed using a trained
+    MultiModalModel. Graph cost scales with the change between frames; node
+    embeddings are cached across frames (and videos) by WL colour.
+    """
+    def __init__(self, model, flags=None, cache_size=200000, device="cpu"):
+        if model.graph_enc.conv1.in_channels != GNN.NUM_NODE_FEATURES:
+            raise ValueError("Streaming mode needs structural node features only (no label text features)")
+        self.device = torch.device(device)
+        self.model = model.to(self.device).eval()
+        self.state = StreamingGraphState(flags)
+        self.cache = OrderedDict()  # WL colour -> node embedding
+        self.cache_size = cache_size
+
+    def reset(self):
+        """Call between videos."""
+        self.state.reset()
+
+    def _embed_nodes(self, targets):
+        """Exact embeddings of `targets` from their (L + 1)-hop neighbourhood."""
+        state = self.state
+        sub_nodes = list(state.k_hop(targets, NUM_LAYERS + 1))
+        local = {name: i for i, name in enumerate(sub_nodes)}
+
+        x = torch.zeros((len(sub_nodes), GNN.NUM_NODE_FEATURES), dtype=torch.float)
+        for i, name in enumerate(sub_nodes):
+            code, in_deg, out_deg = state.base_features(name)
+            x[i, 0] = float(GNN.NODE_TYPE_SUBSET[code])
+            x[i, 1] = in_deg
+            x[i, 2] = out_deg
+            x[i, 3 + code] = 1.0
+
+        pairs = []
+        for u in sub_nodes:
+            for v in state.out_nbrs[u]:
+                if v in local:
+                    pairs.append((local[u], local[v]))
+                    pairs.append((local[v], local[u]))
+        edge_index = torch.tensor(pairs, dtype=torch.long).view(-1, 2).t().contiguous()
+
+        with torch.inference_mode():
+            h = self.model.graph_enc.node_embeddings(x.to(self.device), edge_index.to(self.device))
+        return h[[local[name] for name in targets]]
+
+    def step(self, frame, image=None, image_embedding=None):
+        """
+        Process the next frame of the current video.
+        image: [3, H, W] normalised pixels (pixel models), or
+        image_embedding: [D] precomputed embedding (embedding models).
+        Returns {"p_safe", "label", ...diff stats, "embedded"} or None.
+        """
+        stats = self.state.update(frame)
+        if stats is None:
+            return None
+
+        colors = self.state.final_colors()
+        names = list(self.state.node_type)
+        missing = {}
+        for name in names:
+            c = colors[name]
+            if c in self.cache:
+                self.cache.move_to_end(c)
+            elif c not in missing:
+                missing[c] = name
+        if missing:
+            h = self._embed_nodes(list(missing.values()))
+            for c, emb in zip(missing, h):
+                self.cache[c] = emb
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        with torch.inference_mode():
+            g_emb = torch.stack([self.cache[colors[name]] for name in names]).mean(dim=0, keepdim=True)
+            if image_embedding is not None:
+                img_emb = image_embedding.to(self.device).view(1, -1)
+            else:
+                img_emb = self.model.image_enc(image.to(self.device).unsqueeze(0))
+            logit = self.model.classifier(torch.cat([g_emb, img_emb], dim=-1)).view(-1)
+
+        stats["embedded"] = len(missing)
+        stats["p_safe"] = float(torch.sigmoid(logit)[0])
+        stats["label"] = self.state.label
+        return stats
+
+
+# ============================================================
+# Main: replay videos as streams
+# ============================================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Streaming per-video safety classification")
+    parser.add_argument("--run-dir", type=str, required=True,
+                        help="Training run folder containing model.pt")
+    parser.add_argument("--json-root", type=str, required=True)
+    parser.add_argument("--frames-root", type=str, required=True)
+    parser.add_argument("--variant", type=str, default="full", choices=list(GNN.ABLATIONS))
+    parser.add_argument("--embeddings-dir", type=str, default=None,
+                        help="Image embedding store, for models trained in embeddings mode")
+    parser.add_argument("--embedding-weights", type=str, default=GNN.DEFAULT_EMBEDDING_WEIGHTS,
+                        choices=list(GNN.EMBEDDING_WEIGHTS),
+                        help="Frozen ResNet-18 the embeddings-mode model was trained with")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Optional JSON file with per-frame results")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    model = GNN.load_model_checkpoint(os.path.join(args.run_dir, "model.pt"))
+    embedding_model = isinstance(model.image_enc, torch.nn.Identity)
+    if embedding_model and args.embeddings_dir is None:
+        raise SystemExit("This model was trained on image embeddings; pass --embeddings-dir.")
+
+    stream = StreamingSafetyClassifier(model, GNN.ABLATIONS[args.variant])
+    transform = GNN.get_image_transform()
+    results = {}
+    graph_seconds = 0.0
+    totals = {"frames": 0, "nodes": 0, "recolored": 0, "embedded": 0}
+
+    for json_file in sorted(f for f in os.listdir(args.json_root) if f.endswith(".json")):
+        video_name = os.path.splitext(json_file)[0]
+        image_dir = os.path.join(args.frames_root, video_name)
+        with open(os.path.join(args.json_root, json_file), "r") as f:
+            data = json.load(f)
+
+        stream.reset()
+        store = None
+        if embedding_model:
+            paths = [os.path.join(image_dir, fr["image_id"]) for fr in data if "image_id" in fr]
+            store = GNN.compute_image_embeddings(
+                paths, args.embeddings_dir, weights=args.embedding_weights
+            )
+
+        results[video_name] = []
+        for frame in data:
+            image_id = frame.get("image_id")
+            if image_id is None:
+                continue
+            image_path = os.path.join(image_dir, image_id)
+            kwargs = {}
+            if store is not None:
+                kwargs["image_embedding"] = torch.from_numpy(store.lookup([image_path])[0])
+            else:
+                kwargs["image"] = GNN.load_images_from_indices(
+                    torch.tensor([0]), [image_path], stream.device, transform
+                )[0]
+
+            t0 = time.perf_counter()
+            out = stream.step(frame, **kwargs)
+            graph_seconds += time.perf_counter() - t0
+            if out is None:
+                continue
+            out["image_id"] = image_id
+            results[video_name].append(out)
+            totals["frames"] += 1
+            for key in ("nodes", "recolored", "embedded"):
+                totals[key] += out[key]
+
+        print(f"[Stream] {video_name}: {len(results[video_name])} frames")
+
+    if totals["frames"]:
+        n = totals["frames"]
+        print(f"[Stream] {n} frames | avg nodes {totals['nodes'] / n:.1f} | "
+              f"avg recoloured {totals['recolored'] / n:.1f} | "
+              f"avg embedded {totals['embedded'] / n:.2f} | "
+              f"{1000.0 * graph_seconds / n:.2f} ms/frame")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Parallel ablation x backbone x seed sweep for the GNN multimodal experiments.
+
+Each (variant, backbone, seed) run is a job in a process pool. Jobs are pinned
+round-robin to --devices and limited to --threads-per-job intra-op threads.
+Finished runs are skipped, so an interrupted sweep resumes where it stopped:
+a run is finished when run_dir/metrics.json exists and its "config" (seed,
+image mode, epochs, batch size, lr, label encoder, device graphs) matches the
+job; a run trained with other settings is retrained. Runs with node label features
+(--label-encoder) get their own run folder and summary entry,
+<backbone>+labels-<encoder>. Results are merged into
+<output-root>/multimodal_ablation_metrics.json.
+
+Run from the repository root:
+
+    python -m src.utils.gnn_sweep --dataset-root "<DATA_ROOT>" --jobs 4 --seeds 42 43 44
+"""
+import os
+import json
+import argparse
+import statistics
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import torch
+
+from src.utils import GNN
+
+
+SUMMARY_NAME = "multimodal_ablation_metrics.json"
+
+
+# ============================================================
+# Jobs
+# ============================================================
+
+def run_name(backbone_name, label_encoder=None):
+    """Run folder / summary key of a backbone: label-feature runs are kept apart from plain ones."""
+    if not label_encoder:
+        return backbone_name
+    return f"{backbone_name}+labels-{os.path.basename(label_encoder.rstrip('/'))}"
+
+
+def job_run_dir(output_root, variant_name, name, seed):
+    return os.path.join(output_root, variant_name, name, f"seed_{seed}")
+
+
+def job_config(args, variant_name, backbone_name, seed):
+    """Settings a run's metrics depend on, stored in its metrics.json (see load_finished)."""
+    return {
+        "variant": variant_name,
+        "backbone": backbone_name,
+        "seed": seed,
+        "image_mode": args.image_mode,
+        "embedding_weights": args.embedding_weights if args.image_mode == "embeddings" else None,
+        "epochs": args.epochs,
+        "batch_size": args.batch_size,
+        "lr": args.lr,
+        "label_encoder": args.label_encoder,
+        "device_graphs": args.device_graphs,
+    }
+
+
+def build_jobs(args, variants, backbones, devices):
+    jobs = []
+    for variant_name in variants:
+        for backbone_name in backbones:
+            name = run_name(backbone_name, args.label_encoder)
+            for seed in args.seeds:
+                jobs.append({
+                    "variant": variant_name,
+                    "flags": GNN.ABLATIONS[variant_name],
+                    "backbone": backbone_name,
+                    "name": name,
+                    "seed": seed,
+                    "device": devices[len(jobs) % len(devices)],
+                    "run_dir": job_run_dir(args.output_root, variant_name, name, seed),
+                    "config": job_config(args, variant_name, backbone_name, seed),
+                })
+    return jobs
+
+
+# Per-process state, loaded once per worker and reused by all its jobs
+_WORKER = {}
+
+
+def _init_worker(threads, config):
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    torch.set_num_threads(threads)
+    _WORKER["config"] = config
+
+
+def _worker_state():
+    config = _WORKER["config"]
+    if "cache" not in _WORKER:
+        _WORKER["cache"] = GNN.load_graph_cache(
+            config["json_root"], config["frames_root"], config["cache_path"]
+        )
+        _WORKER["label_embeddings"] = None
+        if config["label_encoder"]:
+            _WORKER["label_embeddings"] = GNN.label_embeddings_for_cache(
+                _WORKER["cache"], config["label_store"], config["label_encoder"]
+            )
+        _WORKER["image_source"] = GNN.make_image_source(
+            config["image_mode"],
+            _WORKER["cache"]["image_paths"],
+            config["output_root"],
+            num_workers=config["loader_workers"],
+            embedding_weights=config["embedding_weights"],
+        )
+    return config, _WORKER["cache"], _WORKER["image_source"], _WORKER["label_embeddings"]
+
+
+def run_job(job):
+    """Train one (variant, backbone, seed) run inside a pool worker."""
+    config, cache, image_source, label_embeddings = _worker_state()
+    if job["device"].startswith("cuda"):
+        torch.cuda.set_device(torch.device(job["device"]))
+
+    graphs, image_paths = GNN.graphs_from_cache(cache, job["flags"], label_embeddings)
+    return GNN.train_multimodal_model_for_variant_and_backbone(
+        job["variant"],
+        job["backbone"],
+        graphs,
+        image_paths,
+        config["output_root"],
+        num_epochs=config["num_epochs"],
+        batch_size=config["batch_size"],
+        lr=config["lr"],
+        image_source=image_source,
+        seed=job["seed"],
+        device=job["device"],
+        run_dir=job["run_dir"],
+        device_graphs=config["device_graphs"],
+        run_config=job["config"],
+    )
+
+
+def load_finished(job):
+    """The run's metrics if it was already trained with the job's config, else None."""
+    metrics_path = os.path.join(job["run_dir"], "metrics.json")
+    if not os.path.exists(metrics_path):
+        return None
+    with open(metrics_path, "r") as f:
+        metrics = json.load(f)
+    if metrics.get("config") != job["config"]:
+        print(f"[Sweep] {job['run_dir']}: metrics.json was trained with other settings, retraining")
+        return None
+    return metrics
+
+
+# ============================================================
+# Summary
+# ============================================================
+
+def merge_summary(summary_path, results, multi_seed):
+    """
+    Merge finished runs into the summary JSON (existing entries for other
+    variants/backbones are kept). Single-seed sweeps keep the original
+    {variant: {backbone: metrics}} layout; multi-seed sweeps store
+    {variant: {backbone: {"seeds": {seed: metrics}, "test_f1_mean", "test_f1_std"}}}
+    (backbone: the run_name, so label-feature runs have their own entries).
+    """
+    summary = {}
+    if os.path.exists(summary_path):
+        with open(summary_path, "r") as f:
+            summary = json.load(f)
+
+    for (variant_name, backbone_name, seed), metrics in results.items():
+        variant = summary.setdefault(variant_name, {})
+        if not multi_seed:
+            variant[backbone_name] = metrics
+            continue
+        entry = variant.get(backbone_name)
+        if not isinstance(entry, dict) or "seeds" not in entry:
+            entry = variant[backbone_name] = {"seeds": {}}
+        entry["seeds"][str(seed)] = metrics
+
+    if multi_seed:
+        for variant in summary.values():
+            for entry in variant.values():
+                if isinstance(entry, dict) and "seeds" in entry:
+                    f1s = [m["test_metrics"]["f1"] for m in entry["seeds"].values()]
+                    entry["test_f1_mean"] = statistics.fmean(f1s)
+                    entry["test_f1_std"] = statistics.pstdev(f1s)
+
+    tmp_path = summary_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(summary, f, indent=4)
+    os.replace(tmp_path, summary_path)
+    return summary
+
+
+# ============================================================
+# Main
+# ============================================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parallel GNN ablation/backbone/seed sweep")
+    parser.add_argument("--dataset-root", type=str, required=True)
+    parser.add_argument("--json-root", type=str, default=None,
+                        help="Default: <dataset-root>/json")
+    parser.add_argument("--frames-root", type=str, default=None,
+                        help="Default: <dataset-root>/frames1")
+    parser.add_argument("--output-root", type=str, default=None,
+                        help="Default: <dataset-root>/multimodal_ablation")
+    parser.add_argument("--variants", nargs="+", default=list(GNN.ABLATIONS),
+                        choices=list(GNN.ABLATIONS))
+    parser.add_argument("--backbones", nargs="+", default=GNN.BACKBONES,
+                        choices=GNN.BACKBONES)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[42])
+    parser.add_argument("--jobs", type=int, default=2,
+                        help="Concurrent training processes")
+    parser.add_argument("--devices", nargs="+", default=None,
+                        help="Devices assigned round-robin to jobs (default: all GPUs, else cpu)")
+    parser.add_argument("--threads-per-job", type=int, default=None,
+                        help="torch intra-op threads per job (default: cpus // jobs)")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--lr", type=float, default=1e-4)
+    parser.add_argument("--image-mode", type=str, default="pixels", choices=GNN.IMAGE_MODES)
+    parser.add_argument("--embedding-weights", type=str, default=GNN.DEFAULT_EMBEDDING_WEIGHTS,
+                        choices=list(GNN.EMBEDDING_WEIGHTS),
+                        help="Frozen ResNet-18 for --image-mode embeddings: ImageNet-pretrained "
+                             "(downloaded once; default) or a seeded random init (offline, "
+                             "a fixed random projection only)")
+    parser.add_argument("--loader-workers", type=int, default=0,
+                        help="DataLoader workers per job (shard mode)")
+    parser.add_argument("--label-encoder", type=str, default=None,
+                        help="sentence-transformers model for node label text features "
+                             f"(e.g. {GNN.DEFAULT_LABEL_ENCODER}); off by default")
+    parser.add_argument("--device-graphs", action="store_true",
+                        help="Pre-collate graphs on the device and batch by index gathering")
+    parser.add_argument("--rerun", action="store_true",
+                        help="Retrain runs whose metrics.json already exists")
+    args = parser.parse_args()
+
+    args.json_root = args.json_root or os.path.join(args.dataset_root, "json")
+    args.frames_root = args.frames_root or os.path.join(args.dataset_root, "frames1")
+    args.output_root = args.output_root or os.path.join(args.dataset_root, "multimodal_ablation")
+    if args.devices is None:
+        n_gpus = torch.cuda.device_count()
+        args.devices = [f"cuda:{i}" for i in range(n_gpus)] if n_gpus else ["cpu"]
+    if args.threads_per_job is None:
+        args.threads_per_job = max(1, (os.cpu_count() or 1) // max(args.jobs, 1))
+    return args
+
+
+def main():
+    args = parse_args()
+    os.makedirs(args.output_root, exist_ok=True)
+    cache_path = os.path.join(args.output_root, "graph_cache.pt")
+
+    # Build shared stores once in the parent; workers only read them
+    cache = GNN.load_graph_cache(args.json_root, args.frames_root, cache_path)
+    GNN.make_image_source(args.image_mode, cache["image_paths"], args.output_root,
+                          embedding_weights=args.embedding_weights)
+    label_store = os.path.join(args.output_root, "label_embeddings")
+    if args.label_encoder:
+        GNN.label_embeddings_for_cache(cache, label_store, args.label_encoder)
+    del cache
+
+    multi_seed = len(args.seeds) > 1
+    jobs = build_jobs(args, args.variants, args.backbones, args.devices)
+    results = {}
+    pending = []
+    for job in jobs:
+        finished = None if args.rerun else load_finished(job)
+        if finished is not None:
+            results[(job["variant"], job["name"], job["seed"])] = finished
+        else:
+            pending.append(job)
+    print(f"[Sweep] {len(jobs)} runs, {len(jobs) - len(pending)} already finished, "
+          f"{len(pending)} to train on {args.devices} with {args.jobs} jobs "
+          f"x {args.threads_per_job} threads")
+
+    summary_path = os.path.join(args.output_root, SUMMARY_NAME)
+    config = {
+        "json_root": args.json_root,
+        "frames_root": args.frames_root,
+        "cache_path": cache_path,
+        "output_root": args.output_root,
+        "image_mode": args.image_mode,
+        "embedding_weights": args.embedding_weights,
+        "loader_workers": args.loader_workers,
+        "device_graphs": args.device_graphs,
+        "label_encoder": args.label_encoder,
+        "label_store": label_store,
+        "num_epochs": args.epochs,
+        "batch_size": args.batch_size,
+        "lr": args.lr,
+    }
+    if pending:
+        with ProcessPoolExecutor(
+            max_workers=args.jobs,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(args.threads_per_job, config),
+        ) as pool:
+            futures = {pool.submit(run_job, job): job for job in pending}
+            for future in as_completed(futures):
+                job = futures[future]
+                key = (job["variant"], job["name"], job["seed"])
+                try:
+                    metrics = future.result()
+                except Exception as e:
+                    print(f"[Sweep] {key} failed: {e}")
+                    continue
+                if metrics is not None:
+                    results[key] = metrics
+                    merge_summary(summary_path, {key: metrics}, multi_seed)
+
+    summary = merge_summary(summary_path, results, multi_seed)
+    print(f"\nSaved sweep metrics to: {summary_path}")
+
+    print("\n=== Sweep Summary: Test F1 per Variant / Backbone ===")
+    for variant_name, models_dict in summary.items():
+        print(f"\n[Variant: {variant_name}]")
+        for backbone_name, res in models_dict.items():
+            if "seeds" in res:
+                print(f"  {backbone_name}: Test F1 = {res['test_f1_mean']:.4f} "
+                      f"+/- {res['test_f1_std']:.4f} ({len(res['seeds'])} seeds)")
+            else:
+                print(f"  {backbone_name}: Test F1 = {res['test_metrics']['f1']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Streaming read/write of per-video annotation files.
+
+A video file is either a JSON array of frames (<video>.json, the annotation
+format) or compact JSON lines with one frame per line (<video>.jsonl).
+
+    - iter_frames(path) yields frames one at a time. Arrays are decoded
+      incrementally with JSONDecoder.raw_decode, so memory is bounded by the
+      largest frame, not the file
+    - load_json / the JSON-lines reader use orjson when it is installed and
+      fall back to the standard json module
+    - FrameWriter writes frames one at a time to a temp file that replaces the
+      target on close. Array output is byte-identical to
+      json.dump(frames, f, indent=indent)
+
+Convert a folder of videos to JSON lines (from the repository root):
+
+    python -m src.utils.json_stream --json-dir <DATA_ROOT>/json --to jsonl
+"""
+import os
+import json
+import argparse
+from typing import Any, Iterator, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+VIDEO_EXTENSIONS = (".json", ".jsonl")
+_WHITESPACE = " \t\n\r"
+_NUMBER_END = _WHITESPACE + ",]"
+
+
+# ============================================================
+# Readers
+# ============================================================
+
+def loads(data) -> Any:
+    """
+    json.loads, via orjson when available. Documents orjson rejects but the
+    json module accepts (NaN / Infinity, integers beyond 64 bit) fall back.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def load_json(path: str) -> Any:
+    """Whole-document load (fast path for files that fit in memory)."""
+    if path.endswith(".jsonl"):
+        return list(iter_json_lines(path))
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def iter_json_lines(path: str) -> Iterator[Any]:
+    """One JSON value per non-empty line."""
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Elements of a top-level JSON array, decoded one at a time.
+    Raises ValueError if the file is not a JSON array (or is malformed).
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def refill():
+            # Read at least as much as is buffered, so a large element costs O(n) retries
+            nonlocal buf, pos, eof
+            data = f.read(max(chunk_size, len(buf) - pos))
+            eof = not data
+            buf = buf[pos:] + data
+            pos = 0
+
+        def next_token():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if eof:
+                    return ""
+                refill()
+
+        if next_token() != "[":
+            raise ValueError(f"{path}: expected a JSON array")
+        pos += 1
+        if next_token() == "]":
+            return
+
+        while True:
+            next_token()
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # A number cut by the buffer end decodes as its prefix ("12" of "123",
+                # "1" of "1e-07"): unless a delimiter follows it, read more first
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    truncated = not eof and (end == len(buf) or buf[end] not in _NUMBER_END)
+                else:
+                    truncated = end == len(buf) and not eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                truncated = True
+            if truncated:
+                refill()
+                continue
+            pos = end
+            yield value
+
+            token = next_token()
+            if token == ",":
+                pos += 1
+                # Drop the consumed prefix so the buffer only holds the next element
+                buf = buf[pos:]
+                pos = 0
+            elif token == "]":
+                return
+            else:
+                raise ValueError(f"{path}: expected ',' or ']' at offset {pos} of the current buffer")
+
+
+def iter_frames(path: str) -> Iterator[dict]:
+    """Frames of one video file (.json array or .jsonl), one at a time."""
+    if path.endswith(".jsonl"):
+        return iter_json_lines(path)
+    return iter_json_array(path)
+
+
+def video_files(json_dir: str) -> List[str]:
+    """
+    Sorted video file names in json_dir. If a video exists as both .json and
+    .jsonl, the .json (annotation) file is listed.
+    """
+    names = set(os.listdir(json_dir))
+    files = []
+    for name in sorted(names):
+        stem, ext = os.path.splitext(name)
+        if ext == ".json" or (ext == ".jsonl" and stem + ".json" not in names):
+            files.append(name)
+    return files
+
+
+# ============================================================
+# Writers
+# ============================================================
+
+class FrameWriter:
+    """
+    Writes the frames of one video incrementally:
+
+        with FrameWriter(path) as writer:
+            for frame in frames:
+                writer.write(frame)
+
+    .json targets get a JSON array (json.dump layout for `indent`), .jsonl
+    targets one compact frame per line. Output goes to <path>.tmp and replaces
+    `path` only if the block exits without an exception.
+    """
+
+    def __init__(self, path: str, indent: Optional[int] = 4):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.indent = indent
+        self.lines = path.endswith(".jsonl")
+        self.count = 0
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self.tmp_path, "wb" if self.lines else "w", encoding=None if self.lines else "utf-8")
+        return self
+
+    def write(self, frame: Any):
+        if self.lines:
+            if orjson is not None:
+                self._f.write(orjson.dumps(frame) + b"\n")
+            else:
+                self._f.write(json.dumps(frame, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+        elif self.indent is None:
+            self._f.write(("[" if self.count == 0 else ", ") + json.dumps(frame))
+        else:
+            # Nested one level inside the array: prefix every line with one indent
+            # (JSON strings never contain raw newlines, so this is exact)
+            pad = " " * self.indent
+            text = json.dumps(frame, indent=self.indent)
+            self._f.write(("[\n" if self.count == 0 else ",\n") + pad + text.replace("\n", "\n" + pad))
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None and not self.lines:
+                if self.count == 0:
+                    self._f.write("[]")
+                else:
+                    self._f.write("]" if self.indent is None else "\n]")
+        finally:
+            self._f.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        return False
+
+
+def write_frames(path: str, frames, indent: Optional[int] = 4) -> int:
+    """Stream an iterable of frames to path. Returns the number of frames written."""
+    with FrameWriter(path, indent=indent) as writer:
+        for frame in frames:
+            writer.write(frame)
+    return writer.count
+
+
+def convert_video(path: str, to: str = "jsonl", indent: Optional[int] = 4) -> str:
+    """Rewrite one video file as .jsonl or .json (frame by frame). Returns the new path."""
+    out_path = os.path.splitext(path)[0] + "." + to
+    if out_path == path:
+        return path
+    write_frames(out_path, iter_frames(path), indent=indent)
+    return out_path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert per-video annotation files between JSON and JSON lines")
+    parser.add_argument("--json-dir", type=str, required=True)
+    parser.add_argument("--to", type=str, default="jsonl", choices=["jsonl", "json"])
+    parser.add_argument("--remove-source", action="store_true",
+                        help="Delete the original file after a successful conversion")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for name in video_files(args.json_dir):
+        path = os.path.join(args.json_dir, name)
+        out_path = convert_video(path, to=args.to)
+        if out_path == path:
+            continue
+        if args.remove_source:
+            os.remove(path)
+        print(f"{name} -> {os.path.basename(out_path)}")
+
+
+if __name__ == "__main__":
+    main()
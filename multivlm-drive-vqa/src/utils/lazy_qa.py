@@ -0,0 +1,193 @@
+"""
+On-the-fly frame Q&A for DrivingVideoDataset(generate_qa=True).
+
+QA.generate_qa is deterministic given a frame and its neighbours' speed, so a
+corpus can keep only the scene / graph annotation and generate the Q&A when a
+sample is read:
+
+    - the dataset still needs its length up front: the number of Q&A of every
+      frame, per Type, is cached in <json_dir>/.qa_counts/<video>.json keyed by
+      the frame hash (QA.frame_qa_hash) and QA.qa_version(), so it is computed
+      once per frame and again only when the frame or the generator changes
+    - FrameQAGenerator generates a frame's Q&A on first access and memoises the
+      last `memo_frames` frames (LRU). Each DataLoader worker holds its own
+      copy of the dataset, so the memo is per worker and is not pickled
+    - changing the question templates (and bumping QA_GENERATOR_VERSION)
+      changes the Q&A without rewriting the corpus
+
+Strip the stored Q&A from a corpus (from the repository root):
+
+    python -m src.utils.lazy_qa --json-dir <DATA_ROOT>/json --out <DATA_ROOT>_graph/json
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import importlib.util
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+from src.utils import json_stream
+
+QA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Generating QA")
+QA_COUNTS_DIR = ".qa_counts"
+
+_qa_module = None
+
+
+def load_qa_module():
+    """QA.py (imported once per process; its folder holds qa_templates / qa_temporal)."""
+    global _qa_module
+    if _qa_module is None:
+        _qa_module = sys.modules.get("QA")
+        if _qa_module is None:
+            if QA_DIR not in sys.path:
+                sys.path.insert(0, QA_DIR)
+            spec = importlib.util.spec_from_file_location("QA", os.path.join(QA_DIR, "QA.py"))
+            module = importlib.util.module_from_spec(spec)
+            sys.modules["QA"] = module
+            spec.loader.exec_module(module)
+            # generate_qa logs INFO per frame; keep that out of training logs
+            module.logger.setLevel(logging.WARNING)
+            _qa_module = module
+    return _qa_module
+
+
+def strip_frame(frame: dict) -> dict:
+    return {key: value for key, value in frame.items() if key != "QA"}
+
+
+# ============================================================
+# Per-frame Q&A counts
+# ============================================================
+
+def counts_path(json_path: str) -> str:
+    name = os.path.splitext(os.path.basename(json_path))[0] + ".json"
+    return os.path.join(os.path.dirname(json_path), QA_COUNTS_DIR, name)
+
+
+def frame_type_counts(json_path: str, frames: List[dict]) -> List[Dict[str, int]]:
+    """
+    {Type: number of generated Q&A} for every frame of a video, from the
+    count cache where the frame hash and generator version match, generating
+    the other frames' Q&A (the cache is then updated).
+    """
+    QA = load_qa_module()
+    version = QA.qa_version()
+    hashes = [QA.frame_qa_hash(frame, prev, nxt) for prev, frame, nxt in QA.frame_windows(frames)]
+
+    path = counts_path(json_path)
+    cached = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == version:
+            cached = data.get("frames", {})
+    except (OSError, json.JSONDecodeError):
+        pass
+
+    counts = []
+    changed = False
+    for frame_index, frame_hash in enumerate(hashes):
+        type_counts = cached.get(frame_hash)
+        if type_counts is None:
+            type_counts = {}
+            for qa in generate_frame_qa(frames, frame_index):
+                q_type = qa.get("Type", "no_type")
+                type_counts[q_type] = type_counts.get(q_type, 0) + 1
+            changed = True
+        counts.append(type_counts)
+
+    if changed:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": version, "frames": dict(zip(hashes, counts))}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # read-only corpus: counts are recomputed next time
+    return counts
+
+
+def generate_frame_qa(frames: Sequence[dict], frame_index: int) -> List[dict]:
+    """QA.generate_qa for frames[frame_index] of a video (neighbours from the same list)."""
+    QA = load_qa_module()
+    frame_data = frames[frame_index]
+    previous_frame = frames[frame_index - 1] if frame_index > 0 else None
+    next_frame = frames[frame_index + 1] if frame_index + 1 < len(frames) else None
+    objects = frame_data.get('graph', {}).get('nodes', [])
+    return QA.generate_qa(objects, frame_data, previous_frame, next_frame)
+
+
+# ============================================================
+# Memoised generation
+# ============================================================
+
+class FrameQAGenerator:
+    """
+    Q&A of (video, frame) pairs over in-memory videos (lists of frames without
+    "QA"), generated on first use and restricted to the Types in q_type_filter
+    (None: all); the last memo_frames frames are kept.
+    """
+
+    def __init__(self, videos: List[List[dict]], memo_frames: int = 256,
+                 q_type_filter: Optional[Sequence[str]] = None):
+        self.videos = videos
+        self.memo_frames = memo_frames
+        self.q_type_filter = q_type_filter
+        self._memo = OrderedDict()
+
+    def __call__(self, video: int, frame: int) -> List[dict]:
+        key = (video, frame)
+        qa_list = self._memo.get(key)
+        if qa_list is not None:
+            self._memo.move_to_end(key)
+            return qa_list
+        qa_list = generate_frame_qa(self.videos[video], frame)
+        if self.q_type_filter is not None:
+            qa_list = [qa for qa in qa_list if qa.get("Type", "no_type") in self.q_type_filter]
+        if self.memo_frames > 0:
+            self._memo[key] = qa_list
+            if len(self._memo) > self.memo_frames:
+                self._memo.popitem(last=False)
+        return qa_list
+
+    def __getstate__(self):
+        # Workers start with an empty memo
+        state = self.__dict__.copy()
+        state["_memo"] = OrderedDict()
+        return state
+
+
+# ============================================================
+# Corpus conversion
+# ============================================================
+
+def strip_video(path: str, out_path: str) -> int:
+    """Write a video without its stored Q&A (.jsonl or .json). Returns the number of frames."""
+    return json_stream.write_frames(out_path, (strip_frame(frame) for frame in json_stream.iter_frames(path)),
+                                    indent=None)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Copy video annotations without their stored Q&A")
+    parser.add_argument("--json-dir", type=str, required=True)
+    parser.add_argument("--out", type=str, required=True, help="Output folder (.jsonl videos)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if os.path.abspath(args.json_dir) == os.path.abspath(args.out):
+        raise SystemExit("--out must differ from --json-dir")
+    os.makedirs(args.out, exist_ok=True)
+    for name in json_stream.video_files(args.json_dir):
+        out_path = os.path.join(args.out, os.path.splitext(name)[0] + ".jsonl")
+        frames = strip_video(os.path.join(args.json_dir, name), out_path)
+        print(f"{name} -> {os.path.basename(out_path)} ({frames} frames)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Deduplicated storage of frame Q&A.
+
+Most Q&A strings repeat across frames and videos ("What is the ego vehicle's
+current speed?", the fixed drivable-area prompts, metadata values, scenario
+names...), yet every frame stores each Q&A dict in full. A QA store keeps one
+string table per corpus and stores each frame's Q&A as rows of ids:
+
+    <store>/qa_tables.json      {"version", "strings": [...], "shapes": [[key, ...], ...]}
+    <store>/**/<video>.jsonl    the frames, "QA" replaced by "QA_ids":
+                                [[shape id, value id, value id, ...], ...]
+
+A shape is the key order of a Q&A dict, its values follow in that order, so
+the store is lossless (restore_video gives back the original Q&A dicts).
+Values are interned by JSON value (strings, and the odd None / number).
+Video files are JSON lines (json_stream), so they load with orjson when it is
+installed; the tables are loaded once per corpus.
+
+DrivingVideoDataset reads a store directly (find_tables / QATables.getter).
+Convert a corpus (from the repository root), e.g. the sample dataset with
+data/, by_Type/ and by_AV_Task/ sharing one table:
+
+    python -m src.utils.qa_store --src "<DATA_ROOT>" --out "<DATA_ROOT>_store"
+"""
+import os
+import json
+import argparse
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.utils import json_stream
+
+TABLES_FILE = "qa_tables.json"
+TABLES_VERSION = 1
+QA_IDS_KEY = "QA_ids"
+
+
+# ============================================================
+# String tables
+# ============================================================
+
+def _intern_key(value) -> Any:
+    # Strings are their own key; other JSON values by their encoding (True != 1, 1.0 != 1)
+    if isinstance(value, str):
+        return value
+    return (type(value).__name__, json.dumps(value, sort_keys=True))
+
+
+class QATables:
+    """
+    The string table and Q&A shapes of one store. Ids are append-only, so a
+    store can be extended (convert more videos into it) without rewriting
+    the videos already converted.
+    """
+
+    def __init__(self, strings: Optional[List[Any]] = None, shapes: Optional[List[Sequence[str]]] = None):
+        self.strings = list(strings or [])
+        self.shapes = [tuple(shape) for shape in shapes or []]
+        self._string_ids = {_intern_key(value): i for i, value in enumerate(self.strings)}
+        self._shape_ids = {shape: i for i, shape in enumerate(self.shapes)}
+        self._getters = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    # ---------------- encoding ----------------
+
+    def intern(self, value) -> int:
+        key = _intern_key(value)
+        string_id = self._string_ids.get(key)
+        if string_id is None:
+            string_id = self._string_ids[key] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def encode(self, qa: Dict[str, Any]) -> List[int]:
+        """One Q&A dict -> [shape id, value id, ...]."""
+        shape = tuple(qa)
+        shape_id = self._shape_ids.get(shape)
+        if shape_id is None:
+            shape_id = self._shape_ids[shape] = len(self.shapes)
+            self.shapes.append(shape)
+        intern = self.intern
+        return [shape_id] + [intern(value) for value in qa.values()]
+
+    def encode_frame(self, frame: dict) -> dict:
+        """Frame with its "QA" list replaced by "QA_ids" rows (key order otherwise kept)."""
+        encoded = {}
+        for key, value in frame.items():
+            if key == "QA":
+                encoded[QA_IDS_KEY] = [self.encode(qa) for qa in value]
+            else:
+                encoded[key] = value
+        return encoded
+
+    # ---------------- decoding ----------------
+
+    def decode(self, row: Sequence[int]) -> Dict[str, Any]:
+        strings = self.strings
+        return dict(zip(self.shapes[row[0]], [strings[i] for i in row[1:]]))
+
+    def decode_frame(self, frame: dict) -> dict:
+        decoded = {}
+        for key, value in frame.items():
+            if key == QA_IDS_KEY:
+                decoded["QA"] = [self.decode(row) for row in value]
+            else:
+                decoded[key] = value
+        return decoded
+
+    def getter(self, keys: Sequence[str], defaults: Sequence[Any]) -> Callable[[Sequence[int]], Tuple]:
+        """
+        Function row -> tuple of the values of `keys` (defaults for keys the
+        row's shape lacks), without building the Q&A dict. The value
+        positions are worked out once per shape.
+        """
+        cache_key = (tuple(keys), tuple(defaults))
+        getter = self._getters.get(cache_key)
+        if getter is None:
+            strings = self.strings
+            positions = {}
+
+            def getter(row):
+                shape_id = row[0]
+                slots = positions.get(shape_id)
+                if slots is None:
+                    shape = self.shapes[shape_id]
+                    slots = positions[shape_id] = [shape.index(key) + 1 if key in shape else None for key in keys]
+                return tuple(
+                    strings[row[slot]] if slot is not None else default
+                    for slot, default in zip(slots, defaults)
+                )
+
+            self._getters[cache_key] = getter
+        return getter
+
+    # ---------------- files ----------------
+
+    @classmethod
+    def load(cls, path: str) -> "QATables":
+        data = json_stream.load_json(path)
+        if data.get("version") != TABLES_VERSION:
+            raise ValueError(f"{path}: unsupported QA table version {data.get('version')!r}")
+        return cls(data["strings"], data["shapes"])
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": TABLES_VERSION, "strings": self.strings, "shapes": self.shapes},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+
+def video_files(directory: str) -> List[str]:
+    """json_stream.video_files without the store's own qa_tables.json."""
+    return [name for name in json_stream.video_files(directory) if name != TABLES_FILE]
+
+
+def find_tables(*dirs: str) -> Optional[str]:
+    """Path of the first qa_tables.json found in dirs (None: not a QA store)."""
+    for directory in dirs:
+        path = os.path.join(directory, TABLES_FILE)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# ============================================================
+# Conversion
+# ============================================================
+
+def convert_video(path: str, out_path: str, tables: QATables) -> int:
+    """Stream one video into the store (out_path: .jsonl). Returns the number of Q&A rows."""
+    rows = 0
+
+    def encoded_frames():
+        nonlocal rows
+        for frame in json_stream.iter_frames(path):
+            encoded = tables.encode_frame(frame)
+            rows += len(encoded.get(QA_IDS_KEY, ()))
+            yield encoded
+
+    json_stream.write_frames(out_path, encoded_frames(), indent=None)
+    return rows
+
+
+def restore_video(path: str, out_path: str, tables: QATables, indent: Optional[int] = 4) -> int:
+    """Write a stored video back with full Q&A dicts (.json or .jsonl). Returns the number of frames."""
+    return json_stream.write_frames(out_path, (tables.decode_frame(frame) for frame in json_stream.iter_frames(path)),
+                                    indent=indent)
+
+
+def iter_frames(path: str, tables: QATables) -> Iterator[dict]:
+    """Frames of a stored video with their Q&A dicts restored."""
+    for frame in json_stream.iter_frames(path):
+        yield tables.decode_frame(frame)
+
+
+def convert_tree(src_root: str, out_root: str) -> Dict[str, int]:
+    """
+    Convert every video file under src_root (any depth, e.g. data/ and
+    by_Type/<type>/) into a store at out_root with one shared table, keeping
+    the folder layout (hidden folders are skipped). An existing table in
+    out_root is extended.
+    Returns {"videos", "rows", "strings"}.
+    """
+    tables_path = os.path.join(out_root, TABLES_FILE)
+    tables = QATables.load(tables_path) if os.path.exists(tables_path) else QATables()
+    stats = {"videos": 0, "rows": 0, "strings": 0}
+    out_abs = os.path.abspath(out_root)
+    for directory, subdirs, _ in os.walk(src_root):
+        # Hidden folders (.qa_manifest) and the store itself are not videos
+        subdirs[:] = sorted(
+            d for d in subdirs
+            if not d.startswith(".") and os.path.abspath(os.path.join(directory, d)) != out_abs
+        )
+        relative = os.path.relpath(directory, src_root)
+        names = video_files(directory)
+        if not names:
+            continue
+        out_dir = os.path.normpath(os.path.join(out_root, relative))
+        os.makedirs(out_dir, exist_ok=True)
+        for name in names:
+            out_path = os.path.join(out_dir, os.path.splitext(name)[0] + ".jsonl")
+            stats["rows"] += convert_video(os.path.join(directory, name), out_path, tables)
+            stats["videos"] += 1
+    tables.save(tables_path)
+    stats["strings"] = len(tables)
+    return stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert annotation JSON to a deduplicated QA store")
+    parser.add_argument("--src", type=str, required=True, help="Folder of video files (searched recursively)")
+    parser.add_argument("--out", type=str, required=True, help="Store folder (qa_tables.json + .jsonl videos)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if os.path.abspath(args.src) == os.path.abspath(args.out):
+        raise SystemExit("--out must differ from --src")
+    stats = convert_tree(args.src, args.out)
+    print(f"{stats['videos']} videos, {stats['rows']} Q&A rows, {stats['strings']} distinct strings")
+
+
+if __name__ == "__main__":
+    main()